@@ -0,0 +1,337 @@
+#!/usr/bin/env python
+
+"""Run the FSMonitor backends against synthetic workloads and report events
+per second, latency percentiles, missed events, CPU time and memory use.
+
+Results are printed as a table, and written as JSON with --output so that
+runs can be compared with compare.py.
+"""
+
+from __future__ import print_function
+
+import sys, os, gc, json, math, time, shutil, platform, tempfile, threading, argparse
+from collections import OrderedDict
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from fsmonitor.common import FSEvent
+from fsmonitor.compat import monotonic
+from fsmonitor.polling import FSMonitor as PollingFSMonitor
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+FORMAT_VERSION = 1
+
+ARRIVE = FSEvent.Create | FSEvent.MoveTo
+LEAVE = FSEvent.Delete | FSEvent.MoveFrom
+WATCH_FLAGS = ARRIVE | LEAVE
+
+class Workload(object):
+    """A set of changes to a directory tree, made at SIZE scale.
+
+    Subclasses define prepare(root), which creates the initial tree under
+    ROOT and returns the directories to watch, and run(root, record), which
+    changes the tree, calling record(watch_index, kind, name) before each
+    change.
+
+    A rename may be reported as a MoveFrom and MoveTo or as a Delete and a
+    Create, so changes are recorded as arrivals ("+") and removals ("-") of
+    names relative to the watched directory.
+    """
+
+    name = None
+    recursive = False
+
+    def __init__(self, size):
+        self.size = size
+
+class CreateDeleteStorm(Workload):
+    """Create SIZE files in one directory as fast as possible, then delete them."""
+
+    name = "create_delete"
+
+    def prepare(self, root):
+        return [root]
+
+    def run(self, root, record):
+        names = ["f%06d" % i for i in range(self.size)]
+        for name in names:
+            record(0, "+", name)
+            open(os.path.join(root, name), "wb").close()
+        for name in names:
+            record(0, "-", name)
+            os.remove(os.path.join(root, name))
+
+class DeepTree(Workload):
+    """Create a file in each leaf of a tree of depth SIZE // 100 + 2 with
+    three subdirectories per directory, under one recursive watch."""
+
+    name = "deep_tree"
+    recursive = True
+    fanout = 3
+
+    def leaves(self):
+        paths = [""]
+        for level in range(self.size // 100 + 2):
+            paths = [os.path.join(path, "d%d" % i) if path else "d%d" % i
+                     for path in paths for i in range(self.fanout)]
+        return paths
+
+    def prepare(self, root):
+        for path in self.leaves():
+            os.makedirs(os.path.join(root, path))
+        return [root]
+
+    def run(self, root, record):
+        for path in self.leaves():
+            record(0, "+", os.path.join(path, "file").replace(os.sep, "/"))
+            open(os.path.join(root, path, "file"), "wb").close()
+
+class ManyWatches(Workload):
+    """Watch SIZE directories and create a file in each of them."""
+
+    name = "many_watches"
+
+    def prepare(self, root):
+        paths = [os.path.join(root, "w%05d" % i) for i in range(self.size)]
+        for path in paths:
+            os.mkdir(path)
+        return paths
+
+    def run(self, root, record):
+        for i in range(self.size):
+            record(i, "+", "file")
+            open(os.path.join(root, "w%05d" % i, "file"), "wb").close()
+
+class RenameChain(Workload):
+    """Rename one file SIZE times, from r0 to r1, r1 to r2 and so on."""
+
+    name = "rename_chain"
+
+    def prepare(self, root):
+        open(os.path.join(root, "r0"), "wb").close()
+        return [root]
+
+    def run(self, root, record):
+        for i in range(self.size):
+            record(0, "-", "r%d" % i)
+            record(0, "+", "r%d" % (i + 1))
+            os.rename(os.path.join(root, "r%d" % i), os.path.join(root, "r%d" % (i + 1)))
+
+WORKLOADS = OrderedDict((cls.name, cls) for cls in
+                        (CreateDeleteStorm, DeepTree, ManyWatches, RenameChain))
+
+def make_backends(poll_interval):
+    """Return an ordered dict of the available backends: name -> factory."""
+    backends = OrderedDict()
+    if sys.platform.startswith("linux"):
+        from fsmonitor.linux import FSMonitor as InotifyFSMonitor
+        from fsmonitor import fanotify
+        backends["inotify"] = InotifyFSMonitor
+        if fanotify.fanotify_available():
+            backends["fanotify"] = fanotify.FSMonitor
+    elif sys.platform == "win32":
+        from fsmonitor.win32 import FSMonitor as Win32FSMonitor
+        backends["win32"] = Win32FSMonitor
+
+    def polling():
+        m = PollingFSMonitor()
+        m.polling_interval = poll_interval
+        return m
+    backends["polling"] = polling
+    return backends
+
+class Collector(threading.Thread):
+    """Thread which reads events from a monitor and timestamps them."""
+
+    def __init__(self, monitor):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.monitor = monitor
+        self.events = []
+        self.running = True
+
+    def run(self):
+        while self.running:
+            events = self.monitor.read_events(0.05)
+            now = monotonic()
+            self.events.extend((now, evt) for evt in events)
+
+def percentile(values, p):
+    """Nearest-rank percentile P of the sorted list VALUES."""
+    if not values:
+        return None
+    index = int(math.ceil(p / 100.0 * len(values))) - 1
+    return values[min(max(index, 0), len(values) - 1)]
+
+def cpu_seconds():
+    if resource is not None:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        return usage.ru_utime + usage.ru_stime
+    return getattr(time, "process_time", getattr(time, "clock", None))()
+
+def rss_kb():
+    """Current resident set size in KiB, or None if it is unknown."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (IOError, OSError, ValueError, IndexError):
+        return None
+
+def max_rss_kb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+def run_one(factory, workload, root, settle=1.0, timeout=60.0):
+    """Run WORKLOAD with a monitor made by FACTORY in the empty directory
+    ROOT, and return a dict of its measurements."""
+    gc.collect()
+    paths = workload.prepare(root)
+    monitor = factory()
+    start = monotonic()
+    watches = [monitor.add_dir_watch(path, WATCH_FLAGS, recursive=workload.recursive)
+               for path in paths]
+    setup_seconds = monotonic() - start
+    index = dict((watch, i) for i, watch in enumerate(watches))
+
+    collector = Collector(monitor)
+    collector.start()
+    ops = OrderedDict()
+
+    def record(watch_index, kind, name):
+        ops.setdefault((watch_index, kind, name), monotonic())
+
+    cpu_start = cpu_seconds()
+    start = monotonic()
+    workload.run(root, record)
+    end = monotonic()
+    deadline = end + timeout
+    count = 0
+    last_change = end
+    while True:
+        time.sleep(0.01)
+        now = monotonic()
+        if len(collector.events) != count:
+            count = len(collector.events)
+            last_change = now
+        if count >= len(ops) or now - last_change >= settle or now >= deadline:
+            break
+    collector.running = False
+    collector.join()
+    cpu = cpu_seconds() - cpu_start
+    rss = rss_kb()
+    monitor.close()
+
+    received = {}
+    extra = 0
+    for t, evt in collector.events:
+        if evt.action & ARRIVE:
+            kind = "+"
+        elif evt.action & LEAVE:
+            kind = "-"
+        else:
+            extra += 1
+            continue
+        key = (index.get(evt.watch), kind, evt.name)
+        if key in ops and key not in received:
+            received[key] = t
+        else:
+            extra += 1
+    latencies = sorted((received[key] - ops[key]) * 1000.0 for key in received)
+    last = max(received.values()) if received else end
+    return OrderedDict([
+        ("expected", len(ops)),
+        ("received", len(received)),
+        ("missed", len(ops) - len(received)),
+        ("extra", extra),
+        ("setup_seconds", setup_seconds),
+        ("elapsed_seconds", last - start),
+        ("events_per_second", len(received) / (last - start) if received else 0.0),
+        ("latency_ms", OrderedDict(
+            ("p%d" % p, percentile(latencies, p)) for p in (50, 90, 99, 100))),
+        ("cpu_seconds", cpu),
+        ("rss_kb", rss),
+        ("max_rss_kb", max_rss_kb()),
+    ])
+
+def metadata(args):
+    return OrderedDict([
+        ("format", FORMAT_VERSION),
+        ("time", time.strftime("%Y-%m-%dT%H:%M:%S")),
+        ("python", platform.python_version()),
+        ("implementation", platform.python_implementation()),
+        ("platform", platform.platform()),
+        ("machine", platform.machine()),
+        ("size", args.size),
+        ("repeat", args.repeat),
+        ("poll_interval", args.poll_interval),
+        ("settle", args.settle),
+    ])
+
+def run_benchmarks(backends, workloads, size, repeat=3, poll_interval=0.05,
+                   settle=1.0, basedir=None):
+    """Run each of the WORKLOADS with each of the BACKENDS REPEAT times and
+    return the list of results."""
+    available = make_backends(poll_interval)
+    results = []
+    for backend in backends:
+        factory = available[backend]
+        for name in workloads:
+            for run in range(repeat):
+                root = tempfile.mkdtemp(prefix="fsmonitor-bench-", dir=basedir)
+                try:
+                    result = run_one(factory, WORKLOADS[name](size), root, settle)
+                finally:
+                    shutil.rmtree(root, ignore_errors=True)
+                results.append(OrderedDict([("backend", backend), ("workload", name),
+                                            ("run", run)] + list(result.items())))
+    return results
+
+def print_results(results):
+    print("%-9s %-14s %8s %7s %11s %9s %9s %8s %9s" % (
+        "backend", "workload", "expected", "missed", "events/s",
+        "p50 ms", "p99 ms", "cpu s", "rss KiB"))
+    for r in results:
+        latency = r["latency_ms"]
+        print("%-9s %-14s %8d %7d %11.0f %9s %9s %8.3f %9s" % (
+            r["backend"], r["workload"], r["expected"], r["missed"],
+            r["events_per_second"],
+            "-" if latency["p50"] is None else "%.2f" % latency["p50"],
+            "-" if latency["p99"] is None else "%.2f" % latency["p99"],
+            r["cpu_seconds"], "-" if r["rss_kb"] is None else r["rss_kb"]))
+
+def main(argv=None):
+    backends = list(make_backends(0.05))
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--backend", action="append", choices=backends,
+                        help="backend to run (default: all available)")
+    parser.add_argument("--workload", action="append", choices=list(WORKLOADS),
+                        help="workload to run (default: all)")
+    parser.add_argument("--size", type=int, default=1000,
+                        help="scale of the workloads (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="runs of each workload (default: %(default)s)")
+    parser.add_argument("--poll-interval", type=float, default=0.05,
+                        help="polling backend interval (default: %(default)s)")
+    parser.add_argument("--settle", type=float, default=1.0,
+                        help="seconds without events before a run ends (default: %(default)s)")
+    parser.add_argument("--dir", help="directory to create workloads in")
+    parser.add_argument("--output", "-o", help="write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.backend or backends, args.workload or list(WORKLOADS),
+                             args.size, args.repeat, args.poll_interval, args.settle,
+                             args.dir)
+    print_results(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(OrderedDict([("meta", metadata(args)), ("results", results)]),
+                      f, indent=2)
+            f.write("\n")
+
+if __name__ == "__main__":
+    main()
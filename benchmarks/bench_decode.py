@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+
+"""Compare the rate of the table-driven inotify event decoding against the
+decode loop of the original read_events()."""
+
+from __future__ import print_function
+
+import sys, os, struct, time, threading
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from fsmonitor.common import FSEvent
+from fsmonitor.compat import PY3
+
+IN_IGNORED = 0x00008000
+
+def make_events(wd, count):
+    """Return a buffer of COUNT raw inotify events for WD."""
+    chunks = []
+    masks = (0x100, 0x002, 0x004, 0x200)   # create, modify, attrib, delete
+    for i in range(count):
+        name = ("file%d" % i).encode("ascii")
+        length = (len(name) + 16) // 16 * 16
+        chunks.append(struct.pack("iIII", wd, masks[i % 4], 0, length))
+        chunks.append(name.ljust(length, b"\0"))
+    return bytearray(b"".join(chunks))
+
+def parse_events(s):
+    i = 0
+    while i + 16 < len(s):
+        wd, mask, cookie, length = struct.unpack_from("iIII", s, i)
+        name = s[i+16:i+16+length].rstrip(b"\0")
+        i += 16 + length
+        yield wd, mask, cookie, name
+
+def baseline_decode(s, wd_to_watch, lock):
+    """The decode loop of the original read_events(), on the bytes S."""
+    from fsmonitor.linux import action_map
+    events = []
+    fsencoding = sys.getfilesystemencoding()
+    for wd, mask, cookie, name in parse_events(s):
+        with lock:
+            watch = wd_to_watch.get(wd)
+        if watch is not None and watch.enabled:
+            bit = 1
+            while bit < 0x10000:
+                if mask & bit:
+                    action = action_map.get(bit)
+                    if action is not None and (action & watch.flags):
+                        if PY3 and isinstance(name, bytes):
+                            name = name.decode(fsencoding)
+                        events.append(FSEvent(watch, action, name))
+                bit <<= 1
+            if mask & IN_IGNORED:
+                with lock:
+                    try:
+                        del wd_to_watch[wd]
+                    except KeyError:
+                        pass
+    return events
+
+def events_per_second(decode, buf, count, repeat=5):
+    best = None
+    for i in range(repeat):
+        start = time.time()
+        decode(buf)
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return count / best
+
+def main(count=20000):
+    from fsmonitor.linux import FSMonitor as LinuxFSMonitor
+    m = LinuxFSMonitor()
+    w = m.add_dir_watch(os.path.dirname(os.path.abspath(__file__)))
+    buf = make_events(w._wd, count)
+    s = bytes(buf)
+    new_rate = events_per_second(lambda b: m._process_events(b, len(b)), buf, count)
+    old_rate = events_per_second(
+        lambda b: baseline_decode(s, {w._wd: w}, threading.Lock()), buf, count)
+    m.close()
+    print("decode: %.0f events/s (baseline %.0f events/s, %.2fx)"
+          % (new_rate, old_rate, new_rate / old_rate))
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+
+"""Compare the size and construction rate of slotted FSEvent and watch
+objects against equivalent dict-backed classes."""
+
+from __future__ import print_function
+
+import sys, os, gc, time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from fsmonitor.common import FSEvent
+from fsmonitor.polling import FSMonitorDirWatch
+
+class DictEvent(object):
+    def __init__(self, watch, action, name=""):
+        self.watch = watch
+        self.name = name
+        self.action = action
+
+class DictWatch(object):
+    def __init__(self, path, flags, user):
+        self.path = path
+        self.flags = flags
+        self.user = user
+        self.enabled = True
+        self._timestamp = 0.0
+        self._contents = None
+        self._deleted = False
+
+def object_size(obj):
+    size = sys.getsizeof(obj)
+    if hasattr(obj, "__dict__"):
+        size += sys.getsizeof(obj.__dict__)
+    return size
+
+def construction_rate(make, count):
+    gc.collect()
+    start = time.time()
+    for i in range(count):
+        make()
+    return count / (time.time() - start)
+
+def new_slotted_watch():
+    watch = FSMonitorDirWatch.__new__(FSMonitorDirWatch)
+    watch.path = "/tmp"
+    watch.flags = FSEvent.All
+    watch.user = None
+    watch.enabled = True
+    watch._timestamp = 0.0
+    watch._contents = None
+    watch._deleted = False
+    return watch
+
+def main(count=500000):
+    pairs = [
+        ("event",
+         lambda: DictEvent(None, FSEvent.Create, "name"),
+         lambda: FSEvent(None, FSEvent.Create, "name")),
+        ("watch",
+         lambda: DictWatch("/tmp", FSEvent.All, None),
+         new_slotted_watch),
+    ]
+    print("%-6s %12s %12s %14s %14s" % ("", "dict bytes", "slots bytes",
+                                        "dict objs/s", "slots objs/s"))
+    for kind, make_dict, make_slots in pairs:
+        print("%-6s %12d %12d %14.0f %14.0f" % (
+            kind,
+            object_size(make_dict()),
+            object_size(make_slots()),
+            construction_rate(make_dict, count),
+            construction_rate(make_slots, count)))
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+
+"""Compare two JSON result files written by bench_backends.py.
+
+The median of the runs of each backend and workload is compared, and
+changes for the worse by more than the threshold are marked as
+regressions. The exit status is 1 if there are any.
+"""
+
+from __future__ import print_function
+
+import sys, json, argparse
+from collections import OrderedDict
+
+# metric -> whether a higher value is better
+METRICS = OrderedDict([
+    ("events_per_second", True),
+    ("latency_ms.p50", False),
+    ("latency_ms.p99", False),
+    ("missed", False),
+    ("setup_seconds", False),
+    ("cpu_seconds", False),
+    ("rss_kb", False),
+])
+
+def metric_value(result, metric):
+    value = result
+    for key in metric.split("."):
+        value = value.get(key)
+        if value is None:
+            return None
+    return value
+
+def median(values):
+    values = sorted(values)
+    if not values:
+        return None
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2.0
+
+def summarize(results):
+    """Return {(backend, workload): {metric: median}} for RESULTS."""
+    runs = OrderedDict()
+    for result in results:
+        runs.setdefault((result["backend"], result["workload"]), []).append(result)
+    summary = OrderedDict()
+    for key, group in runs.items():
+        summary[key] = dict(
+            (metric, median([v for v in (metric_value(r, metric) for r in group)
+                             if v is not None]))
+            for metric in METRICS)
+    return summary
+
+def compare(base, new, threshold=0.1):
+    """Return a list of (backend, workload, metric, base, new, change,
+    regressed) for the backends and workloads in both BASE and NEW."""
+    base = summarize(base["results"])
+    new = summarize(new["results"])
+    rows = []
+    for key in base:
+        if key not in new:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            old_value = base[key][metric]
+            new_value = new[key][metric]
+            if old_value is None or new_value is None:
+                continue
+            if old_value:
+                change = (new_value - old_value) / float(abs(old_value))
+            else:
+                change = 0.0 if new_value == old_value else float("inf")
+            if higher_is_better:
+                regressed = change < -threshold
+            else:
+                regressed = change > threshold
+            rows.append(key + (metric, old_value, new_value, change, regressed))
+    return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("base", help="results of the baseline run")
+    parser.add_argument("new", help="results of the run to compare")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="relative change counted as a regression (default: %(default)s)")
+    args = parser.parse_args(argv)
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+
+    rows = compare(base, new, args.threshold)
+    print("%-9s %-14s %-18s %12s %12s %9s" % (
+        "backend", "workload", "metric", "base", "new", "change"))
+    for backend, workload, metric, old_value, new_value, change, regressed in rows:
+        print("%-9s %-14s %-18s %12.4g %12.4g %+8.1f%%%s" % (
+            backend, workload, metric, old_value, new_value, change * 100,
+            "  REGRESSION" if regressed else ""))
+    return 1 if any(row[-1] for row in rows) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -12,7 +12,10 @@ from __future__ import print_function
 import sys
 import threading
 import traceback
-from .common import FSEvent, FSMonitorError, FSMonitorOSError
+from collections import deque
+from .common import FSEvent, FSMonitorError, FSMonitorOSError, coalesce_events
+from .compat import monotonic
+from .stats import ThreadStats, stamp_events
 
 # set to None when unloaded
 module_loaded = True
@@ -25,12 +28,77 @@ else:
     from .polling import FSMonitor
 
 class FSMonitorThread(threading.Thread):
-    def __init__(self, callback=None, autostart=True, fsmonitor_class=None):
+    """Thread which reads events from an FSMonitor.
+
+    Events are passed to callback one at a time, or as lists to
+    batch_callback, or if there is no callback they are collected to be
+    returned by read_events().
+
+    A batch is the list of events returned by one read of the monitor,
+    split into lists of at most max_batch_size events. If max_batch_delay
+    is set, events from several reads are gathered into one batch until the
+    oldest is max_batch_delay seconds old or max_batch_size is reached.
+
+    If coalesce is true, events are held back until no new events have
+    arrived for quiet_window seconds, or the oldest held event is
+    max_latency seconds old, and then delivered together after merging
+    with coalesce_events().
+
+    Without a callback, max_queue_size limits the number of collected
+    events. When the queue is full, queue_policy decides what happens:
+
+        "block"         stop reading the monitor until there is room,
+                        leaving further events queued in the kernel
+        "drop_oldest"   discard the oldest events to make room
+        "overflow"      discard new events, and end the queue with a
+                        single FSEvent.Overflow event
+
+    If stats is true, the latency of each event from its read to its
+    delivery and the time spent in callbacks are measured in a ThreadStats
+    (see fsmonitor.stats), as reported by get_stats().
+
+    If journal is an EventJournal (see fsmonitor.journal), events are also
+    added to it, so that several consumers can read them with their own
+    cursors. Without a callback, they are then only added to the journal.
+
+    The hooks attribute can be set to an FSMonitorHooks (see
+    fsmonitor.hooks) to be called around the delivery of each list of
+    events. Hooks for reads and scans are set on the monitor.
+    """
+
+    QUEUE_POLICIES = ("block", "drop_oldest", "overflow")
+
+    def __init__(self, callback=None, autostart=True, fsmonitor_class=None,
+                 coalesce=False, quiet_window=0.05, max_latency=0.5,
+                 batch_callback=None, max_batch_size=None, max_batch_delay=None,
+                 max_queue_size=None, queue_policy="block", stats=False,
+                 journal=None):
+        if queue_policy not in self.QUEUE_POLICIES:
+            raise ValueError("Unknown queue policy: %r" % queue_policy)
+        if max_queue_size is not None and max_queue_size < 1:
+            raise ValueError("max_queue_size must be at least 1")
         threading.Thread.__init__(self)
         self.monitor = (fsmonitor_class or FSMonitor)()
         self.callback = callback
-        self._events = []
-        self._events_lock = threading.Lock()
+        self.batch_callback = batch_callback
+        self.max_batch_size = max_batch_size
+        self.max_batch_delay = max_batch_delay
+        self.coalesce = coalesce
+        self.quiet_window = quiet_window
+        self.max_latency = max_latency
+        self.max_queue_size = max_queue_size
+        self.queue_policy = queue_policy
+        self.dropped_events = 0
+        self.stats = ThreadStats() if stats else None
+        self.hooks = None
+        self.journal = journal
+        if queue_policy == "drop_oldest":
+            self._events = deque(maxlen=max_queue_size)
+        else:
+            self._events = deque()
+        self._events_lock = threading.Condition()
+        self._pending = []
+        self._pending_first = self._pending_last = 0.0
         self.daemon = True
         if autostart:
             self.start()
@@ -53,31 +121,174 @@ class FSMonitorThread(threading.Thread):
     def remove_all_watches(self):
         self.monitor.remove_all_watches()
         with self._events_lock:
-            self._events = []
+            self._events.clear()
+            self._events_lock.notify_all()
 
     def run(self):
         while module_loaded and self._running:
             try:
-                events = self.monitor.read_events()
-                if self.callback:
-                    for event in events:
-                        self.callback(event)
-                else:
-                    with self._events_lock:
-                        self._events.extend(events)
+                events = self.monitor.read_events(self._read_timeout())
+                if self.stats is not None and events:
+                    stamp_events(events)
+                if self.coalesce or self.max_batch_delay is not None:
+                    events = self._hold(events)
+                if events:
+                    hooks = self.hooks
+                    if hooks is None:
+                        self._deliver(events)
+                    else:
+                        token = hooks.before_dispatch(self, events)
+                        self._deliver(events)
+                        hooks.after_dispatch(self, token, events)
             except Exception:
                 print("Exception in FSMonitorThread:\n" + traceback.format_exc())
 
+    def _pending_deadline(self):
+        deadline = None
+        if self.coalesce:
+            deadline = min(self._pending_last + self.quiet_window,
+                           self._pending_first + self.max_latency)
+        if self.max_batch_delay is not None:
+            batch_deadline = self._pending_first + self.max_batch_delay
+            if deadline is None or batch_deadline < deadline:
+                deadline = batch_deadline
+        return deadline
+
+    def _read_timeout(self):
+        if not self._pending:
+            return None
+        return max(0.0, self._pending_deadline() - monotonic())
+
+    def _hold(self, events):
+        """Add EVENTS to the held events and return the events which are due."""
+        now = monotonic()
+        if events:
+            if not self._pending:
+                self._pending_first = now
+            self._pending.extend(events)
+            self._pending_last = now
+        if not self._pending:
+            return []
+        if now >= self._pending_deadline() or (
+                self.max_batch_delay is not None and self.max_batch_size and
+                len(self._pending) >= self.max_batch_size):
+            events = self._pending
+            self._pending = []
+            if self.coalesce:
+                events = coalesce_events(events)
+            return events
+        return []
+
+    def _deliver(self, events):
+        if self.journal is not None:
+            self.journal.append(events)
+            if not (self.batch_callback or self.callback):
+                return
+        if self.stats is not None and (self.batch_callback or self.callback):
+            self._deliver_measured(events)
+        elif self.batch_callback:
+            size = self.max_batch_size
+            if size and len(events) > size:
+                for i in range(0, len(events), size):
+                    self.batch_callback(events[i:i+size])
+            else:
+                self.batch_callback(events)
+        elif self.callback:
+            for event in events:
+                self.callback(event)
+        else:
+            self._enqueue(events)
+
+    def _deliver_measured(self, events):
+        stats = self.stats
+        stats.record_latency(events)
+        if self.batch_callback:
+            size = self.max_batch_size
+            if size and len(events) > size:
+                for i in range(0, len(events), size):
+                    stats.call(self.batch_callback, events[i:i+size])
+            else:
+                stats.call(self.batch_callback, events)
+        else:
+            for event in events:
+                stats.call(self.callback, event)
+
+    def _enqueue(self, events):
+        queue = self._events
+        max_size = self.max_queue_size
+        with self._events_lock:
+            if max_size is None:
+                queue.extend(events)
+            elif self.queue_policy == "block":
+                i = 0
+                while i < len(events):
+                    room = max_size - len(queue)
+                    if room > 0:
+                        queue.extend(events[i:i+room])
+                        i += room
+                        self._events_lock.notify_all()
+                    elif self._running:
+                        self._events_lock.wait(0.1)
+                    else:
+                        self.dropped_events += len(events) - i
+                        break
+            elif self.queue_policy == "drop_oldest":
+                self.dropped_events += max(0, len(queue) + len(events) - max_size)
+                queue.extend(events)
+            elif len(queue) + len(events) <= max_size:
+                queue.extend(events)
+            else:
+                room = max(0, max_size - 1 - len(queue))
+                queue.extend(events[:room])
+                self.dropped_events += len(events) - room
+                if not queue or queue[-1].action != FSEvent.Overflow:
+                    if len(queue) >= max_size:
+                        # full: the marker takes the place of the last event
+                        queue.pop()
+                        self.dropped_events += 1
+                    queue.append(FSEvent(None, FSEvent.Overflow))
+            self._events_lock.notify_all()
+
     def stop(self):
         if self.monitor.watches:
             self.remove_all_watches()
             self._running = False
 
-    def read_events(self):
+    def read_events(self, timeout=0):
+        """Return the collected events.
+
+        Waits up to timeout seconds for events to arrive, or indefinitely
+        if timeout is None. The default is not to wait.
+        """
         with self._events_lock:
-            events = self._events
-            self._events = []
-            return events
+            if not self._events and timeout != 0:
+                deadline = None if timeout is None else monotonic() + timeout
+                while not self._events:
+                    if deadline is None:
+                        self._events_lock.wait()
+                    else:
+                        remaining = deadline - monotonic()
+                        if remaining <= 0:
+                            break
+                        self._events_lock.wait(remaining)
+            events = list(self._events)
+            self._events.clear()
+            self._events_lock.notify_all()
+        if self.stats is not None and events:
+            self.stats.record_latency(events)
+        return events
+
+    def get_stats(self):
+        """Return a dict of the thread's stats, if enabled, with the number
+        of queued and dropped events and the stats of the monitor."""
+        stats = self.stats.as_dict() if self.stats is not None else {}
+        with self._events_lock:
+            stats["queued_events"] = len(self._events)
+        stats["dropped_events"] = self.dropped_events
+        get_stats = getattr(self.monitor, "get_stats", None)
+        if get_stats is not None:
+            stats["monitor"] = get_stats()
+        return stats
 
 __all__ = (
     "FSMonitor",
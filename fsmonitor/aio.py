@@ -0,0 +1,165 @@
+# Copyright (c) 2026 The FSMonitor contributors
+#
+# This is free software released under the MIT license.
+# See COPYING file for details, or visit:
+# http://www.opensource.org/licenses/mit-license.php
+#
+# The file is part of FSMonitor, a file-system monitoring library.
+# https://github.com/shaurz/fsmonitor
+
+"""asyncio interface to FSMonitor (Python 3.5.2 or later)."""
+
+import asyncio
+from collections import deque
+from . import FSMonitor
+from .common import FSEvent
+
+class AsyncFSMonitor(object):
+    """Read events from an FSMonitor on an asyncio event loop.
+
+    Monitors with a file descriptor (the Linux inotify backend) are read
+    directly by the event loop using add_reader(). Other monitors, such as
+    the polling backend, are read in the loop's default executor, and
+    rescheduled after polling_interval seconds when a scan finds nothing.
+
+    Events are received with either of:
+
+        events = await monitor.read_events()
+
+        async for events in monitor:
+            ...
+
+    The loop defaults to the running event loop, so from Python 3.7 it must
+    be given when the monitor is created outside of a coroutine or
+    callback. Older versions use the current event loop. All methods must
+    be called from the event loop's thread.
+    """
+
+    def __init__(self, fsmonitor_class=None, loop=None):
+        self.loop = loop or getattr(asyncio, "get_running_loop", asyncio.get_event_loop)()
+        self.monitor = (fsmonitor_class or FSMonitor)()
+        self._events = []
+        self._waiters = deque()
+        self._timer = None
+        self._closed = False
+        fileno = getattr(self.monitor, "fileno", None)
+        self._fd = fileno() if fileno is not None else None
+        if self._fd is not None:
+            self.loop.add_reader(self._fd, self._on_readable)
+        else:
+            self.loop.call_soon(self._start_poll)
+
+    def add_dir_watch(self, path, flags=FSEvent.All, user=None, **kwargs):
+        watch = self.monitor.add_dir_watch(path, flags=flags, user=user, **kwargs)
+        if self._fd is not None:
+            self._schedule_timer()
+        return watch
+
+    def add_file_watch(self, path, flags=FSEvent.All, user=None, **kwargs):
+        watch = self.monitor.add_file_watch(path, flags=flags, user=user, **kwargs)
+        if self._fd is not None:
+            self._schedule_timer()
+        return watch
+
+    def remove_watch(self, watch):
+        self.monitor.remove_watch(watch)
+
+    def remove_all_watches(self):
+        self.monitor.remove_all_watches()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        if self._fd is not None:
+            self.loop.remove_reader(self._fd)
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self.monitor.close()
+        while self._waiters:
+            waiter, stop_iteration = self._waiters.popleft()
+            if not waiter.done():
+                if stop_iteration:
+                    waiter.set_exception(StopAsyncIteration())
+                else:
+                    waiter.set_result([])
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def read_events(self):
+        """Return a future for the next list of events.
+
+        The future's result is an empty list if the monitor is closed.
+        """
+        return self._wait(False)
+
+    def __aiter__(self):
+        return self
+
+    def __anext__(self):
+        return self._wait(True)
+
+    def _wait(self, stop_iteration):
+        waiter = self.loop.create_future()
+        if self._events:
+            events, self._events = self._events, []
+            waiter.set_result(events)
+        elif self._closed:
+            if stop_iteration:
+                waiter.set_exception(StopAsyncIteration())
+            else:
+                waiter.set_result([])
+        else:
+            self._waiters.append((waiter, stop_iteration))
+        return waiter
+
+    def _push(self, events):
+        if not events:
+            return
+        self._events.extend(events)
+        while self._waiters:
+            waiter, stop_iteration = self._waiters.popleft()
+            if not waiter.done():
+                events, self._events = self._events, []
+                waiter.set_result(events)
+                break
+
+    def _on_readable(self):
+        self._push(self.monitor.read_events(0))
+        self._schedule_timer()
+
+    def _on_timer(self):
+        self._timer = None
+        if not self._closed:
+            self._on_readable()
+
+    def _schedule_timer(self):
+        """Wake up when the monitor has events waiting on a timeout, such
+        as unmatched moves in the Linux backend."""
+        pending_timeout = getattr(self.monitor, "pending_timeout", None)
+        timeout = pending_timeout() if pending_timeout is not None else None
+        if timeout is not None and self._timer is None:
+            self._timer = self.loop.call_later(timeout, self._on_timer)
+
+    def _start_poll(self):
+        self._timer = None
+        if not self._closed:
+            future = self.loop.run_in_executor(None, self.monitor.read_events)
+            future.add_done_callback(self._on_polled)
+
+    def _on_polled(self, future):
+        if self._closed:
+            return
+        events = []
+        try:
+            events = future.result()
+        finally:
+            self._push(events)
+            if events:
+                self._timer = self.loop.call_soon(self._start_poll)
+            else:
+                interval = getattr(self.monitor, "polling_interval", 0.5)
+                self._timer = self.loop.call_later(interval, self._start_poll)
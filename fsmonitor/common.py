@@ -14,10 +14,14 @@ class FSMonitorOSError(OSError, FSMonitorError):
     pass
 
 class FSEvent(object):
+    __slots__ = ("watch", "action", "name", "timestamp")
+
     def __init__(self, watch, action, name=""):
         self.watch = watch
         self.name = name
         self.action = action
+        # monotonic time the event was read, when stats are enabled
+        self.timestamp = None
 
     @property
     def action_name(self):
@@ -25,11 +29,11 @@ class FSEvent(object):
 
     @property
     def path(self):
-        return self.watch.path
+        return self.watch.path if self.watch is not None else None
 
     @property
     def user(self):
-        return self.watch.user
+        return self.watch.user if self.watch is not None else None
 
     Access      = 0x01
     Modify      = 0x02
@@ -41,6 +45,13 @@ class FSEvent(object):
     MoveTo      = 0x80
     All         = 0xFF
 
+    # Events were lost, e.g. the kernel event queue overflowed. Not tied
+    # to any watch, so the watch attribute is None.
+    Overflow    = 0x100
+
+    # A MoveFrom and MoveTo pair, see FSMoveEvent.
+    Move        = 0x200
+
     action_names = {
         Access     : "access",
         Modify     : "modify",
@@ -50,4 +61,62 @@ class FSEvent(object):
         DeleteSelf : "delete self",
         MoveFrom   : "move from",
         MoveTo     : "move to",
+        Overflow   : "overflow",
+        Move       : "move",
     }
+
+class FSMoveEvent(FSEvent):
+    """A rename, with the destination in watch and name and the source in
+    src_watch and src_name."""
+
+    __slots__ = ("src_watch", "src_name")
+
+    def __init__(self, watch, name, src_watch, src_name):
+        FSEvent.__init__(self, watch, FSEvent.Move, name)
+        self.src_watch = src_watch
+        self.src_name = src_name
+
+    @property
+    def src_path(self):
+        return self.src_watch.path
+
+_COALESCE_ACTIONS = (FSEvent.Access | FSEvent.Modify | FSEvent.Attrib |
+                     FSEvent.Create | FSEvent.Delete)
+
+def coalesce_events(events):
+    """Merge a burst of events into the smallest equivalent list.
+
+    Repeated Access, Modify and Attrib events for the same watch and name
+    are reported once, and a Create followed by a Delete cancels out along
+    with any events in between. Other events are passed through unchanged
+    and end the run of events they touch.
+    """
+    result = []
+    # (watch, name) -> {action: index in result} since the last Create or Delete
+    runs = {}
+    for event in events:
+        action = event.action
+        if action & _COALESCE_ACTIONS:
+            key = (event.watch, event.name)
+            if action == FSEvent.Create:
+                runs[key] = {action: len(result)}
+            elif action == FSEvent.Delete:
+                run = runs.pop(key, None)
+                if run:
+                    for index in run.values():
+                        result[index] = None
+                    if FSEvent.Create in run:
+                        continue
+                runs[key] = {}
+            else:
+                run = runs.setdefault(key, {})
+                if action in run:
+                    continue
+                run[action] = len(result)
+        else:
+            if event.watch is not None:
+                runs.pop((event.watch, event.name), None)
+            if action == FSEvent.Move:
+                runs.pop((event.src_watch, event.src_name), None)
+        result.append(event)
+    return [event for event in result if event is not None]
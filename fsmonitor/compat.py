@@ -1,3 +1,36 @@
-import sys
+import sys, os, stat
 
 PY3 = sys.version_info[0] >= 3
+
+try:
+    from time import monotonic
+except ImportError:
+    from time import time as monotonic
+
+try:
+    from concurrent.futures import ThreadPoolExecutor
+except ImportError:
+    ThreadPoolExecutor = None
+
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir = None
+
+def list_dir(path):
+    """Return (name, path, is_dir) for each entry of PATH, not following symlinks."""
+    if scandir is not None:
+        return [(entry.name, entry.path, entry.is_dir(follow_symlinks=False))
+                for entry in scandir(path)]
+    entries = []
+    for name in os.listdir(path):
+        subpath = os.path.join(path, name)
+        try:
+            is_dir = stat.S_ISDIR(os.lstat(subpath).st_mode)
+        except OSError:
+            continue
+        entries.append((name, subpath, is_dir))
+    return entries
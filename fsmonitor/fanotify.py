@@ -0,0 +1,602 @@
+# Copyright (c) 2026 The FSMonitor contributors
+#
+# This is free software released under the MIT license.
+# See COPYING file for details, or visit:
+# http://www.opensource.org/licenses/mit-license.php
+#
+# The file is part of FSMonitor, a file-system monitoring library.
+# https://github.com/shaurz/fsmonitor
+
+import sys, os, io, struct, threading, errno, select
+from ctypes import (CDLL, CFUNCTYPE, POINTER, byref, create_string_buffer,
+                    c_int, c_uint, c_uint64, c_char_p, c_void_p, get_errno)
+from .common import FSEvent, FSMonitorError, FSMonitorOSError
+from .filters import make_filter
+from .compat import PY3
+from .linux import strerror, convert_flags, FSMonitor as InotifyFSMonitor
+
+# set to None when unloaded
+module_loaded = True
+
+libc = CDLL("libc.so.6")
+
+try:
+    fanotify_init = CFUNCTYPE(c_int, c_uint, c_uint, use_errno=True)(
+        ("fanotify_init", libc))
+
+    fanotify_mark = CFUNCTYPE(c_int, c_int, c_uint, c_uint64, c_int, c_char_p, use_errno=True)(
+        ("fanotify_mark", libc))
+
+    name_to_handle_at = CFUNCTYPE(c_int, c_int, c_char_p, c_void_p, POINTER(c_int), c_int,
+                                  use_errno=True)(
+        ("name_to_handle_at", libc))
+
+    open_by_handle_at = CFUNCTYPE(c_int, c_int, c_char_p, c_int, use_errno=True)(
+        ("open_by_handle_at", libc))
+except AttributeError:
+    # C library without fanotify
+    fanotify_init = None
+
+# Flags for FANOTIFY_INIT.
+FAN_CLOEXEC          = 0x00000001
+FAN_CLASS_NOTIF      = 0x00000000
+FAN_REPORT_FID       = 0x00000200     # Report the file handle of the object.
+FAN_REPORT_DIR_FID   = 0x00000400     # Report the file handle of the directory.
+FAN_REPORT_NAME      = 0x00000800     # Report the name in the directory.
+FAN_REPORT_DFID_NAME = FAN_REPORT_DIR_FID | FAN_REPORT_NAME
+
+# Flags for FANOTIFY_MARK.
+FAN_MARK_ADD         = 0x00000001
+FAN_MARK_REMOVE      = 0x00000002
+FAN_MARK_DONT_FOLLOW = 0x00000004
+FAN_MARK_ONLYDIR     = 0x00000008
+FAN_MARK_INODE       = 0x00000000     # Mark a file or directory.
+FAN_MARK_MOUNT       = 0x00000010     # Mark every file of a mount.
+FAN_MARK_FILESYSTEM  = 0x00000100     # Mark every file of a filesystem.
+
+# Events, which have the same values as the inotify events.
+FAN_ACCESS           = 0x00000001     # File was accessed.
+FAN_MODIFY           = 0x00000002     # File was modified.
+FAN_ATTRIB           = 0x00000004     # Metadata changed.
+FAN_MOVED_FROM       = 0x00000040     # File was moved from X.
+FAN_MOVED_TO         = 0x00000080     # File was moved to Y.
+FAN_CREATE           = 0x00000100     # Subfile was created.
+FAN_DELETE           = 0x00000200     # Subfile was deleted.
+FAN_DELETE_SELF      = 0x00000400     # Self was deleted.
+FAN_MOVE_SELF        = 0x00000800     # Self was moved.
+FAN_Q_OVERFLOW       = 0x00004000     # Event queued overflowed.
+FAN_EVENT_ON_CHILD   = 0x08000000     # Report events of the children of a directory.
+FAN_ONDIR            = 0x40000000     # Report events of directories.
+
+FAN_ALL_EVENTS = 0xFFF | FAN_ONDIR | FAN_EVENT_ON_CHILD
+
+FAN_DIRENT_EVENTS = FAN_CREATE | FAN_DELETE | FAN_MOVED_FROM | FAN_MOVED_TO
+FAN_SELF_EVENTS = FAN_DELETE_SELF | FAN_MOVE_SELF
+# Events which mount marks and groups without file handles can not report.
+FAN_INODE_EVENTS = FAN_DIRENT_EVENTS | FAN_SELF_EVENTS | FAN_ATTRIB
+
+# Types of the info records following the event metadata.
+FAN_EVENT_INFO_TYPE_FID      = 1
+FAN_EVENT_INFO_TYPE_DFID_NAME = 2
+FAN_EVENT_INFO_TYPE_DFID     = 3
+
+FAN_NOFD = -1
+
+AT_FDCWD = -100
+AT_SYMLINK_FOLLOW = 0x400
+O_PATH = getattr(os, "O_PATH", 0o10000000)
+MAX_HANDLE_SZ = 128
+
+# struct fanotify_event_metadata: event_len, vers, reserved, metadata_len, mask, fd, pid
+event_metadata = struct.Struct("IBBHQii")
+
+# struct fanotify_event_info_header: info_type, pad, len
+info_header = struct.Struct("BBH")
+
+# struct file_handle header: handle_bytes, handle_type (followed by the handle)
+handle_header = struct.Struct("Ii")
+
+# __kernel_fsid_t, which precedes the file handle in an info record
+fsid_struct = struct.Struct("II")
+
+# Offset of handle_bytes in an info record.
+INFO_HANDLE_OFFSET = info_header.size + fsid_struct.size
+
+DEFAULT_READ_SIZE = 65536
+
+# A read must have room for one event with a directory handle and a
+# maximum length name, and an object handle.
+MIN_READ_SIZE = 4096
+
+# Resolved directory paths kept for recursive and mount watches.
+MAX_CACHED_DIRS = 65536
+
+# The actions of each bit, in the order they most likely happened when the
+# kernel merges several events for a name into one.
+action_bits = (
+    (FAN_CREATE,      FSEvent.Create),
+    (FAN_MOVED_TO,    FSEvent.MoveTo),
+    (FAN_ACCESS,      FSEvent.Access),
+    (FAN_MODIFY,      FSEvent.Modify),
+    (FAN_ATTRIB,      FSEvent.Attrib),
+    (FAN_MOVED_FROM,  FSEvent.MoveFrom),
+    (FAN_DELETE,      FSEvent.Delete),
+    (FAN_DELETE_SELF, FSEvent.DeleteSelf),
+)
+
+FAN_ACTION_MASK = 0x7FF
+FAN_ARRIVE = FAN_CREATE | FAN_MOVED_TO
+FAN_LEAVE = FAN_MOVED_FROM | FAN_DELETE | FAN_DELETE_SELF
+
+def make_action_table(bits):
+    return tuple(tuple(action for bit, action in bits if mask & bit)
+                 for mask in range(FAN_ACTION_MASK + 1))
+
+action_table = make_action_table(action_bits)
+
+# for a name which was removed and then created again
+recreate_action_table = make_action_table(action_bits[5:] + action_bits[:5])
+
+def event_actions(mask, path):
+    """Return the actions of MASK, which may be several merged events, for
+    the file at PATH."""
+    mask &= FAN_ACTION_MASK
+    if mask & FAN_ARRIVE and mask & FAN_LEAVE and os.path.lexists(path):
+        return recreate_action_table[mask]
+    return action_table[mask]
+
+def path_fsid(path):
+    """Return the filesystem id of PATH as it appears in fanotify events."""
+    fsid = os.statvfs(path).f_fsid
+    return fsid_struct.pack(fsid & 0xFFFFFFFF, fsid >> 32)
+
+def path_handle(path):
+    """Return the key of PATH in fanotify events, which is the filesystem id
+    followed by the file handle, and the id of its mount."""
+    buf = create_string_buffer(handle_header.size + MAX_HANDLE_SZ)
+    handle_header.pack_into(buf, 0, MAX_HANDLE_SZ, 0)
+    mount_id = c_int()
+    if name_to_handle_at(AT_FDCWD, path, buf, byref(mount_id), AT_SYMLINK_FOLLOW) == -1:
+        err = get_errno()
+        raise FSMonitorOSError(err, strerror(err))
+    size, handle_type = handle_header.unpack_from(buf)
+    return path_fsid(path) + buf.raw[:handle_header.size + size], mount_id.value
+
+def mount_point(path):
+    """Return the mount point of the filesystem containing PATH."""
+    path = os.path.realpath(path)
+    while not os.path.ismount(path):
+        path = os.path.dirname(path)
+    return path
+
+def fd_path(fd):
+    """Return the path of the file open as FD, or None if it was deleted."""
+    path = os.readlink(b"/proc/self/fd/" + str(fd).encode("ascii"))
+    if path.endswith(b" (deleted)"):
+        return None
+    return path
+
+def init_flags(dirent_events):
+    if dirent_events:
+        return FAN_CLOEXEC | FAN_CLASS_NOTIF | FAN_REPORT_FID | FAN_REPORT_DFID_NAME
+    return FAN_CLOEXEC | FAN_CLASS_NOTIF
+
+def fanotify_available(dirent_events=True):
+    """Return whether this process can create a fanotify monitor able to
+    mark whole filesystems, with directory-entry events if DIRENT_EVENTS."""
+    if fanotify_init is None or not hasattr(os.statvfs_result, "f_fsid"):
+        return False
+    fd = fanotify_init(init_flags(dirent_events), os.O_RDONLY)
+    if fd == -1:
+        return False
+    os.close(fd)
+    # a group without file handles can only be created with CAP_SYS_ADMIN,
+    # which marking mounts and filesystems needs
+    fd = fanotify_init(init_flags(False), os.O_RDONLY)
+    if fd == -1:
+        return False
+    os.close(fd)
+    return True
+
+class FSMonitorWatch(object):
+    __slots__ = ("path", "flags", "user", "enabled", "filter",
+                 "_root", "_prefix", "_key", "_mark", "_mark_key", "_mount_fd", "_is_dir")
+
+    def __init__(self, path, flags, user, root, key, mark=FAN_MARK_INODE, is_dir=True):
+        self.path = path
+        self.flags = flags
+        self.user = user
+        self.enabled = True
+        # PathFilter of event names, see fsmonitor.filters
+        self.filter = None
+        # real path, as reported for open files and resolved handles
+        self._root = root
+        self._prefix = root.rstrip(b"/") + b"/"
+        self._key = key
+        self._mark = mark
+        # (mark, fsid or mount id) of a mount or filesystem mark
+        self._mark_key = None
+        # open directory for resolving handles of a mount or filesystem mark
+        self._mount_fd = None
+        self._is_dir = is_dir
+
+    def __repr__(self):
+        return "<FSMonitorWatch %r>" % self.path
+
+class FSMonitor(object):
+    """Linux fanotify file-system monitor.
+
+    A single fanotify mark covers a whole mount or filesystem, so recursive
+    directory watches and add_mount_watch() cost no kernel memory per
+    directory and need no walk of the tree. Marking mounts and filesystems
+    requires CAP_SYS_ADMIN; use create_fsmonitor() to fall back to the
+    inotify monitor when it is missing.
+
+    Create, Delete, MoveFrom, MoveTo, Attrib and DeleteSelf events need
+    Linux 5.9 or later. With older kernels, dirent_events is false and only
+    Access and Modify events are reported. MoveFrom and MoveTo events are
+    not paired into Move events.
+
+    The kernel merges events for the same name which are still queued, and
+    their actions are then reported in the order they most likely happened.
+    Directories of recursive and mount watches are located when the events
+    are read, so events from before a directory was renamed are reported
+    under its new name, and events in directories which were deleted in the
+    meantime may be lost.
+    """
+
+    # for __del__ when the constructor is called with the wrong arguments
+    __fd = None
+
+    def __init__(self, read_size=DEFAULT_READ_SIZE, verifier=None):
+        if fanotify_init is None:
+            raise FSMonitorError("The C library does not support fanotify")
+        if not hasattr(os.statvfs_result, "f_fsid"):
+            raise FSMonitorError("fanotify requires os.statvfs() with f_fsid")
+        if read_size < MIN_READ_SIZE:
+            raise ValueError("read_size must be at least %d bytes" % MIN_READ_SIZE)
+        self.dirent_events = True
+        fd = fanotify_init(init_flags(True), os.O_RDONLY)
+        if fd == -1 and get_errno() == errno.EINVAL:
+            self.dirent_events = False
+            fd = fanotify_init(init_flags(False), os.O_RDONLY | getattr(os, "O_LARGEFILE", 0))
+        if fd == -1:
+            err = get_errno()
+            raise FSMonitorOSError(err, strerror(err))
+        self.__fd = fd
+        self.__file = io.FileIO(fd, "rb", closefd=False)
+        self.__buf = bytearray(read_size)
+        self.read_size = read_size
+        self.verifier = verifier
+        self.__lock = threading.Lock()
+        # handle key -> watch, of inode marks
+        self.__handles = {}
+        # real path -> watch, of inode marks
+        self.__paths = {}
+        # watches of mount and filesystem marks
+        self.__subtrees = []
+        # (mark, fsid or mount id) -> number of watches
+        self.__marks = {}
+        # (mount fd, handle key) -> resolved directory path
+        self.__dirpaths = {}
+
+    def __del__(self):
+        if module_loaded:
+            self.close()
+
+    def close(self):
+        if self.__fd is not None:
+            for watch in self.__subtrees:
+                os.close(watch._mount_fd)
+            self.__subtrees = []
+            os.close(self.__fd)
+            self.__fd = None
+
+    def fileno(self):
+        return self.__fd
+
+    def __event_mask(self, flags, mark, is_dir):
+        mask = convert_flags(flags)
+        if not self.dirent_events or mark == FAN_MARK_MOUNT:
+            mask &= ~FAN_INODE_EVENTS
+        else:
+            mask |= FAN_DELETE_SELF
+            if is_dir:
+                mask |= FAN_ONDIR
+        if is_dir and mark == FAN_MARK_INODE:
+            # events of the files in a watched directory, with or without FIDs
+            mask |= FAN_ONDIR | FAN_EVENT_ON_CHILD
+        if not mask & FAN_ACTION_MASK:
+            raise FSMonitorError("None of the events can be watched with this mark")
+        return mask
+
+    def __mark(self, flags, mask, path, dirfd=AT_FDCWD):
+        if fanotify_mark(self.__fd, flags, mask, dirfd, path) == -1:
+            err = get_errno()
+            raise FSMonitorOSError(err, strerror(err))
+
+    def __add_watch(self, path, flags, user, mark, is_dir, include=None, exclude=None):
+        if PY3 and not isinstance(path, bytes):
+            path = path.encode(sys.getfilesystemencoding())
+        mask = self.__event_mask(flags, mark, is_dir)
+        root = os.path.realpath(path)
+        key = None
+        if self.dirent_events:
+            key, mount_id = path_handle(root)
+        watch = FSMonitorWatch(path, flags, user, root, key, mark, is_dir)
+        watch.filter = make_filter(include, exclude)
+        if mark == FAN_MARK_INODE:
+            self.__mark(FAN_MARK_ADD | (FAN_MARK_ONLYDIR if is_dir else 0), mask, root)
+            with self.__lock:
+                if key is not None:
+                    self.__handles[key] = watch
+                self.__paths[root] = watch
+            return watch
+        watch._mount_fd = os.open(root, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            if mark == FAN_MARK_MOUNT:
+                watch._mark_key = (mark, mount_id if key is not None else root)
+            else:
+                watch._mark_key = (mark, path_fsid(root))
+            self.__mark(FAN_MARK_ADD | mark, mask, None, watch._mount_fd)
+        except Exception:
+            os.close(watch._mount_fd)
+            raise
+        with self.__lock:
+            self.__marks[watch._mark_key] = self.__marks.get(watch._mark_key, 0) + 1
+            self.__subtrees = self.__subtrees + [watch]
+        return watch
+
+    def add_dir_watch(self, path, flags=FSEvent.All, user=None, recursive=False,
+                      include=None, exclude=None):
+        """Watch the directory at PATH.
+
+        A recursive watch marks the whole filesystem containing PATH and
+        reports the events below PATH, named relative to it. Only events for
+        names which match one of the include glob patterns, if any, and none
+        of the exclude patterns are reported.
+        """
+        mark = FAN_MARK_FILESYSTEM if recursive else FAN_MARK_INODE
+        return self.__add_watch(path, flags, user, mark, True, include, exclude)
+
+    def add_mount_watch(self, path, flags=FSEvent.All, user=None, filesystem=True,
+                        include=None, exclude=None):
+        """Watch the whole filesystem containing PATH, or only its mount if
+        FILESYSTEM is false, with a single mark.
+
+        The watch path is the mount point, and event names are relative to
+        it. The kernel reports only Access and Modify events for mounts.
+        """
+        mark = FAN_MARK_FILESYSTEM if filesystem else FAN_MARK_MOUNT
+        path = mount_point(path)
+        return self.__add_watch(path, flags, user, mark, True, include, exclude)
+
+    def add_file_watch(self, path, flags=FSEvent.All, user=None):
+        return self.__add_watch(path, flags, user, FAN_MARK_INODE, False)
+
+    def remove_watch(self, watch):
+        with self.__lock:
+            if watch._mark == FAN_MARK_INODE:
+                if self.__paths.get(watch._root) is not watch:
+                    return False
+                del self.__paths[watch._root]
+                if self.__handles.get(watch._key) is watch:
+                    del self.__handles[watch._key]
+            else:
+                if watch not in self.__subtrees:
+                    return False
+                self.__subtrees = [w for w in self.__subtrees if w is not watch]
+                count = self.__marks.pop(watch._mark_key) - 1
+                if count:
+                    self.__marks[watch._mark_key] = count
+        if watch._mark == FAN_MARK_INODE:
+            return fanotify_mark(self.__fd, FAN_MARK_REMOVE, FAN_ALL_EVENTS,
+                                 AT_FDCWD, watch._root) != -1
+        try:
+            if not count:
+                mask = FAN_ALL_EVENTS
+                if watch._mark == FAN_MARK_MOUNT:
+                    mask &= ~FAN_INODE_EVENTS
+                fanotify_mark(self.__fd, FAN_MARK_REMOVE | watch._mark, mask,
+                              watch._mount_fd, None)
+        finally:
+            os.close(watch._mount_fd)
+        return True
+
+    def remove_all_watches(self):
+        for watch in self.watches:
+            self.remove_watch(watch)
+
+    def enable_watch(self, watch, enable=True):
+        watch.enabled = enable
+
+    def disable_watch(self, watch):
+        watch.enabled = False
+
+    def pending_timeout(self):
+        return None
+
+    def read_events(self, timeout=None):
+        if timeout is not None:
+            rs, ws, xs = select.select([self.__fd], [], [], timeout)
+            if self.__fd not in rs:
+                return []
+
+        buf = self.__buf
+        if len(buf) != self.read_size:
+            if self.read_size < MIN_READ_SIZE:
+                raise ValueError("read_size must be at least %d bytes" % MIN_READ_SIZE)
+            buf = self.__buf = bytearray(self.read_size)
+
+        while True:
+            try:
+                size = self.__file.readinto(buf)
+                break
+            except (OSError, IOError) as e:
+                if e.errno != errno.EINTR:
+                    raise FSMonitorOSError(*e.args)
+
+        if not module_loaded:
+            return []
+        events = self._process_events(buf, size)
+        if self.verifier is not None and events:
+            events = self.verifier.filter(events)
+        return events
+
+    def _process_events(self, buf, size):
+        """Convert the raw fanotify events in the first SIZE bytes of BUF."""
+        events = []
+        unpack_from = event_metadata.unpack_from
+        metadata_size = event_metadata.size
+        i = 0
+        while i + metadata_size <= size:
+            length, version, reserved, metadata_len, mask, fd, pid = unpack_from(buf, i)
+            if length < metadata_size:
+                break
+            end = i + length
+            if mask & FAN_Q_OVERFLOW:
+                self.__dirpaths.clear()
+                events.append(FSEvent(None, FSEvent.Overflow))
+            elif fd != FAN_NOFD:
+                try:
+                    path = fd_path(fd)
+                finally:
+                    os.close(fd)
+                if path is not None:
+                    self.__dispatch_path(mask, path, events)
+            else:
+                self.__dispatch_handles(buf, i + metadata_len, end, mask, events)
+            i = end
+        return events
+
+    def __dispatch_handles(self, buf, i, end, mask, events):
+        """Report the event with info records from offset I to END of BUF."""
+        dir_key = obj_key = name = None
+        while i + INFO_HANDLE_OFFSET + handle_header.size <= end:
+            info_type, pad, info_len = info_header.unpack_from(buf, i)
+            if info_len == 0:
+                break
+            handle_bytes, handle_type = handle_header.unpack_from(buf, i + INFO_HANDLE_OFFSET)
+            key_end = i + INFO_HANDLE_OFFSET + handle_header.size + handle_bytes
+            key = bytes(buf[i + info_header.size:key_end])
+            if info_type == FAN_EVENT_INFO_TYPE_FID:
+                obj_key = key
+            elif info_type == FAN_EVENT_INFO_TYPE_DFID_NAME:
+                dir_key = key
+                name = bytes(buf[key_end:buf.index(b"\0", key_end, i + info_len)])
+            elif info_type == FAN_EVENT_INFO_TYPE_DFID:
+                dir_key = key
+                name = b"."
+            i += info_len
+
+        get_watch = self.__handles.get
+        if obj_key is not None:
+            watch = get_watch(obj_key)
+            if watch is not None and not watch._is_dir:
+                self.__emit(watch, mask, b"", watch._root, events)
+        if dir_key is None:
+            return
+        is_self = name == b"."
+        watch = get_watch(dir_key)
+        if watch is not None and watch._is_dir:
+            if is_self:
+                self.__emit(watch, mask & ~FAN_DIRENT_EVENTS, b"", watch._root, events)
+            else:
+                self.__emit(watch, mask & ~FAN_SELF_EVENTS, name,
+                            os.path.join(watch._root, name), events)
+        moved_dir = mask & FAN_ONDIR and mask & (FAN_MOVED_FROM | FAN_MOVE_SELF)
+        for watch in self.__subtrees:
+            if watch._key[:fsid_struct.size] != dir_key[:fsid_struct.size]:
+                continue
+            if dir_key == watch._key:
+                dirpath = watch._root
+            else:
+                dirpath = self.__resolve(watch._mount_fd, dir_key)
+                if dirpath is None:
+                    continue
+            path = dirpath if is_self else os.path.join(dirpath, name)
+            self.__emit_subtree(watch, mask, path, is_self, events)
+        if moved_dir:
+            # paths of the directories below it are no longer valid
+            self.__dirpaths.clear()
+
+    def __dispatch_path(self, mask, path, events):
+        """Report the event for the open file at PATH."""
+        get_watch = self.__paths.get
+        watch = get_watch(path)
+        if watch is not None:
+            self.__emit(watch, mask, b"", path, events)
+        dirname, name = os.path.split(path)
+        watch = get_watch(dirname)
+        if watch is not None and watch._is_dir:
+            self.__emit(watch, mask, name, path, events)
+        for watch in self.__subtrees:
+            self.__emit_subtree(watch, mask, path, False, events)
+
+    def __emit_subtree(self, watch, mask, path, is_self, events):
+        if path == watch._root:
+            if not is_self:
+                return
+            name = b""
+            mask &= ~FAN_DIRENT_EVENTS
+        elif path.startswith(watch._prefix):
+            name = path[len(watch._prefix):]
+            # removal of a subdirectory is reported as a Delete in its parent
+            mask &= ~FAN_SELF_EVENTS
+        else:
+            return
+        self.__emit(watch, mask, name, path, events)
+
+    def __emit(self, watch, mask, name, path, events):
+        if not watch.enabled:
+            return
+        path_filter = watch.filter
+        if path_filter is not None and name and not path_filter.match(name):
+            return
+        flags = watch.flags
+        decoded = None
+        for action in event_actions(mask, path):
+            if action & flags:
+                if decoded is None:
+                    decoded = name.decode(sys.getfilesystemencoding()) if PY3 else name
+                events.append(FSEvent(watch, action, decoded))
+
+    def __resolve(self, mount_fd, dir_key):
+        """Return the path of the directory with the handle key DIR_KEY on
+        the filesystem of MOUNT_FD, or None if it no longer exists."""
+        cache_key = (mount_fd, dir_key)
+        path = self.__dirpaths.get(cache_key)
+        if path is None:
+            fd = open_by_handle_at(mount_fd, dir_key[fsid_struct.size:], O_PATH)
+            if fd == -1:
+                return None
+            try:
+                path = fd_path(fd)
+            finally:
+                os.close(fd)
+            if path is None:
+                return None
+            if len(self.__dirpaths) >= MAX_CACHED_DIRS:
+                self.__dirpaths.clear()
+            self.__dirpaths[cache_key] = path
+        return path
+
+    @property
+    def watches(self):
+        with self.__lock:
+            return list(self.__paths.values()) + list(self.__subtrees)
+
+# Constructor arguments of the fanotify FSMonitor.
+FSMONITOR_OPTIONS = frozenset(["read_size", "verifier"])
+
+def create_fsmonitor(dirent_events=True, **kwargs):
+    """Return a fanotify FSMonitor if this process can mark whole
+    filesystems, with directory-entry events if DIRENT_EVENTS, or else an
+    inotify FSMonitor. KWARGS are passed to the monitor's constructor, and
+    options which only the inotify monitor has, such as resync, select it."""
+    if fanotify_available(dirent_events) and FSMONITOR_OPTIONS.issuperset(kwargs):
+        try:
+            return FSMonitor(**kwargs)
+        except FSMonitorError:
+            pass
+    return InotifyFSMonitor(**kwargs)
@@ -0,0 +1,123 @@
+# Copyright (c) 2026 The FSMonitor contributors
+#
+# This is free software released under the MIT license.
+# See COPYING file for details, or visit:
+# http://www.opensource.org/licenses/mit-license.php
+#
+# The file is part of FSMonitor, a file-system monitoring library.
+# https://github.com/shaurz/fsmonitor
+
+import os, re, sys
+
+def glob_to_regex(pattern):
+    """Translate a glob PATTERN to a regular expression matching paths
+    relative to the watched directory, with "/" as the separator.
+
+    "*" and "?" do not match "/", and "**" matches anything. A pattern
+    without a "/" matches the last component of a path. A pattern ending in
+    "/**" also matches the directory itself.
+    """
+    anchored = "/" in pattern.rstrip("/")
+    pattern = pattern.strip("/")
+    suffix = ""
+    if pattern.endswith("/**"):
+        pattern = pattern[:-3]
+        suffix = "(?:/.*)?"
+    parts = []
+    i = 0
+    n = len(pattern)
+    while i < n:
+        c = pattern[i]
+        if c == "*":
+            if pattern.startswith("**/", i):
+                parts.append("(?:.*/)?")
+                i += 3
+                continue
+            elif pattern.startswith("**", i):
+                parts.append(".*")
+                i += 2
+                continue
+            parts.append("[^/]*")
+        elif c == "?":
+            parts.append("[^/]")
+        elif c == "[":
+            j = pattern.find("]", i + 2)
+            if j == -1:
+                parts.append("\\[")
+            else:
+                chars = pattern[i+1:j]
+                if chars.startswith("!"):
+                    chars = "^" + chars[1:]
+                parts.append("[" + chars.replace("\\", "\\\\") + "]")
+                i = j
+        else:
+            parts.append(re.escape(c))
+        i += 1
+    prefix = "" if anchored else "(?:.*/)?"
+    return prefix + "".join(parts) + suffix
+
+def to_slashes(path):
+    if isinstance(path, bytes):
+        return path.replace(os.sep.encode("ascii"), b"/")
+    return path.replace(os.sep, "/")
+
+def compile_patterns(patterns):
+    """Compile glob PATTERNS into one (str regex, bytes regex) pair, or
+    return None if there are no patterns."""
+    if patterns is None:
+        return None
+    if isinstance(patterns, (str, bytes)) or not hasattr(patterns, "__iter__"):
+        patterns = [patterns]
+    fsencoding = sys.getfilesystemencoding()
+    regexes = []
+    for pattern in patterns:
+        if isinstance(pattern, bytes):
+            pattern = pattern.decode(fsencoding)
+        regexes.append(glob_to_regex(pattern))
+    if not regexes:
+        return None
+    regex = "(?s)(?:%s)\\Z" % "|".join(regexes)
+    return re.compile(regex), re.compile(regex.encode(fsencoding))
+
+class PathFilter(object):
+    """Filter of the paths of events by include and exclude glob patterns.
+
+    A path passes if it matches one of the include patterns, or there are
+    none, and matches none of the exclude patterns. The patterns are
+    compiled once, and paths can be str or bytes.
+    """
+
+    __slots__ = ("include", "exclude", "_include", "_exclude")
+
+    def __init__(self, include=None, exclude=None):
+        self.include = include
+        self.exclude = exclude
+        self._include = compile_patterns(include)
+        self._exclude = compile_patterns(exclude)
+
+    def __repr__(self):
+        return "<PathFilter include=%r exclude=%r>" % (self.include, self.exclude)
+
+    def match(self, path):
+        """Return whether events for PATH pass the filter."""
+        index = isinstance(path, bytes)
+        if os.sep != "/":
+            path = to_slashes(path)
+        if self._include is not None and self._include[index].match(path) is None:
+            return False
+        return self._exclude is None or self._exclude[index].match(path) is None
+
+    def excluded(self, path):
+        """Return whether PATH matches an exclude pattern. Excluded
+        directories of recursive watches are not watched."""
+        if self._exclude is None:
+            return False
+        if os.sep != "/":
+            path = to_slashes(path)
+        return self._exclude[isinstance(path, bytes)].match(path) is not None
+
+def make_filter(include=None, exclude=None):
+    """Return a PathFilter for the patterns, or None if there are none."""
+    if include is None and exclude is None:
+        return None
+    return PathFilter(include, exclude)
@@ -0,0 +1,121 @@
+# Copyright (c) 2026 The FSMonitor contributors
+#
+# This is free software released under the MIT license.
+# See COPYING file for details, or visit:
+# http://www.opensource.org/licenses/mit-license.php
+#
+# The file is part of FSMonitor, a file-system monitoring library.
+# https://github.com/shaurz/fsmonitor
+
+from __future__ import print_function
+
+import sys, threading
+from .compat import monotonic
+from .stats import Histogram
+
+class FSMonitorHooks(object):
+    """Hooks called at the stages of reading and delivering events.
+
+    Set an instance as the hooks attribute of an inotify or polling
+    FSMonitor, or of an FSMonitorThread, and override the methods for the
+    stages of interest. Each before_* method returns a token, such as a
+    tracing span, which is passed to the matching after_* methods. When
+    hooks is None, the only cost is a check of the attribute per read.
+
+    Read hooks are called by the inotify monitor around each read of the
+    kernel queue, and after_decode once the events have been converted.
+    Scan hooks are called by the polling monitor around the scan of each
+    watch, on its scan pool threads if it has scan_workers. Dispatch
+    hooks are called by FSMonitorThread around the delivery of each list
+    of events to the callbacks or queue.
+    """
+
+    def before_read(self, monitor):
+        return None
+
+    def after_read(self, monitor, token, size):
+        pass
+
+    def after_decode(self, monitor, token, events):
+        pass
+
+    def before_scan(self, monitor, watch):
+        return None
+
+    def after_scan(self, monitor, token, watch, events):
+        pass
+
+    def before_dispatch(self, thread, events):
+        return None
+
+    def after_dispatch(self, thread, token, events):
+        pass
+
+class StageTimer(FSMonitorHooks):
+    """Hooks which time each stage in histograms, for every sample_every-th
+    read, scan or dispatch, and print them with dump().
+
+    The stages are read (the read system call), decode, scan and dispatch.
+    """
+
+    STAGES = ("read", "decode", "scan", "dispatch")
+
+    def __init__(self, sample_every=1):
+        self.sample_every = sample_every
+        self.histograms = dict((stage, Histogram()) for stage in self.STAGES)
+        self.__counts = dict((stage, 0) for stage in self.STAGES)
+        self.__lock = threading.Lock()
+
+    def __sample(self, stage):
+        with self.__lock:
+            count = self.__counts[stage] = self.__counts[stage] + 1
+        return count % self.sample_every == 0
+
+    def __add(self, stage, start):
+        now = monotonic()
+        with self.__lock:
+            self.histograms[stage].add(now - start)
+        return now
+
+    def before_read(self, monitor):
+        return [monotonic()] if self.__sample("read") else None
+
+    def after_read(self, monitor, token, size):
+        if token is not None:
+            token[0] = self.__add("read", token[0])
+
+    def after_decode(self, monitor, token, events):
+        if token is not None:
+            self.__add("decode", token[0])
+
+    def before_scan(self, monitor, watch):
+        return monotonic() if self.__sample("scan") else None
+
+    def after_scan(self, monitor, token, watch, events):
+        if token is not None:
+            self.__add("scan", token)
+
+    def before_dispatch(self, thread, events):
+        return monotonic() if self.__sample("dispatch") else None
+
+    def after_dispatch(self, thread, token, events):
+        if token is not None:
+            self.__add("dispatch", token)
+
+    def as_dict(self):
+        with self.__lock:
+            return dict((stage, h.as_dict()) for stage, h in self.histograms.items())
+
+    def dump(self, file=None):
+        """Print the count, mean and percentiles of each stage in milliseconds."""
+        file = file or sys.stderr
+        stats = self.as_dict()
+        print("%-9s %8s %10s %10s %10s %10s" % (
+            "stage", "count", "mean ms", "p50 ms", "p99 ms", "max ms"), file=file)
+        for stage in self.STAGES:
+            s = stats[stage]
+            if not s["count"]:
+                continue
+            print("%-9s %8d %10.3f %10.3f %10.3f %10.3f" % (
+                stage, s["count"], s["mean"] * 1000, s["p50"] * 1000,
+                s["p99"] * 1000, s["max"] * 1000), file=file)
@@ -0,0 +1,145 @@
+# Copyright (c) 2026 The FSMonitor contributors
+#
+# This is free software released under the MIT license.
+# See COPYING file for details, or visit:
+# http://www.opensource.org/licenses/mit-license.php
+#
+# The file is part of FSMonitor, a file-system monitoring library.
+# https://github.com/shaurz/fsmonitor
+
+import threading
+from .common import FSMonitorError
+from .compat import monotonic
+
+DEFAULT_CAPACITY = 65536
+
+class JournalOverrun(FSMonitorError):
+    """Events were dropped from the journal before a cursor read them.
+
+    lost is the number of events the cursor missed, and first the sequence
+    number of the oldest event still in the journal, where the cursor
+    continues from.
+    """
+
+    def __init__(self, lost, first):
+        FSMonitorError.__init__(self, "Cursor fell behind: %d events lost" % lost)
+        self.lost = lost
+        self.first = first
+
+class EventJournal(object):
+    """Ring buffer of the last capacity events, numbered in sequence from 0.
+
+    Events are added with append(), for example by
+    FSMonitorThread(journal=...), and read by any number of consumers, each
+    with its own JournalCursor. Consumers share the event objects and do not
+    hold back the writer: a cursor which falls more than capacity events
+    behind raises JournalOverrun.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self.__ring = [None] * capacity
+        # sequence number of the next event
+        self.__next = 0
+        self.__closed = False
+        self.__cond = threading.Condition(threading.Lock())
+
+    @property
+    def first_seq(self):
+        """Sequence number of the oldest event in the journal."""
+        return max(0, self.__next - self.capacity)
+
+    @property
+    def next_seq(self):
+        """Sequence number the next event will have."""
+        return self.__next
+
+    def __len__(self):
+        return min(self.__next, self.capacity)
+
+    def append(self, events):
+        """Add EVENTS to the journal, dropping the oldest events if it is full."""
+        ring = self.__ring
+        capacity = self.capacity
+        with self.__cond:
+            seq = self.__next
+            if len(events) >= capacity:
+                seq += len(events) - capacity
+                events = events[-capacity:]
+            for evt in events:
+                ring[seq % capacity] = evt
+                seq += 1
+            self.__next = seq
+            self.__cond.notify_all()
+
+    def close(self):
+        """Wake up readers waiting for events. Reads no longer wait."""
+        with self.__cond:
+            self.__closed = True
+            self.__cond.notify_all()
+
+    def cursor(self, from_start=False):
+        """Return a cursor reading the events added from now on, or all the
+        events in the journal if FROM_START."""
+        return JournalCursor(self, self.first_seq if from_start else self.__next)
+
+    def _read(self, cursor, max_events, timeout):
+        with self.__cond:
+            if self.__next == cursor.seq and timeout != 0 and not self.__closed:
+                deadline = None if timeout is None else monotonic() + timeout
+                while self.__next == cursor.seq and not self.__closed:
+                    if deadline is None:
+                        self.__cond.wait()
+                    else:
+                        remaining = deadline - monotonic()
+                        if remaining <= 0:
+                            break
+                        self.__cond.wait(remaining)
+            start = cursor.seq
+            first = self.first_seq
+            if start < first:
+                cursor.seq = first
+                raise JournalOverrun(first - start, first)
+            end = self.__next
+            if max_events is not None and end - start > max_events:
+                end = start + max_events
+            capacity = self.capacity
+            i = start % capacity
+            j = i + (end - start)
+            if j <= capacity:
+                events = self.__ring[i:j]
+            else:
+                events = self.__ring[i:] + self.__ring[:j - capacity]
+            cursor.seq = end
+        return start, events
+
+class JournalCursor(object):
+    """A consumer's position in an EventJournal."""
+
+    __slots__ = ("journal", "seq")
+
+    def __init__(self, journal, seq):
+        self.journal = journal
+        # sequence number of the next event to read
+        self.seq = seq
+
+    def __repr__(self):
+        return "<JournalCursor seq=%d>" % self.seq
+
+    @property
+    def pending(self):
+        """Number of events waiting to be read, including lost events."""
+        return self.journal.next_seq - self.seq
+
+    def read(self, max_events=None, timeout=0):
+        """Return (seq, events): the events after the cursor, up to
+        max_events, and the sequence number of the first of them.
+
+        Waits up to timeout seconds for events to arrive, or indefinitely
+        if timeout is None. The default is not to wait. If events were lost
+        since the last read, raises JournalOverrun and moves the cursor to
+        the oldest event in the journal.
+        """
+        return self.journal._read(self, max_events, timeout)
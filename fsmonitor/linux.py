@@ -7,10 +7,17 @@
 # The file is part of FSMonitor, a file-system monitoring library.
 # https://github.com/shaurz/fsmonitor
 
-import sys, os, struct, threading, errno, select
+import sys, os, io, struct, threading, errno, select, fcntl, termios
+from collections import OrderedDict
+from itertools import chain
 from ctypes import CDLL, CFUNCTYPE, POINTER, c_int, c_char_p, c_uint32, get_errno
-from .common import FSEvent, FSMonitorOSError
-from .compat import PY3
+from .common import FSEvent, FSMoveEvent, FSMonitorError, FSMonitorOSError
+from .filters import make_filter
+from .compat import PY3, list_dir, monotonic
+from .snapshot import (stat_state, dir_snapshot, state_is_dir, diff_snapshots,
+                       SnapshotStore, SNAPSHOT_FILE, SNAPSHOT_DIR, SNAPSHOT_TREE)
+from .polling import FSMonitor as PollingFSMonitor
+from .stats import MonitorStats, stamp_events
 
 # set to None when unloaded
 module_loaded = True
@@ -57,6 +64,21 @@ IN_MASK_ADD      = 0x20000000     # Add to the mask of an already existing watch
 IN_ISDIR         = 0x40000000     # Event occurred against dir.
 IN_ONESHOT       = 0x80000000     # Only send event once.
 
+INOTIFY_PROC_DIR = "/proc/sys/fs/inotify"
+
+def inotify_limits():
+    """Return a dict of the kernel's inotify limits, max_user_watches,
+    max_user_instances and max_queued_events, with None for any limit which
+    can not be read."""
+    limits = {}
+    for name in ("max_user_watches", "max_user_instances", "max_queued_events"):
+        try:
+            with open(os.path.join(INOTIFY_PROC_DIR, name)) as f:
+                limits[name] = int(f.read())
+        except (IOError, OSError, ValueError):
+            limits[name] = None
+    return limits
+
 action_map = {
     IN_ACCESS      : FSEvent.Access,
     IN_MODIFY      : FSEvent.Modify,
@@ -79,6 +101,16 @@ flags_map = {
     FSEvent.MoveTo     : IN_MOVED_TO,
 }
 
+MOVE_ACTIONS = FSEvent.MoveFrom | FSEvent.MoveTo
+
+# The inotify mask bits which map to actions.
+IN_ACTION_MASK = 0x7FF
+
+# The actions for each value of (mask & IN_ACTION_MASK), in bit order.
+action_table = tuple(
+    tuple(action for bit, action in sorted(action_map.items()) if mask & bit)
+    for mask in range(IN_ACTION_MASK + 1))
+
 def convert_flags(flags):
     os_flags = 0
     flag = 1
@@ -88,34 +120,226 @@ def convert_flags(flags):
         flag <<= 1
     return os_flags
 
-def parse_events(s):
+# struct inotify_event header: wd, mask, cookie, len (followed by the name)
+event_header = struct.Struct("iIII")
+
+# Default number of bytes requested from the inotify fd per read.
+DEFAULT_READ_SIZE = 65536
+
+# Defaults for pairing MoveFrom and MoveTo events into Move events.
+DEFAULT_MOVE_TIMEOUT = 0.1
+DEFAULT_MAX_PENDING_MOVES = 1024
+
+# A read must have room for at least one event with a maximum length name.
+MIN_READ_SIZE = event_header.size + 256
+
+def decode_events(buf, size):
+    """Iterate over the raw events in the first SIZE bytes of BUF.
+
+    Yields (wd, mask, cookie, name_offset, name_length) tuples. The name
+    is not copied out of BUF, see event_name().
+    """
+    unpack_from = event_header.unpack_from
+    header_size = event_header.size
     i = 0
-    while i + 16 < len(s):
-        wd, mask, cookie, length = struct.unpack_from("iIII", s, i)
-        name = s[i+16:i+16+length].rstrip(b"\0")
-        i += 16 + length
-        yield wd, mask, cookie, name
+    while i + header_size <= size:
+        wd, mask, cookie, length = unpack_from(buf, i)
+        i += header_size
+        yield wd, mask, cookie, i, length
+        i += length
+
+def event_name(buf, offset, length):
+    end = buf.find(b"\0", offset, offset + length)
+    if end == -1:
+        end = offset + length
+    return memoryview(buf)[offset:end].tobytes()
+
+def parse_events(s):
+    for wd, mask, cookie, offset, length in decode_events(s, len(s)):
+        yield wd, mask, cookie, event_name(s, offset, length)
+
+# Events needed to keep the directory tree of a recursive watch up to date.
+IN_RECURSIVE_FLAGS = IN_CREATE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE_SELF | IN_ONLYDIR
+
+# Event of a read of a watched directory, or of a directory in one.
+IN_DIR_ACCESS = IN_ACCESS | IN_ISDIR
+
+# Events after which the state of an entry in a resync snapshot is unknown.
+IN_SNAPSHOT_CHANGE = IN_CREATE | IN_MOVED_TO | IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE
+IN_SNAPSHOT_REMOVE = IN_DELETE | IN_MOVED_FROM | IN_DELETE_SELF
+
+def refresh_snapshot(path, snapshot):
+    """Return a copy of SNAPSHOT, the snapshot of PATH, with the entry
+    states which are unknown read again. Entries which no longer exist are
+    left out. A file watch snapshot has the single name b"" for PATH."""
+    snapshot = dict(snapshot)
+    for name, state in list(snapshot.items()):
+        if state is None:
+            try:
+                if name:
+                    snapshot[name] = stat_state(os.lstat(os.path.join(path, name)))
+                else:
+                    snapshot[name] = stat_state(os.stat(path))
+            except OSError:
+                del snapshot[name]
+    return snapshot
+
+def unknown_changes(old, new):
+    """Yield (Modify, name) for each entry of snapshot OLD with an unknown
+    state which is still a file in snapshot NEW, as it may have changed."""
+    for name, state in old.items():
+        if state is None and name in new and not state_is_dir(new[name]):
+            yield FSEvent.Modify, name
 
 class FSMonitorWatch(object):
-    def __init__(self, wd, path, flags, user):
+    __slots__ = ("_wd", "_dirname", "_basename", "flags", "user", "enabled", "filter",
+                 "_is_dir", "_nodes", "_snapshots")
+
+    def __init__(self, wd, path, flags, user, is_dir=True, recursive=False, dirnames=None):
         self._wd = wd
-        self.path = path
+        # The path is split so that watches in the same directory share the
+        # dirname interned in DIRNAMES.
+        dirname, self._basename = os.path.split(path)
+        if dirnames is not None:
+            dirname = dirnames.setdefault(dirname, dirname)
+        self._dirname = dirname
         self.flags = flags
         self.user = user
         self.enabled = True
+        # PathFilter of event names, see fsmonitor.filters
+        self.filter = None
+        self._is_dir = is_dir
+        # wd -> _DirNode for each directory of a recursive watch
+        self._nodes = {wd: _DirNode(wd, None, b"")} if recursive else None
+        # wd -> {name: state} for each watched directory, in resync mode
+        self._snapshots = None
 
     def __repr__(self):
         return "<FSMonitorWatch %r>" % self.path
 
+    @property
+    def path(self):
+        return os.path.join(self._dirname, self._basename)
+
+class _DirNode(object):
+    __slots__ = ("wd", "parent", "name", "children", "active")
+
+    def __init__(self, wd, parent, name, active=0):
+        self.wd = wd
+        self.parent = parent
+        self.name = name
+        self.children = {}
+        # read count of the last event in this directory
+        self.active = active
+
+def node_relpath(node, name=b""):
+    """Path of NAME relative to the root of the recursive watch containing NODE."""
+    parts = [name] if name else []
+    while node.parent is not None:
+        parts.append(node.name)
+        node = node.parent
+    parts.reverse()
+    return b"/".join(parts)
+
+def node_at(root, relpath):
+    """Node of the directory at RELPATH below node ROOT, or None."""
+    node = root
+    if relpath:
+        for name in relpath.split(b"/"):
+            if node is None:
+                break
+            node = node.children.get(name)
+    return node
+
 class FSMonitor(object):
-    def __init__(self):
+    """Linux inotify file-system monitor.
+
+    If resync is true, a stat snapshot of each watched directory is kept so
+    that after the kernel event queue overflows the watches can be rescanned,
+    and the changes that were lost reported as Create, Delete, Modify and
+    Attrib events following the Overflow event.
+
+    If pair_moves is true, MoveFrom and MoveTo events with the same inotify
+    cookie are reported as a single Move event (an FSMoveEvent), even when
+    they belong to different watches. A MoveFrom which is not matched within
+    move_timeout seconds, or is pushed out of the table of max_pending_moves
+    unmatched moves, is reported as a Delete. An unmatched MoveTo is reported
+    as a Create.
+
+    If snapshot_dir is given, snapshots are kept as in resync mode and saved
+    there by checkpoint() and close(). When a watch is added for a path with
+    a saved snapshot, the changes made since it was saved are returned by
+    the next call to read_events.
+
+    If verifier is a ContentVerifier (see fsmonitor.verify), Modify events
+    for files whose contents did not change are dropped.
+
+    If fallback_polling is true, running out of inotify watches (ENOSPC) is
+    not an error. The least recently active subdirectories of recursive
+    watches are moved to an internal polling monitor to free watches, and
+    directories which still can not be watched are polled. Their events are
+    reported as events of the recursive watch, as usual. See get_limits().
+
+    If stats is true, the reads are counted in a MonitorStats (see
+    fsmonitor.stats) and each event is stamped with the monotonic time it
+    was read. See get_stats().
+
+    The hooks attribute can be set to an FSMonitorHooks (see
+    fsmonitor.hooks) to be called around each read.
+
+    The reads of directories by the monitor itself, to watch new
+    subdirectories or take snapshots, are not reported as Access events.
+    """
+
+    # for __del__ when the constructor is called with the wrong arguments
+    __fd = None
+    __poller = None
+
+    def __init__(self, read_size=DEFAULT_READ_SIZE, resync=False, pair_moves=False,
+                 move_timeout=DEFAULT_MOVE_TIMEOUT,
+                 max_pending_moves=DEFAULT_MAX_PENDING_MOVES, snapshot_dir=None,
+                 verifier=None, fallback_polling=False, stats=False):
+        self.__fd = None
+        self.stats = MonitorStats() if stats else None
+        self.hooks = None
+        self.__poller = None
+        self.verifier = verifier
+        self.__store = None if snapshot_dir is None else SnapshotStore(snapshot_dir)
+        # watch -> state last saved to the snapshot store
+        self.__saved = {}
+        self.__catchup = []
+        if read_size < MIN_READ_SIZE:
+            raise ValueError("read_size must be at least %d bytes" % MIN_READ_SIZE)
         fd = inotify_init()
         if fd == -1:
             errno = get_errno()
             raise FSMonitorOSError(errno, strerror(errno))
         self.__fd = fd
+        self.__file = io.FileIO(fd, "rb", closefd=False)
+        self.__buf = bytearray(read_size)
+        self.read_size = read_size
+        self.resync = resync
+        self.pair_moves = pair_moves
+        self.move_timeout = move_timeout
+        self.max_pending_moves = max_pending_moves
+        # cookie -> (deadline, watch, name) of unmatched MoveFrom events
+        self.__pending_moves = OrderedDict()
+        # cookie -> (watch, node) of the recursive watch directories moved
+        # away in the current read, until the IN_MOVED_TO with the cookie
+        self.__moved_nodes = {}
         self.__lock = threading.Lock()
         self.__wd_to_watch = {}
+        self.__dirnames = {}
+        self.fallback_polling = fallback_polling
+        # number of reads, for the activity of recursive watch directories
+        self.__tick = 0
+        # (wd, name) of the IN_DIR_ACCESS events of the monitor's own reads
+        # of directories, which are dropped while scans are in progress and
+        # until the bytes queued when the last one ended have been read
+        self.__scan_keys = set()
+        self.__scans = 0
+        self.__scan_end = 0
+        self.__read_bytes = 0
 
     def __del__(self):
         if module_loaded:
@@ -123,35 +347,576 @@ class FSMonitor(object):
 
     def close(self):
         if self.__fd is not None:
+            if self.__store is not None:
+                self.checkpoint()
             os.close(self.__fd)
             self.__fd = None
+        if self.__poller is not None:
+            self.__poller.close()
+            self.__poller = None
 
-    def _add_watch(self, path, flags, user, inotify_flags=0):
+    def fileno(self):
+        return self.__fd
+
+    def __new_watch(self, path, flags, user, inotify_flags=0, recursive=False):
+        """Create a watch which is not yet in the wd map."""
         inotify_flags |= convert_flags(flags) | IN_DELETE_SELF
         if PY3 and not isinstance(path, bytes):
             path = path.encode(sys.getfilesystemencoding())
-        wd = inotify_add_watch(self.__fd, path, inotify_flags)
-        if wd == -1:
-            errno = get_errno()
-            raise FSMonitorOSError(errno, strerror(errno))
-        watch = FSMonitorWatch(wd, path, flags, user)
+        while True:
+            wd = inotify_add_watch(self.__fd, path, inotify_flags)
+            if wd != -1:
+                break
+            err = get_errno()
+            if not (err == errno.ENOSPC and self.fallback_polling
+                    and self.__evict_subtrees()):
+                raise FSMonitorOSError(err, strerror(err))
+        is_dir = bool(inotify_flags & IN_ONLYDIR)
+        watch = FSMonitorWatch(wd, path, flags, user, is_dir, recursive, self.__dirnames)
+        if recursive:
+            watch._nodes[wd].active = self.__tick
+        if self.resync or self.__store is not None:
+            watch._snapshots = {}
+            if not recursive:
+                scan = is_dir and self.__begin_scan(watch)
+                try:
+                    if scan:
+                        self.__note_scan(wd)
+                    watch._snapshots[wd] = self.__take_snapshot(watch, path)
+                finally:
+                    if scan:
+                        self.__end_scan()
+        return watch
+
+    def _add_watch(self, path, flags, user, inotify_flags=0, recursive=False):
+        watch = self.__new_watch(path, flags, user, inotify_flags, recursive)
         with self.__lock:
-            self.__wd_to_watch[wd] = watch
+            self.__wd_to_watch[watch._wd] = watch
         return watch
 
-    def add_dir_watch(self, path, flags=FSEvent.All, user=None):
-        return self._add_watch(path, flags, user, IN_ONLYDIR)
+    def add_dir_watches(self, paths, flags=FSEvent.All, user=None):
+        """Watch each directory in PATHS, not recursively, and return the
+        list of watches. The watches are added to the watch table in one go.
+        If any directory can not be watched, none of them are."""
+        watches = []
+        try:
+            for path in paths:
+                watches.append(self.__new_watch(path, flags, user, IN_ONLYDIR))
+        except Exception:
+            for watch in watches:
+                inotify_rm_watch(self.__fd, watch._wd)
+            raise
+        with self.__lock:
+            wd_to_watch = self.__wd_to_watch
+            for watch in watches:
+                wd_to_watch[watch._wd] = watch
+        if self.__store is not None:
+            for watch in watches:
+                self.__catch_up(watch)
+        return watches
+
+    def __begin_scan(self, watch):
+        """Start reading directories of WATCH. Returns whether the reads
+        must be recorded with __note_scan and ended with __end_scan, as
+        the kernel reports them as Access events of the watch."""
+        if not (watch.flags & FSEvent.Access):
+            return False
+        with self.__lock:
+            self.__scans += 1
+        return True
+
+    def __note_scan(self, wd, node=None):
+        """Record a read of the directory of WD, or of recursive watch NODE."""
+        self.__scan_keys.add((wd, b""))
+        if node is not None and node.parent is not None:
+            self.__scan_keys.add((node.parent.wd, node.name))
+
+    def __begin_poll_scan(self, roots):
+        """Start scanning the polled directories at ROOTS, (watch, relpath)
+        pairs, which are reads of directories in their parent's inotify
+        watch. Returns whether the scan must be ended with __end_scan."""
+        keys = []
+        for watch, relpath in roots:
+            if watch.flags & FSEvent.Access:
+                parent_relpath, sep, name = relpath.rpartition(b"/")
+                parent = node_at(watch._nodes.get(watch._wd), parent_relpath)
+                if parent is not None:
+                    keys.append((parent.wd, name))
+        if not keys:
+            return False
+        self.__scan_keys.update(keys)
+        with self.__lock:
+            self.__scans += 1
+        return True
+
+    def __end_scan(self):
+        end = self.__read_bytes + self.queued_bytes()
+        with self.__lock:
+            self.__scans -= 1
+            self.__scan_end = max(self.__scan_end, end)
+
+    def __take_snapshot(self, watch, path):
+        try:
+            if watch._is_dir:
+                return dir_snapshot(path)
+            else:
+                return {b"": stat_state(os.stat(path))}
+        except OSError:
+            return {}
+
+    def add_dir_watch(self, path, flags=FSEvent.All, user=None, recursive=False,
+                      include=None, exclude=None):
+        """Watch the directory at PATH.
+
+        Only events for names which match one of the include glob patterns,
+        if any, and none of the exclude patterns are reported. Directories
+        matching an exclude pattern are left out of recursive watches.
+        """
+        if not recursive:
+            watch = self._add_watch(path, flags, user, IN_ONLYDIR)
+            watch.filter = make_filter(include, exclude)
+        else:
+            watch = self._add_watch(path, flags, user, IN_RECURSIVE_FLAGS, recursive=True)
+            watch.filter = make_filter(include, exclude)
+            try:
+                self.__walk_tree(watch, watch._nodes[watch._wd], watch.path, None, True)
+            except Exception:
+                self.remove_watch(watch)
+                raise
+        if self.__store is not None:
+            self.__catch_up(watch)
+        return watch
 
     def add_file_watch(self, path, flags=FSEvent.All, user=None):
-        return self._add_watch(path, flags, user)
+        watch = self._add_watch(path, flags, user)
+        if self.__store is not None:
+            self.__catch_up(watch)
+        return watch
+
+    def __watch_state(self, watch):
+        """Return the (kind, state) of WATCH to save in the snapshot store.
+        Entries whose state became unknown are read again."""
+        if watch._nodes is not None:
+            with self.__lock:
+                nodes = list(watch._nodes.items())
+            tree = {}
+            for wd, node in nodes:
+                snapshot = watch._snapshots.get(wd)
+                if snapshot is not None:
+                    relpath = node_relpath(node)
+                    path = os.path.join(watch.path, relpath) if relpath else watch.path
+                    tree[relpath] = (None, refresh_snapshot(path, snapshot))
+            return SNAPSHOT_TREE, tree
+        snapshot = refresh_snapshot(watch.path, watch._snapshots.get(watch._wd, {}))
+        if watch._is_dir:
+            return SNAPSHOT_DIR, snapshot
+        return SNAPSHOT_FILE, snapshot.get(b"")
+
+    def __catch_up(self, watch):
+        """Queue events for the changes to WATCH since its state was saved."""
+        kind, state = self.__watch_state(watch)
+        saved = self.__store.load(watch.path)
+        if saved is None or saved[0] != kind:
+            return
+        old = saved[2]
+        self.__saved[watch] = old
+        if kind == SNAPSHOT_FILE:
+            if old is not None and state is not None and old != state:
+                old = {b"": (None, {b"": old})}
+                state = {b"": (None, {b"": state})}
+            else:
+                return
+        elif kind == SNAPSHOT_DIR:
+            old = {b"": (None, old)}
+            state = {b"": (None, state)}
+        fsencoding = sys.getfilesystemencoding()
+        flags = watch.flags if watch.enabled else 0
+        events = self.__catchup
+        for relpath in sorted(set(old) | set(state)):
+            old_entries = old.get(relpath, (None, {}))[1]
+            new_entries = state.get(relpath, (None, {}))[1]
+            for action, name in diff_snapshots(old_entries, new_entries):
+                if not watch._is_dir:
+                    # a file which was replaced is reported as modified
+                    if action == FSEvent.Delete:
+                        continue
+                    if action == FSEvent.Create:
+                        action = FSEvent.Modify
+                if action & flags:
+                    if relpath:
+                        name = relpath + b"/" + name
+                    if watch.filter is not None and not watch.filter.match(name):
+                        continue
+                    if PY3:
+                        name = name.decode(fsencoding)
+                    events.append(FSEvent(watch, action, name))
+
+    def checkpoint(self):
+        """Save the snapshot of each watch which changed since it was last saved."""
+        if self.__store is None:
+            raise FSMonitorError("No snapshot_dir was given")
+        for watch in self.watches:
+            kind, state = self.__watch_state(watch)
+            if self.__saved.get(watch) != state:
+                self.__store.save(watch.path, kind, state)
+                self.__saved[watch] = state
+
+    def __add_subdir(self, watch, parent, name, path, strict):
+        mask = convert_flags(watch.flags) | IN_RECURSIVE_FLAGS | IN_DONT_FOLLOW
+        while True:
+            wd = inotify_add_watch(self.__fd, path, mask)
+            if wd != -1:
+                break
+            err = get_errno()
+            if err == errno.ENOSPC and self.fallback_polling:
+                if self.__evict_subtrees():
+                    continue
+                self.__poll_subtree(watch, node_relpath(parent, name), path)
+                return None
+            if strict and err not in (errno.ENOENT, errno.ENOTDIR, errno.EACCES):
+                raise FSMonitorOSError(err, strerror(err))
+            return None
+        with self.__lock:
+            if wd in self.__wd_to_watch:
+                # already watched, e.g. a bind mount inside the tree
+                return None
+            node = _DirNode(wd, parent, name, self.__tick)
+            parent.children[name] = node
+            watch._nodes[wd] = node
+            self.__wd_to_watch[wd] = watch
+        return node
+
+    def __walk_tree(self, watch, node, path, events, strict=False):
+        """Watch all directories below NODE. If EVENTS is a list, a Create
+        event is appended for every entry found, for entries which were
+        created before their directory was watched."""
+        scan = self.__begin_scan(watch)
+        try:
+            self.__walk_nodes(watch, node, path, events, strict, scan)
+        finally:
+            if scan:
+                self.__end_scan()
+
+    def __walk_nodes(self, watch, node, path, events, strict, scan):
+        fsencoding = sys.getfilesystemencoding()
+        stack = [(node, path)]
+        while stack:
+            node, path = stack.pop()
+            if watch._nodes.get(node.wd) is not node:
+                # moved to polling while the tree was walked
+                continue
+            if scan:
+                self.__note_scan(node.wd, node)
+            try:
+                if watch._snapshots is not None:
+                    snapshot = dir_snapshot(path)
+                    watch._snapshots[node.wd] = snapshot
+                    entries = [(name, os.path.join(path, name), state_is_dir(state))
+                               for name, state in snapshot.items()]
+                else:
+                    entries = list_dir(path)
+            except OSError as e:
+                if strict and e.errno not in (errno.ENOENT, errno.ENOTDIR, errno.EACCES):
+                    raise FSMonitorOSError(*e.args)
+                continue
+            path_filter = watch.filter
+            for name, subpath, is_dir in entries:
+                if events is not None or path_filter is not None:
+                    relpath = node_relpath(node, name)
+                    if path_filter is not None:
+                        if is_dir and path_filter.excluded(relpath):
+                            continue
+                        if not path_filter.match(relpath):
+                            relpath = None
+                    if events is not None and relpath is not None:
+                        if PY3:
+                            relpath = relpath.decode(fsencoding)
+                        events.append(FSEvent(watch, FSEvent.Create, relpath))
+                if is_dir:
+                    child = self.__add_subdir(watch, node, name, subpath, strict)
+                    if child is not None:
+                        stack.append((child, subpath))
+
+    def __remove_node(self, watch, node):
+        """Stop watching NODE and all of its subdirectories."""
+        with self.__lock:
+            if node.parent is not None:
+                if node.parent.children.get(node.name) is node:
+                    del node.parent.children[node.name]
+            stack = [node]
+            while stack:
+                node = stack.pop()
+                stack.extend(node.children.values())
+                if watch._nodes.pop(node.wd, None) is not None:
+                    if watch._snapshots is not None:
+                        watch._snapshots.pop(node.wd, None)
+                    if self.__wd_to_watch.get(node.wd) is watch:
+                        del self.__wd_to_watch[node.wd]
+                    inotify_rm_watch(self.__fd, node.wd)
+
+    def __update_tree(self, watch, node, mask, name, cookie, events):
+        if mask & IN_IGNORED:
+            self.__remove_node(watch, node)
+        elif mask & IN_ISDIR:
+            if mask & (IN_CREATE | IN_MOVED_TO):
+                relpath = node_relpath(node, name)
+                excluded = watch.filter is not None and watch.filter.excluded(relpath)
+                if mask & IN_MOVED_TO and cookie in self.__moved_nodes:
+                    src_watch, child = self.__moved_nodes.pop(cookie)
+                    if (src_watch is watch and not excluded
+                            and watch._nodes.get(child.wd) is child):
+                        # renamed within the watch, its subdirectories are
+                        # still watched and its entries are not new
+                        with self.__lock:
+                            child.parent = node
+                            child.name = name
+                            node.children[name] = child
+                        return
+                    self.__remove_node(src_watch, child)
+                if excluded:
+                    return
+                path = os.path.join(watch.path, relpath)
+                child = self.__add_subdir(watch, node, name, path, False)
+                if child is not None:
+                    report = watch.enabled and (watch.flags & FSEvent.Create)
+                    self.__walk_tree(watch, child, path, events if report else None)
+            elif mask & IN_MOVED_FROM:
+                child = node.children.get(name)
+                if child is not None:
+                    with self.__lock:
+                        del node.children[name]
+                    self.__moved_nodes[cookie] = (watch, child)
+
+    def __resync(self, events):
+        """Rescan the snapshots of all watches after events were lost.
+
+        The overflow event has no wd and the kernel queue is shared by every
+        watch, so any of them may have lost events. Entries whose state was
+        unknown, as they changed since the last scan, are reported as Modify.
+        """
+        fsencoding = sys.getfilesystemencoding()
+        for watch in self.watches:
+            if watch._snapshots is None:
+                continue
+            scan = watch._is_dir and self.__begin_scan(watch)
+            try:
+                for wd, old in list(watch._snapshots.items()):
+                    node = None
+                    path = watch.path
+                    if watch._nodes is not None:
+                        node = watch._nodes.get(wd)
+                        if node is None:
+                            continue
+                        if node.parent is not None:
+                            path = os.path.join(path, node_relpath(node))
+                    if scan:
+                        self.__note_scan(wd, node)
+                    new = self.__take_snapshot(watch, path)
+                    if watch._snapshots.get(wd) is not old:
+                        continue
+                    watch._snapshots[wd] = new
+                    report = watch.enabled
+                    for action, name in chain(diff_snapshots(old, new),
+                                              unknown_changes(old, new)):
+                        if not watch._is_dir:
+                            if action != FSEvent.Delete:
+                                continue
+                            action = FSEvent.DeleteSelf
+                        relpath = node_relpath(node, name) if node is not None else name
+                        path_filter = watch.filter
+                        if (report and (action & watch.flags)
+                                and (path_filter is None or not relpath
+                                     or path_filter.match(relpath))):
+                            events.append(FSEvent(watch, action,
+                                                  relpath.decode(fsencoding) if PY3 else relpath))
+                        if node is not None:
+                            if action == FSEvent.Delete and name in node.children:
+                                self.__remove_node(watch, node.children[name])
+                            elif (action == FSEvent.Create and state_is_dir(new[name])
+                                  and (path_filter is None or not path_filter.excluded(relpath))):
+                                subpath = os.path.join(path, name)
+                                child = self.__add_subdir(watch, node, name, subpath, False)
+                                if child is not None:
+                                    create = report and (watch.flags & FSEvent.Create)
+                                    self.__walk_tree(watch, child, subpath,
+                                                     events if create else None)
+            finally:
+                if scan:
+                    self.__end_scan()
+
+    def __pair_move(self, watch, action, name, cookie, events):
+        pending_moves = self.__pending_moves
+        if action == FSEvent.MoveFrom:
+            pending_moves[cookie] = (monotonic() + self.move_timeout, watch, name)
+            while len(pending_moves) > self.max_pending_moves:
+                deadline, src_watch, src_name = pending_moves.popitem(last=False)[1]
+                events.append(FSEvent(src_watch, FSEvent.Delete, src_name))
+        else:
+            pending = pending_moves.pop(cookie, None)
+            if pending is None:
+                events.append(FSEvent(watch, FSEvent.Create, name))
+            else:
+                deadline, src_watch, src_name = pending
+                events.append(FSMoveEvent(watch, name, src_watch, src_name))
+
+    def __expire_moves(self, events, now=None):
+        """Report unmatched MoveFrom events whose deadline has passed as
+        Delete events. If NOW is None, all of them are reported."""
+        pending_moves = self.__pending_moves
+        while pending_moves:
+            cookie, (deadline, src_watch, src_name) = next(iter(pending_moves.items()))
+            if now is not None and deadline > now:
+                break
+            del pending_moves[cookie]
+            events.append(FSEvent(src_watch, FSEvent.Delete, src_name))
+        return events
+
+    def pending_timeout(self):
+        """Seconds until the next unmatched MoveFrom expires or a polled
+        directory is due to be scanned, or None."""
+        if self.__catchup:
+            return 0.0
+        timeout = None
+        if self.__pending_moves:
+            deadline = next(iter(self.__pending_moves.values()))[0]
+            timeout = max(0.0, deadline - monotonic())
+        if self.__poller is not None:
+            poll_timeout = self.__poller.pending_timeout()
+            if poll_timeout is not None and (timeout is None or poll_timeout < timeout):
+                timeout = poll_timeout
+        return timeout
+
+    def __evict_subtrees(self):
+        """Move the least recently active subdirectories of recursive
+        watches to polling, freeing at least one inotify watch and up to 1%
+        of them. Directories which have been active since the last read are
+        not moved. Returns whether any watches were freed."""
+        tick = self.__tick
+        with self.__lock:
+            candidates = [node for watch in set(self.__wd_to_watch.values())
+                          if watch._nodes is not None
+                          for node in watch._nodes.values()
+                          if node.parent is not None and node.active < tick]
+            target = max(1, len(self.__wd_to_watch) // 100)
+        candidates.sort(key=lambda node: node.active)
+        freed = 0
+        for node in candidates:
+            if freed >= target:
+                break
+            watch = self.__wd_to_watch.get(node.wd)
+            if watch is None or watch._nodes.get(node.wd) is not node:
+                # already moved with a parent directory
+                continue
+            count = len(watch._nodes)
+            relpath = node_relpath(node)
+            self.__remove_node(watch, node)
+            freed += count - len(watch._nodes)
+            self.__poll_subtree(watch, relpath, os.path.join(watch.path, relpath))
+        return freed > 0
+
+    def __poll_subtree(self, watch, relpath, path):
+        """Poll the directory at RELPATH of recursive WATCH instead of
+        watching it with inotify."""
+        if self.__poller is None:
+            self.__poller = PollingFSMonitor(adaptive=True, min_interval=0.5,
+                                             max_interval=5.0)
+        prefix = relpath + b"/"
+        for poll_watch in self.__poller.watches:
+            root, poll_relpath = poll_watch.user
+            if root is watch and (poll_relpath == relpath or poll_relpath.startswith(prefix)):
+                self.__poller.remove_watch(poll_watch)
+        # Without pruning, as inotify reports writes to files in place.
+        scan = self.__begin_poll_scan([(watch, relpath)])
+        try:
+            self.__poller.add_dir_watch(path, watch.flags, (watch, relpath),
+                                        recursive=True, prune=False)
+        except FSMonitorOSError:
+            pass
+        finally:
+            if scan:
+                self.__end_scan()
+
+    def __read_poller(self, events):
+        """Scan the polled directories which are due, adding their events to
+        EVENTS as events of their recursive watches."""
+        fsencoding = sys.getfilesystemencoding()
+        poller = self.__poller
+        scan = (poller.pending_timeout() == 0
+                and self.__begin_poll_scan([w.user for w in poller.watches]))
+        try:
+            poll_events = poller.read_events(0)
+        finally:
+            if scan:
+                self.__end_scan()
+        for evt in poll_events:
+            watch, relpath = evt.watch.user
+            if not watch.enabled:
+                continue
+            action = evt.action
+            if action == FSEvent.DeleteSelf:
+                self.__poller.remove_watch(evt.watch)
+                action = FSEvent.Delete
+                name = relpath
+            else:
+                name = relpath + b"/" + evt.name
+            if not (action & watch.flags):
+                continue
+            if watch.filter is not None and not watch.filter.match(name):
+                continue
+            if PY3:
+                name = name.decode(fsencoding)
+            if action == FSEvent.Move:
+                src_name = relpath + b"/" + evt.src_name
+                if PY3:
+                    src_name = src_name.decode(fsencoding)
+                events.append(FSMoveEvent(watch, name, watch, src_name))
+            else:
+                events.append(FSEvent(watch, action, name))
+        return events
+
+    def get_limits(self):
+        """Return the kernel's inotify limits (see inotify_limits) with the
+        number of inotify watches in use by this monitor, as watches, and
+        the number of directory trees moved to polling, as polled_trees."""
+        limits = inotify_limits()
+        with self.__lock:
+            limits["watches"] = len(self.__wd_to_watch)
+        limits["polled_trees"] = 0 if self.__poller is None else len(self.__poller.watches)
+        return limits
+
+    def queued_bytes(self):
+        """Return the number of bytes of events waiting to be read from the
+        kernel queue."""
+        buf = fcntl.ioctl(self.__fd, termios.FIONREAD, b"\0\0\0\0")
+        return struct.unpack("i", buf)[0]
+
+    def get_stats(self):
+        """Return a dict of the number of watches and the bytes queued in
+        the kernel, with the counters of stats if they are enabled."""
+        stats = {"watches": len(self.watches), "queued_bytes": self.queued_bytes()}
+        if self.stats is not None:
+            stats.update(self.stats.as_dict())
+        return stats
 
     def remove_watch(self, watch):
+        self.__saved.pop(watch, None)
+        if self.__poller is not None:
+            for poll_watch in self.__poller.watches:
+                if poll_watch.user[0] is watch:
+                    self.__poller.remove_watch(poll_watch)
+        if watch._nodes is not None:
+            with self.__lock:
+                wds = [wd for wd in watch._nodes if wd != watch._wd]
+            for wd in wds:
+                inotify_rm_watch(self.__fd, wd)
         return inotify_rm_watch(self.__fd, watch._wd) != -1
 
     def remove_all_watches(self):
         with self.__lock:
-            for wd in self.__wd_to_watch.iterkeys():
+            for wd in list(self.__wd_to_watch):
                 inotify_rm_watch(self.__fd, wd)
+        if self.__poller is not None:
+            self.__poller.remove_all_watches()
 
     def enable_watch(self, watch, enable=True):
         watch.enabled = enable
@@ -160,46 +925,173 @@ class FSMonitor(object):
         watch.enabled = False
 
     def read_events(self, timeout=None):
-        if timeout is not None:
-            rs, ws, xs = select.select([self.__fd], [], [], timeout)
-            if self.__fd not in rs:
-                return []
+        stats = self.stats
+        if self.__catchup:
+            events, self.__catchup = self.__catchup, []
+            if self.verifier is not None:
+                events = self.verifier.filter(events)
+            return events
+        wait = timeout
+        pending_timeout = self.pending_timeout()
+        if pending_timeout is not None and (wait is None or pending_timeout < wait):
+            wait = pending_timeout
+        readable = True
+        if wait is not None:
+            rs, ws, xs = select.select([self.__fd], [], [], wait)
+            readable = self.__fd in rs
 
-        while True:
-            try:
-                s = os.read(self.__fd, 1024)
-                break
-            except OSError as e:
-                if e.errno != errno.EINTR:
-                    raise FSMonitorOSError(*e.args)
+        if readable:
+            buf = self.__buf
+            if len(buf) != self.read_size:
+                if self.read_size < MIN_READ_SIZE:
+                    raise ValueError("read_size must be at least %d bytes" % MIN_READ_SIZE)
+                buf = self.__buf = bytearray(self.read_size)
 
-        events = []
-        if not module_loaded:
-            return events
+            hooks = self.hooks
+            if hooks is not None:
+                token = hooks.before_read(self)
+            while True:
+                try:
+                    size = self.__file.readinto(buf)
+                    break
+                except (OSError, IOError) as e:
+                    if e.errno != errno.EINTR:
+                        raise FSMonitorOSError(*e.args)
 
+            if not module_loaded:
+                return []
+            self.__read_bytes += size
+            if stats is not None:
+                read_time = monotonic()
+                stats.record_read(size)
+            if hooks is None:
+                events = self._process_events(buf, size)
+            else:
+                hooks.after_read(self, token, size)
+                events = self._process_events(buf, size)
+                hooks.after_decode(self, token, events)
+        else:
+            events = self.__expire_moves([], monotonic())
+        if self.__poller is not None:
+            self.__read_poller(events)
+        if self.verifier is not None and events:
+            count = len(events)
+            events = self.verifier.filter(events)
+            if stats is not None:
+                stats.filtered += count - len(events)
+        if stats is not None and events:
+            stats.events += len(events)
+            stamp_events(events, read_time if readable else None)
+        return events
+
+    def _process_events(self, buf, size):
+        """Convert the raw inotify events in the first SIZE bytes of BUF."""
+        events = []
         fsencoding = sys.getfilesystemencoding()
-        for wd, mask, cookie, name in parse_events(s):
-            with self.__lock:
-                watch = self.__wd_to_watch.get(wd)
-            if watch is not None and watch.enabled:
-                bit = 1
-                while bit < 0x10000:
-                    if mask & bit:
-                        action = action_map.get(bit)
-                        if action is not None and (action & watch.flags):
-                            if PY3 and isinstance(name, bytes):
+        pair_moves = self.pair_moves
+        # Looking up a single key is atomic, so the wd map is read without
+        # the lock. Writers take the lock to keep compound updates consistent.
+        get_watch = self.__wd_to_watch.get
+        unpack_from = event_header.unpack_from
+        header_size = event_header.size
+        self.__tick += 1
+        tick = self.__tick
+        overflow = False
+        raw_events = filtered = 0
+        scan_keys = self.__scan_keys
+        # position of BUF in the stream of bytes read from the queue
+        position = self.__read_bytes - size
+        i = 0
+        while i + header_size <= size:
+            wd, mask, cookie, length = unpack_from(buf, i)
+            offset = i + header_size
+            i = offset + length
+            raw_events += 1
+            if (mask == IN_DIR_ACCESS and scan_keys
+                    and (self.__scans or position + i <= self.__scan_end)
+                    and (wd, event_name(buf, offset, length)) in scan_keys):
+                # a read of a directory by the monitor itself
+                continue
+            watch = get_watch(wd)
+            if watch is None:
+                if mask & IN_Q_OVERFLOW:
+                    overflow = True
+                    if self.stats is not None:
+                        self.stats.overflows += 1
+                    # cookies of the lost events are gone, so stop waiting for them
+                    self.__expire_moves(events)
+                    events.append(FSEvent(None, FSEvent.Overflow))
+                continue
+            node = None
+            if watch._nodes is not None:
+                node = watch._nodes.get(wd)
+                if node is None:
+                    continue
+                node.active = tick
+                if node.parent is not None:
+                    # removal of a subdirectory is reported as a Delete in its parent
+                    mask &= ~IN_DELETE_SELF
+            raw_name = None
+            if watch.enabled:
+                flags = watch.flags
+                name = None
+                for action in action_table[mask & IN_ACTION_MASK]:
+                    if action & flags:
+                        if name is None:
+                            name = raw_name = event_name(buf, offset, length)
+                            if node is not None:
+                                name = node_relpath(node, name)
+                            path_filter = watch.filter
+                            if (path_filter is not None and name
+                                    and not path_filter.match(name)):
+                                filtered += 1
+                                break
+                            if PY3:
                                 name = name.decode(fsencoding)
+                        if pair_moves and (action & MOVE_ACTIONS):
+                            self.__pair_move(watch, action, name, cookie, events)
+                        else:
                             events.append(FSEvent(watch, action, name))
-                    bit <<= 1
-                if mask & IN_IGNORED:
-                    with self.__lock:
-                        try:
-                            del self.__wd_to_watch[wd]
-                        except KeyError:
-                            pass
+            if watch._snapshots is not None:
+                snapshot = watch._snapshots.get(wd)
+                if snapshot is not None:
+                    if raw_name is None:
+                        raw_name = event_name(buf, offset, length)
+                    if mask & IN_SNAPSHOT_REMOVE:
+                        snapshot.pop(raw_name, None)
+                    elif mask & IN_SNAPSHOT_CHANGE:
+                        snapshot[raw_name] = None
+            if node is not None:
+                if mask & (IN_ISDIR | IN_IGNORED):
+                    if raw_name is None:
+                        raw_name = event_name(buf, offset, length)
+                    self.__update_tree(watch, node, mask, raw_name, cookie, events)
+            elif mask & IN_IGNORED:
+                with self.__lock:
+                    try:
+                        del self.__wd_to_watch[wd]
+                    except KeyError:
+                        pass
+        if self.__moved_nodes:
+            # directories moved out of their recursive watch
+            for src_watch, child in self.__moved_nodes.values():
+                self.__remove_node(src_watch, child)
+            self.__moved_nodes.clear()
+        if overflow and self.resync:
+            self.__resync(events)
+        if scan_keys:
+            with self.__lock:
+                if not self.__scans and self.__scan_end <= self.__read_bytes:
+                    scan_keys.clear()
+        if self.__pending_moves:
+            self.__expire_moves(events, monotonic())
+        if self.stats is not None:
+            self.stats.raw_events += raw_events
+            self.stats.filtered += filtered
         return events
 
     @property
     def watches(self):
         with self.__lock:
-            return self.__wd_to_watch.values()
+            return [watch for wd, watch in self.__wd_to_watch.items()
+                    if wd == watch._wd]
@@ -7,43 +7,55 @@
 # The file is part of FSMonitor, a file-system monitoring library.
 # https://github.com/shaurz/fsmonitor
 
-import sys, os, time, threading, errno
-from .common import FSEvent, FSMonitorError
+import sys, os, time, threading, errno, heapq
+from functools import partial
+from .common import FSEvent, FSMoveEvent, FSMonitorError, FSMonitorOSError
+from .filters import make_filter
+from .compat import ThreadPoolExecutor, monotonic
+from .snapshot import (stat_state, dir_snapshot, tree_snapshot, compare_states,
+                       state_is_dir, same_entry, ST_INO, ST_ATIME_NS, SnapshotStore,
+                       SNAPSHOT_FILE, SNAPSHOT_DIR, SNAPSHOT_TREE)
 
 
 def get_dir_contents(path):
-    return [(filename, os.stat(os.path.join(path, filename)))
-            for filename in os.listdir(path)]
+    """Return a dict mapping each entry name in PATH to its state tuple."""
+    return dir_snapshot(path)
 
 
 class FSMonitorDirWatch(object):
+    __slots__ = ("path", "flags", "user", "enabled", "filter", "interval", "_interval",
+                 "_timestamp", "_contents", "_deleted", "_dev")
 
-    def __init__(self, path, flags, user):
+    snapshot_kind = SNAPSHOT_DIR
+
+    def __init__(self, path, flags, user, interval=None, state=None, filter=None):
         self.path = path
         self.flags = flags
         self.user = user
         self.enabled = True
-        self._timestamp = time.time()
+        self.filter = filter
+        self.interval = interval
+        self._interval = None
+        self._timestamp = monotonic()
         try:
-            self._contents = get_dir_contents(path)
+            self._dev = os.stat(path).st_dev
+            self._contents = self.new_state(path) if state is None else state
             self._deleted = False
         except OSError as e:
-            self._contents = []
-            self._deleted = (e.errno == errno.ENOENT)
+            raise FSMonitorOSError(*e.args)
 
     def __repr__(self):
-        return "<FSMonitorDirWatch %r>" % self.path
+        return "<%s %r>" % (type(self).__name__, self.path)
 
     @classmethod
     def new_state(cls, path):
-        return [(filename, os.stat(os.path.join(path, filename)))
-                for filename in os.listdir(path)]
+        return get_dir_contents(path)
 
     def getstate(self):
         return self._contents
 
     def delstate(self):
-        self._contents = []
+        self._contents = {}
         self._deleted = True
 
     def setstate(self, state):
@@ -53,27 +65,61 @@ class FSMonitorDirWatch(object):
     state = property(getstate, setstate, delstate)
 
 
+class FSMonitorTreeWatch(FSMonitorDirWatch):
+    """Recursive directory watch.
+
+    The state is a tree snapshot and event names are paths relative to the
+    watched directory. If prune is true, directories whose mtime has not
+    changed are not read again on each scan (see tree_snapshot).
+    """
+    __slots__ = ("prune", "_scanned")
+    snapshot_kind = SNAPSHOT_TREE
+
+    def __init__(self, path, flags, user, interval=None, prune=True, state=None,
+                 scanned_ns=None, filter=None):
+        self.prune = prune
+        self.filter = filter
+        self._contents = None
+        self._scanned = scanned_ns
+        super(FSMonitorTreeWatch, self).__init__(path, flags, user, interval, state, filter)
+
+    def new_state(self, path):
+        racy_ns = self._scanned
+        self._scanned = int(time.time()) * 1000000000
+        exclude = self.filter.excluded if self.filter is not None else None
+        if self.prune:
+            return tree_snapshot(path, self._contents, racy_ns, exclude)
+        return tree_snapshot(path, exclude=exclude)
+
+
 class FSMonitorFileWatch(object):
+    __slots__ = ("path", "flags", "user", "enabled", "interval", "_interval", "_timestamp",
+                 "_stat", "_deleted", "_dev")
 
-    def __init__(self, path, flags, user):
+    snapshot_kind = SNAPSHOT_FILE
+
+    def __init__(self, path, flags, user, interval=None, state=None):
         self.path = path
         self.flags = flags
         self.user = user
         self.enabled = True
-        self._timestamp = time.time()
+        self.interval = interval
+        self._interval = None
+        self._timestamp = monotonic()
         try:
-            self._stat = os.stat(path)
+            st = os.stat(path)
+            self._dev = st.st_dev
+            self._stat = stat_state(st) if state is None else state
             self._deleted = False
         except OSError as e:
-            self._stat = None
-            self._deleted = (e.errno == errno.ENOENT)
+            raise FSMonitorOSError(*e.args)
 
     def __repr__(self):
         return "<FSMonitorFileWatch %r>" % self.path
 
     @classmethod
     def new_state(cls, path):
-        return os.stat(path)
+        return stat_state(os.stat(path))
 
     def getstate(self):
         return self._stat
@@ -90,6 +136,8 @@ class FSMonitorFileWatch(object):
 
 
 class FSMonitorWatch(object):
+    __slots__ = ("path", "flags", "user", "enabled", "_timestamp", "_contents", "_deleted")
+
     def __init__(self, path, flags, user):
         self.path = path
         self.flags = flags
@@ -100,35 +148,117 @@ class FSMonitorWatch(object):
             self._contents = get_dir_contents(path)
             self._deleted = False
         except OSError as e:
-            self._contents = []
+            self._contents = {}
             self._deleted = (e.errno == errno.ENOENT)
 
     def __repr__(self):
         return "<FSMonitorWatch %r>" % self.path
 
 
-def _compare_contents(watch, new_contents, events_out, before):
-    name_to_new_stat = dict(new_contents)
+def _compare_contents(watch, new_contents, events_out, before, pair_moves=False):
+    _compare_entries(watch, watch._contents, new_contents, events_out, before, pair_moves)
 
-    for name, old_stat in watch._contents:
-        new_stat = name_to_new_stat.get(name)
-        if new_stat:
-            _compare_stat(watch, new_stat, events_out, before, old_stat, name)
-        else:
+
+def _flatten_tree(tree, other, contents_out):
+    """Add the entries of the directories in TREE whose snapshot differs
+    from OTHER to CONTENTS_OUT, keyed by relative path."""
+    join = os.path.join
+    for reldir, (state, entries) in tree.items():
+        other_dir = other.get(reldir)
+        if other_dir is None or other_dir[1] is not entries:
+            if reldir:
+                for name, entry_state in entries.items():
+                    contents_out[join(reldir, name)] = entry_state
+            else:
+                contents_out.update(entries)
+
+
+def _compare_tree(watch, new_tree, events_out, before, pair_moves=False):
+    old_tree = watch._contents
+    old_contents = {}
+    new_contents = {}
+    _flatten_tree(old_tree, new_tree, old_contents)
+    _flatten_tree(new_tree, old_tree, new_contents)
+    _compare_entries(watch, old_contents, new_contents, events_out, before, pair_moves)
+
+
+def _compare_entries(watch, old_contents, new_contents, events_out, before, pair_moves):
+    flags = watch.flags
+    path_filter = watch.filter
+    if path_filter is not None:
+        match = path_filter.match
+        old_contents = dict((name, state) for name, state in old_contents.items()
+                            if match(name))
+        new_contents = dict((name, state) for name, state in new_contents.items()
+                            if match(name))
+    deleted = [name for name in old_contents if name not in new_contents]
+    created = [name for name in new_contents if name not in old_contents]
+
+    # An entry which disappeared under one name and appeared under another
+    # with the same inode, size, mtime and type was renamed. Anything else
+    # is a delete and a create, even if the inode was reused.
+    moved = []
+    if deleted and created:
+        created_by_ino = dict((new_contents[name][ST_INO], name) for name in created)
+        for old_name in deleted:
+            old_state = old_contents[old_name]
+            new_name = created_by_ino.get(old_state[ST_INO])
+            if new_name is not None and same_entry(old_state, new_contents[new_name]):
+                del created_by_ino[old_state[ST_INO]]
+                moved.append((old_name, new_name))
+        if moved:
+            moved_from = frozenset(old_name for old_name, new_name in moved)
+            moved_to = frozenset(new_name for old_name, new_name in moved)
+            deleted = [name for name in deleted if name not in moved_from]
+            created = [name for name in created if name not in moved_to]
+            # Only report the move of a directory, not of everything in it.
+            moved_dirs = [(old_name + os.sep, new_name + os.sep)
+                          for old_name, new_name in moved
+                          if state_is_dir(old_contents[old_name])]
+            if moved_dirs:
+                moved = [(old_name, new_name) for old_name, new_name in moved
+                         if not any(old_name.startswith(old_dir)
+                                    and new_name == new_dir + old_name[len(old_dir):]
+                                    for old_dir, new_dir in moved_dirs)]
+
+    if flags & FSEvent.Delete:
+        for name in deleted:
             events_out.append(FSEvent(watch, FSEvent.Delete, name))
 
-    old_names = frozenset(x[0] for x in watch._contents)
-    for name, new_stat in new_contents:
-        if name not in old_names:
+    for old_name, new_name in moved:
+        if pair_moves:
+            if flags & (FSEvent.MoveFrom | FSEvent.MoveTo):
+                events_out.append(FSMoveEvent(watch, new_name, watch, old_name))
+        else:
+            if flags & FSEvent.MoveFrom:
+                events_out.append(FSEvent(watch, FSEvent.MoveFrom, old_name))
+            if flags & FSEvent.MoveTo:
+                events_out.append(FSEvent(watch, FSEvent.MoveTo, new_name))
+        _compare_stat(watch, new_contents[new_name], events_out, before,
+                      old_contents[old_name], new_name)
+
+    if flags & FSEvent.Create:
+        for name in created:
             events_out.append(FSEvent(watch, FSEvent.Create, name))
 
+    for name, old_state in old_contents.items():
+        new_state = new_contents.get(name)
+        if new_state is not None and new_state != old_state:
+            _compare_stat(watch, new_state, events_out, before, old_state, name)
+
+
+def _compare_stat(watch, new_state, events_out, before, old_state, filename):
+    if old_state is None:
+        return
 
-def _compare_stat(watch, new_stat, events_out, before, old_stat, filename):
-    if new_stat.st_atime != old_stat.st_atime and new_stat.st_atime < before:
+    if (new_state[ST_ATIME_NS] != old_state[ST_ATIME_NS]
+            and new_state[ST_ATIME_NS] < before * 1000000000
+            and watch.flags & FSEvent.Access):
         events_out.append(FSEvent(watch, FSEvent.Access, filename))
 
-    if new_stat.st_mtime != old_stat.st_mtime:
-        events_out.append(FSEvent(watch, FSEvent.Modify, filename))
+    for action in compare_states(old_state, new_state):
+        if action & watch.flags:
+            events_out.append(FSEvent(watch, action, filename))
 
 
 def round_fs_resolution(t):
@@ -139,41 +269,157 @@ def round_fs_resolution(t):
 
 
 class FSMonitor(object):
+    """Polling file-system monitor.
+
+    If pair_moves is true, a rename within a watched directory is reported
+    as a single Move event instead of a MoveFrom and MoveTo pair.
+
+    If scan_workers is greater than one, the watches are scanned in parallel
+    on a pool of that many threads, with at most max_scans_per_mount scans
+    of the same file-system running at once. Events are still returned in
+    the order of the watches they belong to.
+
+    Each watch is scanned every polling_interval seconds, or every interval
+    seconds if one was given when it was added. The watches are kept in a
+    heap ordered by when they are next due.
+
+    If adaptive is true, watches without their own interval are scanned
+    every min_interval seconds while they are changing, and the interval
+    is multiplied by backoff after each quiet scan, up to max_interval.
+
+    If snapshot_dir is given, the state of each watch is saved there by
+    checkpoint() and close(). A watch added for a path with a saved state
+    starts from that state, so its first scan reports the changes made
+    while the monitor was not running.
+
+    If verifier is a ContentVerifier (see fsmonitor.verify), Modify events
+    for files whose contents did not change are dropped.
+
+    The hooks attribute can be set to an FSMonitorHooks (see
+    fsmonitor.hooks) to be called around the scan of each watch, on the
+    thread which scans it.
+    """
 
-    def __init__(self):
+    def __init__(self, pair_moves=False, scan_workers=None, max_scans_per_mount=None,
+                 adaptive=False, min_interval=0.1, max_interval=10.0, backoff=2.0,
+                 snapshot_dir=None, verifier=None):
         self.__lock = threading.Lock()
+        self.__wakeup = threading.Condition(self.__lock)
         self.__dir_watches = set()
         self.__file_watches = set()
+        # heap of (due time, sequence number, watch)
+        self.__schedule = []
+        self.__seq = 0
         self.polling_interval = 0.5
+        self.adaptive = adaptive
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.__scans = 0
+        self.__scan_events = 0
+        self.__stats_start = monotonic()
+        self.verifier = verifier
+        self.hooks = None
+        self.__store = None if snapshot_dir is None else SnapshotStore(snapshot_dir)
+        # watch -> state object last saved to the snapshot store
+        self.__saved = {}
+        self.pair_moves = pair_moves
+        self.max_scans_per_mount = max_scans_per_mount
+        self.__mount_semaphores = {}
+        self.__executor = None
+        if scan_workers is not None and scan_workers > 1:
+            if ThreadPoolExecutor is None:
+                raise FSMonitorError("Parallel scans require concurrent.futures")
+            self.__executor = ThreadPoolExecutor(scan_workers)
+
+    def close(self):
+        if self.__store is not None:
+            self.checkpoint()
+        self.remove_all_watches()
+        if self.__executor is not None:
+            self.__executor.shutdown(wait=False)
+            self.__executor = None
 
     @property
     def watches(self):
         with self.__lock:
             return list(self.__dir_watches) + list(self.__file_watches)
 
-    def add_dir_watch(self, path, flags=FSEvent.All, user=None):
-        watch = FSMonitorDirWatch(path, flags, user)
+    def __load_state(self, path, kind):
+        """Return (state, scan time in ns) saved for PATH, or (None, None)."""
+        if self.__store is not None:
+            saved = self.__store.load(path)
+            if saved is not None and saved[0] == kind:
+                return saved[2], saved[1]
+        return None, None
+
+    def add_dir_watch(self, path, flags=FSEvent.All, user=None, interval=None,
+                      recursive=False, prune=True, include=None, exclude=None):
+        """Watch the directory at PATH.
+
+        Only events for names which match one of the include glob patterns,
+        if any, and none of the exclude patterns are reported. Directories
+        matching an exclude pattern are not scanned by recursive watches.
+        """
+        path_filter = make_filter(include, exclude)
+        if recursive:
+            state, scanned_ns = self.__load_state(path, SNAPSHOT_TREE)
+            watch = FSMonitorTreeWatch(path, flags, user, interval, prune,
+                                       state, scanned_ns, path_filter)
+        else:
+            state, scanned_ns = self.__load_state(path, SNAPSHOT_DIR)
+            watch = FSMonitorDirWatch(path, flags, user, interval, state, path_filter)
         with self.__lock:
             self.__dir_watches.add(watch)
+        self.__add_to_schedule(watch, state is not None)
         return watch
 
-    def add_file_watch(self, path, flags=FSEvent.All, user=None):
-        watch = FSMonitorFileWatch(path, flags, user)
+    def add_file_watch(self, path, flags=FSEvent.All, user=None, interval=None):
+        state, scanned_ns = self.__load_state(path, SNAPSHOT_FILE)
+        watch = FSMonitorFileWatch(path, flags, user, interval, state)
         with self.__lock:
             self.__file_watches.add(watch)
+        self.__add_to_schedule(watch, state is not None)
         return watch
 
+    def __add_to_schedule(self, watch, restored):
+        if restored:
+            # scan at once to report what changed since the state was saved
+            self.__saved[watch] = watch.state
+            with self.__lock:
+                self.__seq += 1
+                heapq.heappush(self.__schedule, (watch._timestamp, self.__seq, watch))
+                self.__wakeup.notify_all()
+        else:
+            self.__reschedule(watch, watch._timestamp)
+
+    def checkpoint(self):
+        """Save the state of each watch which changed since it was last saved."""
+        if self.__store is None:
+            raise FSMonitorError("No snapshot_dir was given")
+        for watch in self.watches:
+            state = watch.state
+            saved = self.__saved.get(watch)
+            if saved is not state and saved != state:
+                scanned_ns = getattr(watch, "_scanned", None) or 0
+                self.__store.save(watch.path, watch.snapshot_kind, state, scanned_ns)
+                self.__saved[watch] = state
+
     def remove_watch(self, watch):
         with self.__lock:
             if watch in self.__dir_watches:
                 self.__dir_watches.discard(watch)
             elif watch in self.__file_watches:
                 self.__file_watches.discard(watch)
+            self.__saved.pop(watch, None)
 
     def remove_all_watches(self):
         with self.__lock:
             self.__dir_watches.clear()
             self.__file_watches.clear()
+            self.__saved.clear()
+            del self.__schedule[:]
+            self.__wakeup.notify_all()
 
     def enable_watch(self, watch, enable=True):
         watch.enabled = enable
@@ -181,37 +427,167 @@ class FSMonitor(object):
     def disable_watch(self, watch):
         watch.enabled = False
 
-    def read_events(self, timeout=None):
-        now = start_time = time.time()
-        watches = self.watches
-        watches.sort(key=lambda watch: abs(now - watch._timestamp), reverse=True)
+    def _scan(self, watch):
+        """Read the new state of WATCH. Called from the scan pool."""
+        if self.max_scans_per_mount:
+            with self.__lock:
+                semaphore = self.__mount_semaphores.get(watch._dev)
+                if semaphore is None:
+                    semaphore = threading.BoundedSemaphore(self.max_scans_per_mount)
+                    self.__mount_semaphores[watch._dev] = semaphore
+            with semaphore:
+                return watch.new_state(watch.path)
+        return watch.new_state(watch.path)
+
+    def __scan_watch(self, watch, before):
+        """Scan WATCH and return its events, with the scan hooks called
+        around it. Called from the scan pool, if there is one."""
+        events = []
+        hooks = self.hooks
+        if hooks is None:
+            self._update_watch(watch, partial(self._scan, watch), events, before)
+        else:
+            token = hooks.before_scan(self, watch)
+            self._update_watch(watch, partial(self._scan, watch), events, before)
+            hooks.after_scan(self, token, watch, events)
+        return events
 
+    def _update_watch(self, watch, get_state, events, before):
+        try:
+            new_state = get_state()
+        except OSError as e:
+            if e.errno == errno.ENOENT:
+                if not watch._deleted:
+                    del watch.state
+                    events.append(FSEvent(watch, FSEvent.DeleteSelf))
+        else:
+            if isinstance(watch, FSMonitorTreeWatch):
+                _compare_tree(watch, new_state, events, before, self.pair_moves)
+            elif isinstance(watch, FSMonitorDirWatch):
+                _compare_contents(watch, new_state, events, before, self.pair_moves)
+            elif isinstance(watch, FSMonitorFileWatch):
+                _compare_stat(watch, new_state, events, before,
+                              watch.state, watch.path)
+            watch.state = new_state
+
+    def pending_timeout(self):
+        """Seconds until the next watch is due to be scanned, or None."""
+        with self.__lock:
+            if not self.__schedule:
+                return None
+            return max(0.0, self.__schedule[0][0] - monotonic())
+
+    def __pop_due(self, now):
+        """Remove and return the watches which are due to be scanned.
+
+        Entries of removed watches are left in the heap and skipped here.
+        """
+        due = []
+        with self.__lock:
+            schedule = self.__schedule
+            while schedule and schedule[0][0] <= now:
+                watch = heapq.heappop(schedule)[2]
+                if watch in self.__dir_watches or watch in self.__file_watches:
+                    due.append(watch)
+        return due
+
+    def __next_interval(self, watch, changed):
+        if watch.interval is not None:
+            return watch.interval
+        if not self.adaptive:
+            return self.polling_interval
+        if changed or watch._interval is None:
+            interval = self.min_interval
+        else:
+            interval = min(watch._interval * self.backoff, self.max_interval)
+        watch._interval = interval
+        return interval
+
+    def __reschedule(self, watch, now, changed=False):
+        watch._timestamp = now
+        interval = self.__next_interval(watch, changed)
+        with self.__lock:
+            if watch in self.__dir_watches or watch in self.__file_watches:
+                self.__seq += 1
+                heapq.heappush(self.__schedule, (now + interval, self.__seq, watch))
+                self.__wakeup.notify_all()
+
+    def __scan_watches(self, watches):
         events = []
+        now = monotonic()
+        before = round_fs_resolution(time.time())
+        if self.__executor is not None:
+            scans = [(watch, self.__executor.submit(self.__scan_watch, watch, before).result)
+                     for watch in watches if watch.enabled]
+        else:
+            scans = [(watch, partial(self.__scan_watch, watch, before))
+                     for watch in watches if watch.enabled]
+        changed = set()
+        for watch, scan in scans:
+            watch_events = scan()
+            if watch_events:
+                events.extend(watch_events)
+                changed.add(watch)
         for watch in watches:
-            now = time.time()
-            if watch._timestamp < now:
-                tdiff = now - watch._timestamp
-                if tdiff < self.polling_interval:
-                    time.sleep(self.polling_interval - tdiff)
-            watch._timestamp = now
-
-            if not watch.enabled:
-                continue
+            self.__reschedule(watch, now, watch in changed)
+        self.__scans += len(scans)
+        self.__scan_events += len(events)
+        return events
 
-            before = round_fs_resolution(time.time())
-            try:
-                new_state = watch.new_state(watch.path)
-            except OSError as e:
-                if e.errno == errno.ENOENT:
-                    if not watch._deleted:
-                        del watch.state
-                        events.append(FSEvent(watch, FSEvent.DeleteSelf))
-            else:
-                if isinstance(watch, FSMonitorDirWatch):
-                    _compare_contents(watch, new_state, events, before)
-                elif isinstance(watch, FSMonitorFileWatch):
-                    _compare_stat(watch, new_state, events, before,
-                                  watch.state, watch.path)
-                watch.state = new_state
+    def get_stats(self):
+        """Return a dict of scan statistics since the monitor was created.
 
-        return events
+        interval_min, interval_mean and interval_max are the current scan
+        intervals of the watches.
+        """
+        with self.__lock:
+            watches = list(self.__dir_watches) + list(self.__file_watches)
+        intervals = [w.interval if w.interval is not None
+                     else w._interval if self.adaptive and w._interval is not None
+                     else self.polling_interval
+                     for w in watches]
+        elapsed = monotonic() - self.__stats_start
+        return {
+            "watches": len(watches),
+            "scans": self.__scans,
+            "events": self.__scan_events,
+            "elapsed": elapsed,
+            "scans_per_second": self.__scans / elapsed if elapsed > 0 else 0.0,
+            "interval_min": min(intervals) if intervals else None,
+            "interval_mean": sum(intervals) / len(intervals) if intervals else None,
+            "interval_max": max(intervals) if intervals else None,
+        }
+
+    def read_events(self, timeout=None):
+        """Wait until watches are due, scan them and return their events.
+
+        With no timeout, returns after the first scan even if it found
+        nothing, or after polling_interval seconds if there are no watches.
+        With a timeout, keeps scanning the watches as they fall due until
+        events are found or timeout seconds have passed.
+        """
+        deadline = None if timeout is None else monotonic() + timeout
+        while True:
+            now = monotonic()
+            due = self.__pop_due(now)
+            if due:
+                events = self.__scan_watches(due)
+                if events and self.verifier is not None:
+                    events = self.verifier.filter(events)
+                if events or deadline is None:
+                    return events
+                continue
+            if deadline is not None and now >= deadline:
+                return []
+            with self.__lock:
+                if self.__schedule:
+                    wait = self.__schedule[0][0] - now
+                elif deadline is None:
+                    self.__wakeup.wait(self.polling_interval)
+                    return []
+                else:
+                    wait = self.polling_interval
+                if deadline is not None:
+                    wait = min(wait, deadline - now)
+                if wait > 0:
+                    self.__wakeup.wait(wait)
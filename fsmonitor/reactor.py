@@ -0,0 +1,149 @@
+# Copyright (c) 2026 The FSMonitor contributors
+#
+# This is free software released under the MIT license.
+# See COPYING file for details, or visit:
+# http://www.opensource.org/licenses/mit-license.php
+#
+# The file is part of FSMonitor, a file-system monitoring library.
+# https://github.com/shaurz/fsmonitor
+
+from __future__ import print_function
+
+import os, errno, fcntl, select, threading, traceback
+from .common import FSMonitorError
+
+# set to None when unloaded
+module_loaded = True
+
+class FSMonitorReactor(threading.Thread):
+    """Thread which reads events from many FSMonitors with one epoll.
+
+    Each registered monitor must have a file descriptor (see
+    FSMonitor.fileno), so this works with the inotify monitor but not the
+    polling one. The events of a monitor are passed to its callback one at
+    a time, or as a list to its batch_callback. Monitors can be registered
+    and unregistered while the reactor is running.
+    """
+
+    def __init__(self, autostart=True):
+        if not hasattr(select, "epoll"):
+            raise FSMonitorError("FSMonitorReactor requires select.epoll")
+        threading.Thread.__init__(self)
+        self.__lock = threading.Lock()
+        # fd -> (monitor, callback, batch_callback)
+        self.__fds = {}
+        self.__epoll = select.epoll()
+        self.__wake_r, self.__wake_w = os.pipe()
+        for fd in (self.__wake_r, self.__wake_w):
+            set_nonblocking(fd)
+        self.__epoll.register(self.__wake_r, select.EPOLLIN)
+        self.daemon = True
+        if autostart:
+            self.start()
+        else:
+            self._running = False
+
+    def start(self):
+        self._running = True
+        super(FSMonitorReactor, self).start()
+
+    @property
+    def monitors(self):
+        with self.__lock:
+            return [entry[0] for entry in self.__fds.values()]
+
+    def register(self, monitor, callback=None, batch_callback=None):
+        fd = monitor.fileno()
+        if fd is None:
+            raise FSMonitorError("Monitor has no file descriptor")
+        with self.__lock:
+            if fd in self.__fds:
+                raise FSMonitorError("Monitor is already registered")
+            self.__fds[fd] = (monitor, callback, batch_callback)
+            self.__epoll.register(fd, select.EPOLLIN)
+        self.__wake()
+
+    def unregister(self, monitor):
+        with self.__lock:
+            for fd, entry in list(self.__fds.items()):
+                if entry[0] is monitor:
+                    del self.__fds[fd]
+                    try:
+                        self.__epoll.unregister(fd)
+                    except (IOError, OSError, ValueError):
+                        pass
+        self.__wake()
+
+    def stop(self):
+        self._running = False
+        self.__wake()
+
+    def __wake(self):
+        wake_w = self.__wake_w
+        if wake_w is None:
+            return
+        try:
+            os.write(wake_w, b"\0")
+        except OSError as e:
+            if e.errno not in (errno.EAGAIN, errno.EBADF):
+                raise
+
+    def __timeout(self, entries):
+        """Seconds until a monitor has events which are not signalled by its
+        file descriptor, such as expiring unmatched moves, or -1."""
+        timeout = -1
+        for monitor, callback, batch_callback in entries:
+            pending = getattr(monitor, "pending_timeout", None)
+            pending = pending() if pending is not None else None
+            if pending is not None and (timeout < 0 or pending < timeout):
+                timeout = pending
+        return timeout
+
+    def run(self):
+        try:
+            while module_loaded and self._running:
+                with self.__lock:
+                    entries = list(self.__fds.values())
+                try:
+                    ready = self.__epoll.poll(self.__timeout(entries))
+                except (IOError, OSError) as e:
+                    if e.errno == errno.EINTR:
+                        continue
+                    raise
+                ready_fds = set()
+                for fd, mask in ready:
+                    if fd == self.__wake_r:
+                        try:
+                            while os.read(fd, 4096):
+                                pass
+                        except OSError:
+                            pass
+                    else:
+                        ready_fds.add(fd)
+                with self.__lock:
+                    entries = list(self.__fds.items())
+                for fd, (monitor, callback, batch_callback) in entries:
+                    if fd not in ready_fds:
+                        pending = getattr(monitor, "pending_timeout", None)
+                        if pending is None or pending() != 0:
+                            continue
+                    try:
+                        events = monitor.read_events(0)
+                        if events:
+                            if batch_callback:
+                                batch_callback(events)
+                            elif callback:
+                                for event in events:
+                                    callback(event)
+                    except Exception:
+                        print("Exception in FSMonitorReactor:\n" + traceback.format_exc())
+        finally:
+            if module_loaded:
+                self.__epoll.close()
+                wake_w, self.__wake_w = self.__wake_w, None
+                os.close(wake_w)
+                os.close(self.__wake_r)
+
+def set_nonblocking(fd):
+    flags = fcntl.fcntl(fd, fcntl.F_GETFL)
+    fcntl.fcntl(fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
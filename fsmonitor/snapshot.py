@@ -0,0 +1,303 @@
+# Copyright (c) 2026 The FSMonitor contributors
+#
+# This is free software released under the MIT license.
+# See COPYING file for details, or visit:
+# http://www.opensource.org/licenses/mit-license.php
+#
+# The file is part of FSMonitor, a file-system monitoring library.
+# https://github.com/shaurz/fsmonitor
+
+import os, stat, struct, hashlib
+from .common import FSEvent
+from .compat import PY3, scandir
+
+# Index of each field in an entry state tuple.
+ST_INO, ST_SIZE, ST_MTIME_NS, ST_MODE, ST_ATIME_NS = range(5)
+
+def stat_state(st):
+    """Compact (inode, size, mtime_ns, mode, atime_ns) state of a stat result."""
+    try:
+        mtime_ns = st.st_mtime_ns
+        atime_ns = st.st_atime_ns
+    except AttributeError:
+        mtime_ns = int(st.st_mtime * 1000000000)
+        atime_ns = int(st.st_atime * 1000000000)
+    return (st.st_ino, st.st_size, mtime_ns, st.st_mode, atime_ns)
+
+def dir_snapshot(path):
+    """Return a dict mapping each entry name in PATH to its state.
+
+    Entries which disappear while the directory is being read are left out.
+    Symbolic links are not followed.
+    """
+    snapshot = {}
+    if scandir is not None:
+        for entry in scandir(path):
+            try:
+                snapshot[entry.name] = stat_state(entry.stat(follow_symlinks=False))
+            except OSError:
+                pass
+    else:
+        for name in os.listdir(path):
+            try:
+                snapshot[name] = stat_state(os.lstat(os.path.join(path, name)))
+            except OSError:
+                pass
+    return snapshot
+
+def state_is_dir(state):
+    return state is not None and stat.S_ISDIR(state[ST_MODE])
+
+def same_entry(old, new):
+    """Whether entry states OLD and NEW are of the same unchanged file, so
+    that a name which had OLD and a name which has NEW are a rename.
+
+    Inodes are reused, so a deleted file and a file created in its place
+    are told apart by their size, modification time and type.
+    """
+    return (old[ST_INO] == new[ST_INO]
+            and old[ST_SIZE] == new[ST_SIZE]
+            and old[ST_MTIME_NS] == new[ST_MTIME_NS]
+            and stat.S_IFMT(old[ST_MODE]) == stat.S_IFMT(new[ST_MODE]))
+
+def compare_states(old, new):
+    """Return the actions which turn entry state OLD into NEW.
+
+    An OLD state of None means the entry exists but its state is unknown,
+    in which case no change can be detected. Access times are not compared.
+    """
+    if old is None or old == new:
+        return ()
+    if old[ST_INO] != new[ST_INO]:
+        return (FSEvent.Delete, FSEvent.Create)
+    actions = ()
+    if old[ST_SIZE] != new[ST_SIZE] or old[ST_MTIME_NS] != new[ST_MTIME_NS]:
+        if not (stat.S_ISDIR(old[ST_MODE]) and stat.S_ISDIR(new[ST_MODE])):
+            actions += (FSEvent.Modify,)
+    if old[ST_MODE] != new[ST_MODE]:
+        actions += (FSEvent.Attrib,)
+    return actions
+
+def diff_snapshots(old, new):
+    """Yield (action, name) for each difference between two snapshots."""
+    for name, old_state in old.items():
+        if name not in new:
+            yield FSEvent.Delete, name
+        else:
+            for action in compare_states(old_state, new[name]):
+                yield action, name
+    for name in new:
+        if name not in old:
+            yield FSEvent.Create, name
+
+def tree_snapshot(path, old=None, racy_ns=None, exclude=None):
+    """Return a dict mapping the relative path of each directory in the
+    tree at PATH, with "" for PATH itself, to a (state, snapshot) pair.
+
+    If OLD is a previous tree snapshot, a directory whose inode and mtime
+    are unchanged is not read again: its old snapshot is reused with only
+    the states of its subdirectories refreshed. This costs one stat per
+    directory, but changes to existing files in such directories are not
+    seen. Directories with an mtime at or after RACY_NS nanoseconds, the
+    time of the previous snapshot, may have changed since they were read
+    and are always read again.
+
+    EXCLUDE is an optional function of a relative path which returns
+    whether to leave the subdirectory at that path out of the snapshot.
+    """
+    tree = {}
+    stack = [("", stat_state(os.lstat(path)))]
+    while stack:
+        reldir, state = stack.pop()
+        dirpath = os.path.join(path, reldir) if reldir else path
+        prev = old.get(reldir) if old is not None else None
+        if (prev is not None
+                and prev[0][ST_INO] == state[ST_INO]
+                and prev[0][ST_MTIME_NS] == state[ST_MTIME_NS]
+                and (racy_ns is None or state[ST_MTIME_NS] < racy_ns)):
+            entries = prev[1]
+            for name, entry_state in prev[1].items():
+                if state_is_dir(entry_state):
+                    try:
+                        new_state = stat_state(os.lstat(os.path.join(dirpath, name)))
+                    except OSError:
+                        new_state = None
+                    if new_state != entry_state:
+                        if entries is prev[1]:
+                            entries = dict(entries)
+                        if new_state is None:
+                            del entries[name]
+                        else:
+                            entries[name] = new_state
+        else:
+            try:
+                entries = dir_snapshot(dirpath)
+            except OSError:
+                if not reldir:
+                    raise
+                continue
+        tree[reldir] = (state, entries)
+        for name, entry_state in entries.items():
+            if state_is_dir(entry_state):
+                relpath = os.path.join(reldir, name) if reldir else name
+                if exclude is None or not exclude(relpath):
+                    stack.append((relpath, entry_state))
+    return tree
+
+
+# Kinds of state kept in a SnapshotStore.
+SNAPSHOT_FILE, SNAPSHOT_DIR, SNAPSHOT_TREE = 1, 2, 3
+
+SNAPSHOT_MAGIC = b"FSMS"
+SNAPSHOT_VERSION = 1
+
+# magic, version, kind, text names, scan time (ns), path length
+snapshot_header = struct.Struct("<4sBBBqI")
+snapshot_state = struct.Struct("<QQqIq")
+snapshot_count = struct.Struct("<I")
+snapshot_name = struct.Struct("<H")
+
+# A state of None (unknown) is stored as all zeroes.
+_UNKNOWN_STATE = (0, 0, 0, 0, 0)
+
+if PY3:
+    _fsencode = os.fsencode
+    _fsdecode = os.fsdecode
+else:
+    def _fsencode(name):
+        return name
+    _fsdecode = _fsencode
+
+class SnapshotStore(object):
+    """Directory of saved watch states, one file per watched path.
+
+    Each file holds the state of one watch in a compact binary format and
+    is replaced atomically when it is saved, so a crash leaves either the
+    old or the new state behind. A state is the dir_snapshot of a directory,
+    the tree_snapshot of a recursively watched tree, or the state tuple of
+    a file. Entry states of None are preserved.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def filename(self, path):
+        key = _fsencode(os.path.abspath(path))
+        return os.path.join(self.directory, hashlib.sha1(key).hexdigest() + ".snap")
+
+    def load(self, path):
+        """Return (kind, scan time in ns, state) saved for PATH, or None if
+        nothing was saved or the saved file can not be read."""
+        try:
+            with open(self.filename(path), "rb") as f:
+                data = f.read()
+            return _decode_snapshot(data, _fsencode(os.path.abspath(path)))
+        except (IOError, OSError, ValueError, struct.error):
+            return None
+
+    def save(self, path, kind, state, scanned_ns=0):
+        filename = self.filename(path)
+        text = PY3 and not isinstance(path, bytes)
+        data = _encode_snapshot(_fsencode(os.path.abspath(path)), kind, text,
+                                state, scanned_ns)
+        tmpname = "%s.%d.tmp" % (filename, os.getpid())
+        with open(tmpname, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            os.replace(tmpname, filename)
+        except AttributeError:
+            if os.name == "nt" and os.path.exists(filename):
+                os.remove(filename)
+            os.rename(tmpname, filename)
+
+    def discard(self, path):
+        try:
+            os.remove(self.filename(path))
+        except OSError:
+            pass
+
+def _encode_entries(entries, out):
+    pack_state = snapshot_state.pack
+    pack_name = snapshot_name.pack
+    out.append(snapshot_count.pack(len(entries)))
+    for name, state in entries.items():
+        name = _fsencode(name)
+        out.append(pack_name(len(name)))
+        out.append(name)
+        out.append(pack_state(*(state or _UNKNOWN_STATE)))
+
+def _encode_snapshot(path, kind, text, state, scanned_ns):
+    out = [snapshot_header.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, kind, text,
+                                scanned_ns, len(path)),
+           path]
+    if kind == SNAPSHOT_FILE:
+        out.append(snapshot_state.pack(*(state or _UNKNOWN_STATE)))
+    elif kind == SNAPSHOT_DIR:
+        _encode_entries(state, out)
+    elif kind == SNAPSHOT_TREE:
+        out.append(snapshot_count.pack(len(state)))
+        for reldir, (dir_state, entries) in state.items():
+            reldir = _fsencode(reldir)
+            out.append(snapshot_count.pack(len(reldir)))
+            out.append(reldir)
+            out.append(snapshot_state.pack(*(dir_state or _UNKNOWN_STATE)))
+            _encode_entries(entries, out)
+    else:
+        raise ValueError("unknown snapshot kind %r" % kind)
+    return b"".join(out)
+
+def _decode_snapshot(data, path):
+    magic, version, kind, text, scanned_ns, path_len = \
+        snapshot_header.unpack_from(data, 0)
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+        raise ValueError("not a snapshot file")
+    offset = snapshot_header.size
+    if data[offset:offset+path_len] != path:
+        raise ValueError("snapshot of another path")
+    offset += path_len
+
+    unpack_state = snapshot_state.unpack_from
+    state_size = snapshot_state.size
+    unpack_count = snapshot_count.unpack_from
+    unpack_name = snapshot_name.unpack_from
+    decode = _fsdecode if text else bytes
+
+    def read_state(offset):
+        state = unpack_state(data, offset)
+        return (None if state == _UNKNOWN_STATE else state), offset + state_size
+
+    def read_entries(offset):
+        entries = {}
+        count, = unpack_count(data, offset)
+        offset += 4
+        for i in range(count):
+            name_len, = unpack_name(data, offset)
+            offset += 2
+            name = decode(data[offset:offset+name_len])
+            entries[name], offset = read_state(offset + name_len)
+        return entries, offset
+
+    if kind == SNAPSHOT_FILE:
+        state, offset = read_state(offset)
+    elif kind == SNAPSHOT_DIR:
+        state, offset = read_entries(offset)
+    elif kind == SNAPSHOT_TREE:
+        state = {}
+        count, = unpack_count(data, offset)
+        offset += 4
+        for i in range(count):
+            reldir_len, = unpack_count(data, offset)
+            offset += 4
+            reldir = decode(data[offset:offset+reldir_len])
+            dir_state, offset = read_state(offset + reldir_len)
+            entries, offset = read_entries(offset)
+            state[reldir] = (dir_state, entries)
+    else:
+        raise ValueError("unknown snapshot kind %r" % kind)
+    if offset != len(data):
+        raise ValueError("truncated snapshot file")
+    return kind, scanned_ns, state
@@ -0,0 +1,158 @@
+# Copyright (c) 2026 The FSMonitor contributors
+#
+# This is free software released under the MIT license.
+# See COPYING file for details, or visit:
+# http://www.opensource.org/licenses/mit-license.php
+#
+# The file is part of FSMonitor, a file-system monitoring library.
+# https://github.com/shaurz/fsmonitor
+
+from .compat import monotonic
+
+class Histogram(object):
+    """Counts of values in power-of-two buckets of UNIT.
+
+    Bucket i counts values from 2**(i-1) up to 2**i units, and bucket 0
+    values below one unit, so adding a value is a few integer operations
+    and percentiles are accurate to a factor of two.
+    """
+
+    __slots__ = ("unit", "counts", "count", "total", "min", "max")
+
+    BUCKETS = 64
+
+    def __init__(self, unit=1e-6):
+        self.unit = unit
+        self.counts = [0] * self.BUCKETS
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        index = int(value / self.unit).bit_length()
+        self.counts[index if index < self.BUCKETS else self.BUCKETS - 1] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def percentile(self, p):
+        """Upper bound of the bucket containing the P-th percentile, or
+        None if there are no values."""
+        if not self.count:
+            return None
+        rank = p / 100.0 * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= rank:
+                return min((1 << index) * self.unit, self.max)
+        return self.max
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else None,
+            "min": self.min,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "buckets": dict(((1 << i) * self.unit, count)
+                            for i, count in enumerate(self.counts) if count),
+        }
+
+class MonitorStats(object):
+    """Counters of the reads of an FSMonitor, see FSMonitor(stats=True).
+
+    raw_events counts the kernel's event records, events the events
+    returned by read_events, and filtered those dropped by path filters or
+    a verifier.
+    """
+
+    __slots__ = ("started", "reads", "bytes_read", "read_sizes", "raw_events",
+                 "events", "filtered", "overflows")
+
+    def __init__(self):
+        self.started = monotonic()
+        self.reads = 0
+        self.bytes_read = 0
+        # bytes per read system call
+        self.read_sizes = Histogram(1)
+        self.raw_events = 0
+        self.events = 0
+        self.filtered = 0
+        self.overflows = 0
+
+    def record_read(self, size):
+        self.reads += 1
+        self.bytes_read += size
+        self.read_sizes.add(size)
+
+    def as_dict(self):
+        elapsed = monotonic() - self.started
+        return {
+            "elapsed": elapsed,
+            "reads": self.reads,
+            "bytes_read": self.bytes_read,
+            "bytes_per_read": self.read_sizes.as_dict(),
+            "raw_events": self.raw_events,
+            "events": self.events,
+            "filtered": self.filtered,
+            "overflows": self.overflows,
+            "events_per_second": self.events / elapsed if elapsed > 0 else 0.0,
+        }
+
+class ThreadStats(object):
+    """Counters of the delivery of events by an FSMonitorThread, see
+    FSMonitorThread(stats=True). Times are in seconds.
+
+    latency is the time from the read of each event to its callback, or to
+    its return from FSMonitorThread.read_events().
+    """
+
+    __slots__ = ("started", "events", "callbacks", "callback_time", "latency")
+
+    def __init__(self):
+        self.started = monotonic()
+        self.events = 0
+        self.callbacks = 0
+        self.callback_time = Histogram()
+        self.latency = Histogram()
+
+    def record_latency(self, events):
+        now = monotonic()
+        add = self.latency.add
+        for evt in events:
+            if evt.timestamp is not None:
+                add(now - evt.timestamp)
+        self.events += len(events)
+
+    def call(self, callback, arg):
+        start = monotonic()
+        try:
+            callback(arg)
+        finally:
+            self.callback_time.add(monotonic() - start)
+            self.callbacks += 1
+
+    def as_dict(self):
+        return {
+            "elapsed": monotonic() - self.started,
+            "events": self.events,
+            "callbacks": self.callbacks,
+            "callback_time": self.callback_time.as_dict(),
+            "latency": self.latency.as_dict(),
+        }
+
+def stamp_events(events, timestamp=None):
+    """Set the timestamp of EVENTS which do not have one to TIMESTAMP, or
+    the current monotonic time."""
+    if timestamp is None:
+        timestamp = monotonic()
+    for evt in events:
+        if evt.timestamp is None:
+            evt.timestamp = timestamp
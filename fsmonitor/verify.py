@@ -0,0 +1,136 @@
+# Copyright (c) 2026 The FSMonitor contributors
+#
+# This is free software released under the MIT license.
+# See COPYING file for details, or visit:
+# http://www.opensource.org/licenses/mit-license.php
+#
+# The file is part of FSMonitor, a file-system monitoring library.
+# https://github.com/shaurz/fsmonitor
+
+import sys, os, stat, mmap, hashlib, threading
+from .common import FSEvent
+from .compat import ThreadPoolExecutor
+
+DEFAULT_MAX_SIZE = 64 * 1024 * 1024
+DEFAULT_MMAP_THRESHOLD = 1024 * 1024
+READ_CHUNK_SIZE = 65536
+
+if hasattr(hashlib, "blake2b"):
+    def new_hash():
+        return hashlib.blake2b(digest_size=20)
+else:
+    new_hash = hashlib.sha1
+
+def event_file_path(evt):
+    """Path of the file which EVT is about."""
+    path = evt.watch.path
+    name = evt.name
+    if name:
+        if isinstance(path, bytes) and not isinstance(name, bytes):
+            name = name.encode(sys.getfilesystemencoding())
+        path = os.path.join(path, name)
+    return path
+
+def file_digest(path, mmap_threshold=DEFAULT_MMAP_THRESHOLD):
+    """Return the digest of the contents of the file at PATH and the stat
+    result of the file it was read from."""
+    with open(path, "rb") as f:
+        st = os.fstat(f.fileno())
+        h = new_hash()
+        if st.st_size >= mmap_threshold:
+            m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                h.update(m)
+            finally:
+                m.close()
+        else:
+            for chunk in iter(lambda: f.read(READ_CHUNK_SIZE), b""):
+                h.update(chunk)
+    return h.digest(), st
+
+def stat_key(st):
+    try:
+        mtime_ns = st.st_mtime_ns
+    except AttributeError:
+        mtime_ns = int(st.st_mtime * 1000000000)
+    return (st.st_ino, st.st_size, mtime_ns)
+
+class ContentVerifier(object):
+    """Drops Modify events for files whose contents did not change.
+
+    The digest of each file is cached with its (inode, size, mtime_ns), so
+    a file is only hashed again after it changed on disk. A Modify event is
+    kept if the file has not been hashed before, is larger than max_size
+    bytes, is not a regular file or can not be read. Files of at least
+    mmap_threshold bytes are hashed through mmap. If workers is greater
+    than one, the files in a batch of events are hashed on a thread pool.
+
+    Use prime() to hash files before their first change, so that it can be
+    verified too.
+    """
+
+    def __init__(self, workers=4, max_size=DEFAULT_MAX_SIZE,
+                 mmap_threshold=DEFAULT_MMAP_THRESHOLD):
+        self.max_size = max_size
+        self.mmap_threshold = mmap_threshold
+        self.__lock = threading.Lock()
+        # path -> ((inode, size, mtime_ns), digest)
+        self.__cache = {}
+        self.__executor = None
+        if workers > 1 and ThreadPoolExecutor is not None:
+            self.__executor = ThreadPoolExecutor(workers)
+
+    def close(self):
+        if self.__executor is not None:
+            self.__executor.shutdown(wait=False)
+            self.__executor = None
+
+    def __map(self, func, items):
+        if self.__executor is not None and len(items) > 1:
+            return list(self.__executor.map(func, items))
+        return [func(item) for item in items]
+
+    def prime(self, paths):
+        """Hash the files at PATHS to be compared against on their next change."""
+        self.__map(self.changed, list(paths))
+
+    def forget(self, path):
+        with self.__lock:
+            self.__cache.pop(path, None)
+
+    def changed(self, path):
+        """Return whether the contents of the file at PATH may have changed
+        since it was last hashed, and remember its new digest."""
+        with self.__lock:
+            cached = self.__cache.get(path)
+        try:
+            st = os.stat(path)
+            if not stat.S_ISREG(st.st_mode) or st.st_size > self.max_size:
+                self.forget(path)
+                return True
+            if cached is not None and cached[0] == stat_key(st):
+                return False
+            digest, st = file_digest(path, self.mmap_threshold)
+        except (IOError, OSError):
+            self.forget(path)
+            return True
+        with self.__lock:
+            self.__cache[path] = (stat_key(st), digest)
+        return cached is None or cached[1] != digest
+
+    def filter(self, events):
+        """Return EVENTS without the Modify events of unchanged files."""
+        paths = {}
+        for evt in events:
+            if evt.watch is not None:
+                if evt.action == FSEvent.Modify:
+                    paths[event_file_path(evt)] = True
+                elif evt.action & (FSEvent.Delete | FSEvent.DeleteSelf | FSEvent.MoveFrom):
+                    self.forget(event_file_path(evt))
+        if not paths:
+            return events
+        paths = list(paths)
+        changed = dict(zip(paths, self.__map(self.changed, paths)))
+        return [evt for evt in events
+                if evt.action != FSEvent.Modify or evt.watch is None
+                or changed[event_file_path(evt)]]
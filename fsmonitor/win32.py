@@ -61,6 +61,9 @@ class FSMonitorWindowsError(WindowsError, FSMonitorError):
     pass
 
 class FSMonitorWatch(object):
+    __slots__ = ("path", "flags", "user", "enabled", "_recursive", "_win32_flags",
+                 "_key", "_hDir", "_overlapped", "_buf", "_removed")
+
     def __init__(self, path, flags, user, recursive):
         self.path = path
         self.flags = flags
@@ -0,0 +1,47 @@
+import os, time, threading
+from utils import *
+from fsmonitor import *
+
+class BatchCollector(object):
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.batches = []
+
+    def __call__(self, events):
+        with self.lock:
+            self.batches.append(list(events))
+
+def test_10_batch_size():
+    testdir = make_testdir("batch-size")
+    collector = BatchCollector()
+    thread = FSMonitorThread(batch_callback=collector, max_batch_size=10)
+    thread.add_dir_watch(testdir, flags=FSEvent.Create)
+    for i in range(35):
+        touch(os.path.join(testdir, "f%d" % i))
+
+    time.sleep(0.2)
+
+    with collector.lock:
+        batches = list(collector.batches)
+    assert batches
+    assert all(0 < len(batch) <= 10 for batch in batches)
+    assert sorted(evt.name for batch in batches for evt in batch) == \
+        sorted("f%d" % i for i in range(35))
+
+def test_10_batch_delay():
+    testdir = make_testdir("batch-delay")
+    collector = BatchCollector()
+    thread = FSMonitorThread(batch_callback=collector, max_batch_delay=0.3)
+    thread.add_dir_watch(testdir, flags=FSEvent.Create)
+    touch(os.path.join(testdir, "a"))
+    time.sleep(0.1)
+    touch(os.path.join(testdir, "b"))
+    time.sleep(0.05)
+    with collector.lock:
+        assert collector.batches == []
+
+    time.sleep(0.4)
+
+    with collector.lock:
+        batches = list(collector.batches)
+    assert [[evt.name for evt in batch] for batch in batches] == [["a", "b"]]
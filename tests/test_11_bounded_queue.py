@@ -0,0 +1,74 @@
+import time
+import pytest
+from utils import *
+from fsmonitor import *
+
+class ScriptedMonitor(object):
+    """Returns EVENTS in batches of BATCH, then nothing."""
+
+    def __init__(self, events, batch=4):
+        self.events = list(events)
+        self.batch = batch
+        self.watches = []
+
+    def read_events(self, timeout=None):
+        if self.events:
+            events, self.events = self.events[:self.batch], self.events[self.batch:]
+            return events
+        time.sleep(0.01)
+        return []
+
+def scripted(n, batch=4):
+    events = [FSEvent(None, FSEvent.Create, "f%d" % i) for i in range(n)]
+    return lambda: ScriptedMonitor(events, batch)
+
+def names(events):
+    return [evt.name for evt in events]
+
+def test_11_block():
+    thread = FSMonitorThread(fsmonitor_class=scripted(12),
+                             max_queue_size=5, queue_policy="block")
+    events = []
+    while len(events) < 12:
+        batch = thread.read_events(timeout=1.0)
+        assert 0 < len(batch) <= 5
+        events.extend(batch)
+    assert names(events) == ["f%d" % i for i in range(12)]
+    assert thread.dropped_events == 0
+
+def test_11_drop_oldest():
+    thread = FSMonitorThread(fsmonitor_class=scripted(12),
+                             max_queue_size=5, queue_policy="drop_oldest")
+    time.sleep(0.1)
+    assert names(thread.read_events()) == ["f%d" % i for i in range(7, 12)]
+    assert thread.dropped_events == 7
+
+def test_11_overflow():
+    thread = FSMonitorThread(fsmonitor_class=scripted(12),
+                             max_queue_size=5, queue_policy="overflow")
+    time.sleep(0.1)
+    events = thread.read_events()
+    assert names(events[:-1]) == ["f0", "f1", "f2", "f3"]
+    assert events[-1].action == FSEvent.Overflow
+    assert thread.dropped_events == 8
+
+def test_11_overflow_full():
+    # the first batch fills the queue exactly
+    thread = FSMonitorThread(fsmonitor_class=scripted(4, batch=3),
+                             max_queue_size=3, queue_policy="overflow")
+    time.sleep(0.1)
+    events = thread.read_events()
+    assert len(events) == 3
+    assert names(events[:-1]) == ["f0", "f1"]
+    assert events[-1].action == FSEvent.Overflow
+    assert thread.dropped_events == 2
+
+def test_11_read_events_timeout():
+    thread = FSMonitorThread(fsmonitor_class=scripted(0))
+    start = time.time()
+    assert thread.read_events(timeout=0.2) == []
+    assert time.time() - start >= 0.15
+
+def test_11_bad_policy():
+    with pytest.raises(ValueError):
+        FSMonitorThread(autostart=False, queue_policy="bogus")
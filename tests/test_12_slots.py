@@ -0,0 +1,20 @@
+from utils import *
+from fsmonitor import *
+from fsmonitor.common import FSMoveEvent
+from fsmonitor.polling import FSMonitor as PollingFSMonitor
+
+def test_12_event_slots():
+    evt = FSEvent(None, FSEvent.Create, "x")
+    assert not hasattr(evt, "__dict__")
+    assert evt.action_name == "create"
+    move = FSMoveEvent(None, "y", None, "x")
+    assert not hasattr(move, "__dict__")
+    assert (move.action, move.name, move.src_name) == (FSEvent.Move, "y", "x")
+
+def test_12_watch_slots():
+    for monitor_class in (FSMonitor, PollingFSMonitor):
+        m = monitor_class()
+        w = m.add_dir_watch(tempdir)
+        assert not hasattr(w, "__dict__")
+        m.remove_watch(w)
+        m.close()
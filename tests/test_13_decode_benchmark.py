@@ -0,0 +1,18 @@
+import os, sys, threading
+from utils import *
+from fsmonitor import *
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "benchmarks"))
+from bench_decode import make_events, baseline_decode
+
+@linux_only
+def test_13_decode():
+    from fsmonitor.linux import FSMonitor as LinuxFSMonitor
+    m = LinuxFSMonitor()
+    w = m.add_dir_watch(tempdir)
+    buf = make_events(w._wd, 2000)
+
+    events = m._process_events(buf, len(buf))
+    expected = baseline_decode(bytes(buf), {w._wd: w}, threading.Lock())
+    m.close()
+    assert [(e.action, e.name) for e in events] == [(e.action, e.name) for e in expected]
@@ -0,0 +1,59 @@
+import os
+import pytest
+from utils import *
+from fsmonitor import *
+from fsmonitor.polling import FSMonitor as PollingFSMonitor
+
+def test_14_polling_modify_attrib():
+    testdir = make_testdir("polling-engine")
+    touch(os.path.join(testdir, "x"))
+    m = PollingFSMonitor()
+    m.polling_interval = 0
+    m.add_dir_watch(testdir)
+
+    with open(os.path.join(testdir, "x"), "ab") as f:
+        f.write(b"data")
+    assert actions(m.read_events()) == [(FSEvent.Modify, "x")]
+
+    os.chmod(os.path.join(testdir, "x"), 0o600)
+    assert actions(m.read_events()) == [(FSEvent.Attrib, "x")]
+    assert m.read_events() == []
+
+@pytest.mark.parametrize("pair_moves", [False, True])
+def test_14_polling_rename(pair_moves):
+    testdir = make_testdir("polling-rename")
+    touch(os.path.join(testdir, "x"))
+    m = PollingFSMonitor(pair_moves=pair_moves)
+    m.polling_interval = 0
+    m.add_dir_watch(testdir)
+
+    os.rename(os.path.join(testdir, "x"), os.path.join(testdir, "y"))
+    events = m.read_events()
+    if pair_moves:
+        assert actions(events) == [(FSEvent.Move, "y")]
+        assert events[0].src_name == "x"
+    else:
+        assert actions(events) == [(FSEvent.MoveFrom, "x"), (FSEvent.MoveTo, "y")]
+
+def test_14_polling_flags():
+    testdir = make_testdir("polling-flags")
+    m = PollingFSMonitor()
+    m.polling_interval = 0
+    m.add_dir_watch(testdir, flags=FSEvent.Delete)
+    touch(os.path.join(testdir, "x"))
+    assert m.read_events() == []
+    remove(os.path.join(testdir, "x"))
+    assert actions(m.read_events()) == [(FSEvent.Delete, "x")]
+
+def test_14_polling_inode_reuse():
+    testdir = make_testdir("polling-inode-reuse")
+    touch(os.path.join(testdir, "x"))
+    m = PollingFSMonitor(pair_moves=True)
+    m.polling_interval = 0
+    m.add_dir_watch(testdir)
+
+    # The new file may get the inode of the deleted one, which is not a rename.
+    remove(os.path.join(testdir, "x"))
+    with open(os.path.join(testdir, "y"), "wb") as f:
+        f.write(b"data")
+    assert actions(m.read_events()) == [(FSEvent.Create, "y"), (FSEvent.Delete, "x")]
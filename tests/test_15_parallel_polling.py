@@ -0,0 +1,58 @@
+import os, time, shutil, threading
+from utils import *
+from fsmonitor import *
+from fsmonitor import polling
+from fsmonitor.polling import FSMonitor as PollingFSMonitor
+
+def make_dirs(name, count):
+    testdir = get_testpath(name)
+    shutil.rmtree(testdir, ignore_errors=True)
+    paths = [os.path.join(testdir, "d%02d" % i) for i in range(count)]
+    for path in paths:
+        os.makedirs(path)
+    return paths
+
+def test_15_parallel_polling():
+    paths = make_dirs("parallel-polling", 20)
+    m = PollingFSMonitor(scan_workers=4)
+    m.polling_interval = 0
+    watches = [m.add_dir_watch(path) for path in paths]
+    for path in paths[::2]:
+        touch(os.path.join(path, "a"))
+        touch(os.path.join(path, "b"))
+
+    events = m.read_events()
+    m.close()
+
+    assert set((evt.watch, evt.name) for evt in events) == \
+        set((w, name) for w in watches[::2] for name in ("a", "b"))
+    # events of each watch are together and in order
+    order = [watches.index(evt.watch) for evt in events]
+    assert order == sorted(order)
+    for i in range(0, len(events), 2):
+        assert sorted([events[i].name, events[i+1].name]) == ["a", "b"]
+
+def test_15_max_scans_per_mount(monkeypatch):
+    paths = make_dirs("parallel-polling-mount", 8)
+    lock = threading.Lock()
+    active = [0, 0]
+    new_state = polling.FSMonitorDirWatch.new_state
+
+    def slow_new_state(path):
+        with lock:
+            active[0] += 1
+            active[1] = max(active[1], active[0])
+        time.sleep(0.02)
+        with lock:
+            active[0] -= 1
+        return new_state(path)
+
+    m = PollingFSMonitor(scan_workers=8, max_scans_per_mount=2)
+    m.polling_interval = 0
+    for path in paths:
+        m.add_dir_watch(path)
+    monkeypatch.setattr(polling.FSMonitorDirWatch, "new_state", staticmethod(slow_new_state))
+    m.read_events()
+    m.close()
+
+    assert active[1] == 2
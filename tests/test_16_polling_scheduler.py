@@ -0,0 +1,50 @@
+import os, time
+from utils import *
+from fsmonitor import *
+from fsmonitor.polling import FSMonitor as PollingFSMonitor
+
+def test_16_timeout():
+    testdir = make_testdir("scheduler-timeout")
+    m = PollingFSMonitor()
+    m.polling_interval = 0.05
+    m.add_dir_watch(testdir)
+    start = time.time()
+    assert m.read_events(0.3) == []
+    elapsed = time.time() - start
+    assert 0.25 <= elapsed < 1.0
+
+def test_16_no_watches():
+    m = PollingFSMonitor()
+    m.polling_interval = 0.05
+    start = time.time()
+    assert m.read_events() == []
+    assert time.time() - start < 1.0
+
+def test_16_per_watch_interval():
+    fastdir = make_testdir("scheduler-fast")
+    slowdir = make_testdir("scheduler-slow")
+    m = PollingFSMonitor()
+    fast = m.add_dir_watch(fastdir, interval=0.02)
+    slow = m.add_dir_watch(slowdir, interval=10)
+    scans = {fast: 0, slow: 0}
+    scan = m._scan
+
+    def counting_scan(watch):
+        scans[watch] += 1
+        return scan(watch)
+
+    m._scan = counting_scan
+    m.read_events(0.3)
+    assert scans[slow] == 0
+    assert scans[fast] >= 5
+
+def test_16_returns_on_events():
+    testdir = make_testdir("scheduler-events")
+    m = PollingFSMonitor()
+    m.polling_interval = 0.02
+    m.add_dir_watch(testdir)
+    touch(os.path.join(testdir, "x"))
+    start = time.time()
+    events = m.read_events(10)
+    assert time.time() - start < 1.0
+    assert [(evt.action, evt.name) for evt in events] == [(FSEvent.Create, "x")]
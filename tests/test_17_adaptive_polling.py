@@ -0,0 +1,37 @@
+import os
+from utils import *
+from fsmonitor import *
+from fsmonitor.polling import FSMonitor as PollingFSMonitor
+
+def test_17_adaptive_backoff():
+    quietdir = make_testdir("adaptive-quiet")
+    busydir = make_testdir("adaptive-busy")
+    m = PollingFSMonitor(adaptive=True, min_interval=0.01, max_interval=0.08)
+    quiet = m.add_dir_watch(quietdir)
+    busy = m.add_dir_watch(busydir)
+
+    # both watches back off while nothing changes
+    assert m.read_events(0.4) == []
+    assert quiet._interval == busy._interval == 0.08
+    stats = m.get_stats()
+    assert stats["scans"] < 2 * 0.4 / 0.01 / 2
+
+    # a change brings the busy watch back to the minimum interval
+    touch(os.path.join(busydir, "x"))
+    assert [evt.name for evt in m.read_events(1)] == ["x"]
+    assert busy._interval == 0.01
+    assert quiet._interval == 0.08
+
+    stats = m.get_stats()
+    assert stats["watches"] == 2
+    assert stats["events"] == 1
+    assert stats["interval_min"] == 0.01
+    assert stats["interval_max"] == 0.08
+
+def test_17_fixed_interval():
+    testdir = make_testdir("adaptive-fixed")
+    m = PollingFSMonitor(adaptive=True, min_interval=0.01, max_interval=0.08)
+    w = m.add_dir_watch(testdir, interval=0.02)
+    m.read_events(0.1)
+    assert m.get_stats()["interval_max"] == 0.02
+    assert w._interval is None
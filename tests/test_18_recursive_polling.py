@@ -0,0 +1,58 @@
+import os, time
+import pytest
+from utils import *
+from fsmonitor import *
+from fsmonitor import snapshot
+from fsmonitor.polling import FSMonitor as PollingFSMonitor
+
+@pytest.mark.parametrize("prune", [False, True])
+def test_18_recursive_polling(prune):
+    testdir = make_testdir("recursive-polling")
+    os.makedirs(os.path.join(testdir, "a", "b"))
+    m = PollingFSMonitor()
+    m.polling_interval = 0
+    m.add_dir_watch(testdir, recursive=True, prune=prune)
+
+    touch(os.path.join(testdir, "a", "b", "x"))
+    assert actions(m.read_events()) == [(FSEvent.Create, os.path.join("a", "b", "x"))]
+
+    os.makedirs(os.path.join(testdir, "c", "d"))
+    assert actions(m.read_events()) == [(FSEvent.Create, "c"),
+                                        (FSEvent.Create, os.path.join("c", "d"))]
+
+    os.rename(os.path.join(testdir, "a", "b"), os.path.join(testdir, "c", "b"))
+    assert actions(m.read_events()) == [(FSEvent.MoveFrom, os.path.join("a", "b")),
+                                        (FSEvent.MoveTo, os.path.join("c", "b"))]
+
+    remove(os.path.join(testdir, "c", "b", "x"))
+    assert actions(m.read_events()) == [(FSEvent.Delete, os.path.join("c", "b", "x"))]
+    assert m.read_events() == []
+
+def test_18_prune_skips_unchanged_dirs(monkeypatch):
+    testdir = make_testdir("recursive-prune")
+    for i in range(10):
+        os.makedirs(os.path.join(testdir, "d%d" % i, "sub"))
+        touch(os.path.join(testdir, "d%d" % i, "sub", "f"))
+    # make the tree look old enough to be trusted
+    old = time.time() - 10
+    for root, dirs, files in os.walk(testdir):
+        os.utime(root, (old, old))
+
+    m = PollingFSMonitor()
+    m.polling_interval = 0
+    m.add_dir_watch(testdir, recursive=True)
+    m.read_events()
+
+    reads = []
+    dir_snapshot = snapshot.dir_snapshot
+    def counting_dir_snapshot(path):
+        reads.append(path)
+        return dir_snapshot(path)
+    monkeypatch.setattr(snapshot, "dir_snapshot", counting_dir_snapshot)
+
+    assert m.read_events() == []
+    assert reads == []
+
+    touch(os.path.join(testdir, "d3", "sub", "g"))
+    assert actions(m.read_events()) == [(FSEvent.Create, os.path.join("d3", "sub", "g"))]
+    assert reads == [os.path.join(testdir, "d3", "sub")]
@@ -0,0 +1,77 @@
+import os
+import pytest
+from utils import *
+from fsmonitor import *
+from fsmonitor.snapshot import SnapshotStore, SNAPSHOT_TREE, tree_snapshot
+from fsmonitor.polling import FSMonitor as PollingFSMonitor
+
+def test_19_store_round_trip():
+    testdir = make_testdir("snapshot-store")
+    os.makedirs(os.path.join(testdir, "tree", "sub"))
+    touch(os.path.join(testdir, "tree", "sub", "f"))
+    store = SnapshotStore(os.path.join(testdir, "store"))
+    tree = tree_snapshot(os.path.join(testdir, "tree"))
+    tree["sub"][1]["unknown"] = None
+
+    store.save(os.path.join(testdir, "tree"), SNAPSHOT_TREE, tree, 1234)
+    assert store.load(os.path.join(testdir, "tree")) == (SNAPSHOT_TREE, 1234, tree)
+    assert store.load(os.path.join(testdir, "other")) is None
+
+    with open(store.filename(os.path.join(testdir, "tree")), "r+b") as f:
+        f.truncate(40)
+    assert store.load(os.path.join(testdir, "tree")) is None
+
+@pytest.mark.parametrize("recursive", [False, True])
+def test_19_polling_catch_up(recursive):
+    testdir = make_testdir("snapshot-polling")
+    watchdir = os.path.join(testdir, "watched")
+    mkdir(watchdir)
+    touch(os.path.join(watchdir, "old"))
+    snapshot_dir = os.path.join(testdir, "store")
+
+    m = PollingFSMonitor(snapshot_dir=snapshot_dir)
+    m.add_dir_watch(watchdir, recursive=recursive)
+    m.close()
+
+    touch(os.path.join(watchdir, "new"))
+    remove(os.path.join(watchdir, "old"))
+
+    m = PollingFSMonitor(snapshot_dir=snapshot_dir)
+    m.add_dir_watch(watchdir, recursive=recursive)
+    assert actions(m.read_events(1)) == [(FSEvent.Create, "new"), (FSEvent.Delete, "old")]
+    m.close()
+
+    m = PollingFSMonitor(snapshot_dir=snapshot_dir)
+    m.add_dir_watch(watchdir, recursive=recursive)
+    assert m.read_events(0.2) == []
+    m.close()
+
+@linux_only
+@pytest.mark.parametrize("recursive", [False, True])
+def test_19_inotify_catch_up(recursive):
+    from fsmonitor.linux import FSMonitor as LinuxFSMonitor
+    testdir = make_testdir("snapshot-inotify")
+    watchdir = os.path.join(testdir, "watched")
+    os.makedirs(os.path.join(watchdir, "sub"))
+    touch(os.path.join(watchdir, "old"))
+    snapshot_dir = os.path.join(testdir, "store")
+
+    m = LinuxFSMonitor(snapshot_dir=snapshot_dir)
+    m.add_dir_watch(watchdir, recursive=recursive)
+    assert m.read_events(0) == []
+    touch(os.path.join(watchdir, "during"))
+    m.read_events(0.1)
+    m.close()
+
+    touch(os.path.join(watchdir, "sub", "new"))
+    remove(os.path.join(watchdir, "old"))
+    with open(os.path.join(watchdir, "during"), "wb") as f:
+        f.write(b"changed")
+
+    m = LinuxFSMonitor(snapshot_dir=snapshot_dir)
+    m.add_dir_watch(watchdir, recursive=recursive)
+    expected = [(FSEvent.Modify, "during"), (FSEvent.Delete, "old")]
+    if recursive:
+        expected.append((FSEvent.Create, os.path.join("sub", "new")))
+    assert actions(m.read_events()) == sorted(expected)
+    m.close()
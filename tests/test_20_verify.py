@@ -0,0 +1,55 @@
+import os
+import pytest
+from utils import *
+from fsmonitor import *
+from fsmonitor.verify import ContentVerifier
+from fsmonitor.polling import FSMonitor as PollingFSMonitor
+
+def write(path, data, mtime=None):
+    with open(path, "wb") as f:
+        f.write(data)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+@pytest.mark.parametrize("workers,mmap_threshold", [(1, 1 << 20), (4, 1)])
+def test_20_verifier(workers, mmap_threshold):
+    testdir = make_testdir("verify")
+    path = os.path.join(testdir, "x")
+    write(path, b"data", 1000)
+    v = ContentVerifier(workers=workers, mmap_threshold=mmap_threshold)
+    v.prime([path])
+
+    # same contents, new mtime
+    write(path, b"data", 2000)
+    assert not v.changed(path)
+    write(path, b"other", 3000)
+    assert v.changed(path)
+    assert not v.changed(path)
+    v.close()
+
+def test_20_verifier_limits():
+    testdir = make_testdir("verify-limits")
+    path = os.path.join(testdir, "big")
+    write(path, b"x" * 100, 1000)
+    v = ContentVerifier(workers=1, max_size=10)
+    v.prime([path])
+    write(path, b"x" * 100, 2000)
+    assert v.changed(path)
+    assert v.changed(os.path.join(testdir, "missing"))
+    assert v.changed(testdir)
+
+def test_20_polling_verify():
+    testdir = make_testdir("verify-polling")
+    write(os.path.join(testdir, "same"), b"same", 1000)
+    write(os.path.join(testdir, "changed"), b"before", 1000)
+    v = ContentVerifier(workers=1)
+    v.prime([os.path.join(testdir, "same"), os.path.join(testdir, "changed")])
+    m = PollingFSMonitor(verifier=v)
+    m.polling_interval = 0
+    # hashing the files changes their access times
+    m.add_dir_watch(testdir, FSEvent.All & ~FSEvent.Access)
+
+    write(os.path.join(testdir, "same"), b"same", 2000)
+    write(os.path.join(testdir, "changed"), b"after!", 2000)
+    assert actions(m.read_events()) == [(FSEvent.Modify, "changed")]
+    m.close()
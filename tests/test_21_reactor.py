@@ -0,0 +1,57 @@
+import os, time, threading
+import pytest
+from utils import *
+from fsmonitor import *
+
+def wait_for(predicate, timeout=2.0):
+    deadline = time.time() + timeout
+    while not predicate() and time.time() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+@linux_only
+def test_21_reactor():
+    from fsmonitor.reactor import FSMonitorReactor
+    from fsmonitor.linux import FSMonitor as LinuxFSMonitor
+    dirs = [make_testdir("reactor-%d" % i) for i in range(3)]
+    monitors = [LinuxFSMonitor() for d in dirs]
+    for m, d in zip(monitors, dirs):
+        m.add_dir_watch(d, FSEvent.Create)
+
+    lock = threading.Lock()
+    received = []
+    def callback(event):
+        with lock:
+            received.append((event.watch, event.name))
+    batches = []
+
+    reactor = FSMonitorReactor()
+    reactor.register(monitors[0], callback)
+    reactor.register(monitors[1], batch_callback=batches.append)
+    with pytest.raises(FSMonitorError):
+        reactor.register(monitors[0], callback)
+
+    touch(os.path.join(dirs[0], "a"))
+    touch(os.path.join(dirs[1], "b"))
+    assert wait_for(lambda: received and batches)
+    assert received == [(monitors[0].watches[0], "a")]
+    assert [evt.name for batch in batches for evt in batch] == ["b"]
+
+    # registered while running
+    reactor.register(monitors[2], callback)
+    touch(os.path.join(dirs[2], "c"))
+    assert wait_for(lambda: len(received) == 2)
+    assert received[1] == (monitors[2].watches[0], "c")
+
+    reactor.unregister(monitors[0])
+    assert set(reactor.monitors) == set(monitors[1:])
+    touch(os.path.join(dirs[0], "d"))
+    time.sleep(0.1)
+    assert len(received) == 2
+    assert [evt.name for evt in monitors[0].read_events(0)] == ["d"]
+
+    reactor.stop()
+    reactor.join(1)
+    assert not reactor.is_alive()
+    for m in monitors:
+        m.close()
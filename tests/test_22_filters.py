@@ -0,0 +1,73 @@
+import os, shutil
+import pytest
+from utils import *
+from fsmonitor import *
+from fsmonitor.filters import PathFilter
+from fsmonitor.polling import FSMonitor as PollingFSMonitor
+
+def make_tree(name):
+    testdir = get_testpath(name)
+    shutil.rmtree(testdir, ignore_errors=True)
+    os.makedirs(os.path.join(testdir, ".git", "objects"))
+    os.makedirs(os.path.join(testdir, "pkg"))
+    return testdir
+
+def write_files(testdir):
+    touch(os.path.join(testdir, "setup.py"))
+    touch(os.path.join(testdir, "README"))
+    touch(os.path.join(testdir, "pkg", "mod.py"))
+    touch(os.path.join(testdir, "pkg", ".mod.py.swp"))
+    touch(os.path.join(testdir, ".git", "objects", "x.py"))
+
+def names(events):
+    return sorted(evt.name for evt in events)
+
+def test_22_path_filter():
+    f = PathFilter(include=["*.py"], exclude=[".git/**", "*.swp", "build/*.py"])
+    assert f.match("a.py")
+    assert f.match("pkg/a.py")
+    assert f.match(b"pkg/a.py")
+    assert not f.match("README")
+    assert not f.match(".git/x.py")
+    assert not f.match("pkg/.a.py.swp")
+    assert not f.match("build/a.py")
+    assert f.match("build/sub/a.py")
+    assert f.excluded(".git")
+    assert f.excluded(b".git/objects")
+    assert not f.excluded("pkg")
+
+    f = PathFilter(include="src/**/*.c")
+    assert f.match("src/a.c")
+    assert f.match("src/x/y/a.c")
+    assert not f.match("a.c")
+    assert PathFilter(exclude="file[0-9]").match("file1") is False
+    assert PathFilter(exclude="file[!0-9]").match("file1") is True
+
+expected = ["pkg/mod.py", "setup.py"]
+
+@linux_only
+def test_22_inotify_filters():
+    from fsmonitor.linux import FSMonitor as LinuxFSMonitor
+    testdir = make_tree("filters-inotify")
+    m = LinuxFSMonitor()
+    watch = m.add_dir_watch(testdir, FSEvent.Create, recursive=True,
+                            include="*.py", exclude=[".git/**", "*.swp"])
+    # the root and pkg, but not .git or .git/objects
+    assert len(watch._nodes) == 2
+    write_files(testdir)
+    assert names(m.read_events(0.1)) == expected
+    m.close()
+
+@pytest.mark.parametrize("recursive", [False, True])
+def test_22_polling_filters(recursive):
+    testdir = make_tree("filters-polling")
+    m = PollingFSMonitor()
+    m.polling_interval = 0
+    watch = m.add_dir_watch(testdir, FSEvent.Create, recursive=recursive,
+                            include="*.py", exclude=[".git/**", "*.swp"])
+    write_files(testdir)
+    if recursive:
+        assert sorted(watch.state) == ["", "pkg"]
+        assert names(m.read_events()) == expected
+    else:
+        assert names(m.read_events()) == ["setup.py"]
@@ -0,0 +1,96 @@
+import os, time, errno
+import pytest
+from utils import *
+from fsmonitor import *
+
+pytestmark = linux_only
+
+def test_23_limits():
+    from fsmonitor.linux import FSMonitor as LinuxFSMonitor, inotify_limits
+    limits = inotify_limits()
+    assert sorted(limits) == ["max_queued_events", "max_user_instances", "max_user_watches"]
+    m = LinuxFSMonitor()
+    m.add_dir_watch(tempdir)
+    limits = m.get_limits()
+    assert limits["watches"] == 1
+    assert limits["polled_trees"] == 0
+    m.close()
+
+def test_23_add_dir_watches():
+    from fsmonitor.linux import FSMonitor as LinuxFSMonitor
+    testdir = make_testdir("bulk-watches")
+    paths = [os.path.join(testdir, "d%03d" % i) for i in range(50)]
+    for path in paths:
+        mkdir(path)
+    m = LinuxFSMonitor()
+    watches = m.add_dir_watches(paths, FSEvent.Create)
+    assert [w.path for w in watches] == [p.encode() for p in paths]
+    # the directory of the paths is shared
+    assert all(w._dirname is watches[0]._dirname for w in watches)
+    touch(os.path.join(paths[7], "x"))
+    events = m.read_events(1)
+    assert [(evt.watch, evt.name) for evt in events] == [(watches[7], "x")]
+
+    with pytest.raises(FSMonitorOSError):
+        m.add_dir_watches([os.path.join(testdir, "new"), os.path.join(testdir, "missing")])
+    assert m.get_limits()["watches"] == 50
+    m.close()
+
+def test_23_fallback_polling(monkeypatch):
+    from fsmonitor import linux
+    testdir = make_testdir("fallback-polling")
+    for name in ("a", "b", "c"):
+        mkdir(os.path.join(testdir, name))
+
+    m = linux.FSMonitor(fallback_polling=True)
+    real_add_watch = linux.inotify_add_watch
+    def limited_add_watch(fd, path, mask):
+        if m.get_limits()["watches"] >= 3:
+            return -1
+        return real_add_watch(fd, path, mask)
+    monkeypatch.setattr(linux, "inotify_add_watch", limited_add_watch)
+    monkeypatch.setattr(linux, "get_errno", lambda: errno.ENOSPC)
+
+    watch = m.add_dir_watch(testdir, FSEvent.Create, recursive=True)
+    assert m.get_limits()["watches"] == 3
+    assert m.get_limits()["polled_trees"] == 1
+    for name in ("a", "b", "c"):
+        touch(os.path.join(testdir, name, "f"))
+    assert sorted(evt.name for evt in collect(m, 3)) == ["a/f", "b/f", "c/f"]
+
+    # a new directory takes the watch of the least recently active one
+    mkdir(os.path.join(testdir, "d"))
+    assert sorted(evt.name for evt in collect(m, 1)) == ["d"]
+    assert m.get_limits()["watches"] == 3
+    assert m.get_limits()["polled_trees"] == 2
+    for name in ("a", "b", "c", "d"):
+        touch(os.path.join(testdir, name, "g"))
+    assert sorted(evt.name for evt in collect(m, 4)) == ["a/g", "b/g", "c/g", "d/g"]
+    m.close()
+
+def test_23_fallback_polling_modify(monkeypatch):
+    from fsmonitor import linux
+    testdir = make_testdir("fallback-polling-modify")
+    for name in ("a", "b", "c"):
+        mkdir(os.path.join(testdir, name))
+        touch(os.path.join(testdir, name, "f"))
+        # old enough for the poller to trust their mtimes
+        os.utime(os.path.join(testdir, name), (time.time() - 60, time.time() - 60))
+
+    m = linux.FSMonitor(fallback_polling=True)
+    real_add_watch = linux.inotify_add_watch
+    def limited_add_watch(fd, path, mask):
+        if m.get_limits()["watches"] >= 3:
+            return -1
+        return real_add_watch(fd, path, mask)
+    monkeypatch.setattr(linux, "inotify_add_watch", limited_add_watch)
+    monkeypatch.setattr(linux, "get_errno", lambda: errno.ENOSPC)
+
+    m.add_dir_watch(testdir, FSEvent.Modify, recursive=True)
+    assert m.get_limits()["polled_trees"] == 1
+    # writes in place do not change the mtime of the polled directory
+    for name in ("a", "b", "c"):
+        with open(os.path.join(testdir, name, "f"), "ab") as f:
+            f.write(b"data")
+    assert sorted(evt.name for evt in collect(m, 3)) == ["a/f", "b/f", "c/f"]
+    m.close()
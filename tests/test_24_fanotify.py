@@ -0,0 +1,109 @@
+import os, errno
+import pytest
+from utils import *
+from fsmonitor import *
+
+pytestmark = linux_only
+
+def fanotify_monitor():
+    from fsmonitor import fanotify
+    if not fanotify.fanotify_available():
+        pytest.skip("fanotify with directory-entry events is not available")
+    return fanotify.FSMonitor()
+
+def test_24_dir_watch_without_fids(monkeypatch):
+    from fsmonitor import fanotify
+    fanotify_monitor()
+    # a kernel without FAN_REPORT_FID rejects the flags with EINVAL
+    real_init = fanotify.fanotify_init
+    def fanotify_init(flags, event_flags):
+        if flags & fanotify.FAN_REPORT_FID:
+            return -1
+        return real_init(flags, event_flags)
+    monkeypatch.setattr(fanotify, "fanotify_init", fanotify_init)
+    monkeypatch.setattr(fanotify, "get_errno", lambda: errno.EINVAL)
+    m = fanotify.FSMonitor()
+    assert not m.dirent_events
+    testdir = make_testdir("fanotify-no-fid")
+    touch(os.path.join(testdir, "x"))
+    watch = m.add_dir_watch(testdir, FSEvent.Modify)
+    with open(os.path.join(testdir, "x"), "ab") as f:
+        f.write(b"x")
+    events = [(evt.watch, evt.action, evt.name) for evt in collect(m, 1)]
+    m.close()
+    assert events == [(watch, FSEvent.Modify, "x")]
+
+def test_24_event_actions():
+    from fsmonitor.fanotify import event_actions, FAN_CREATE, FAN_MODIFY, FAN_DELETE
+    missing = get_testpath("fanotify-missing")
+    remove(missing)
+    mask = FAN_CREATE | FAN_MODIFY | FAN_DELETE
+    assert event_actions(mask, missing) == (FSEvent.Create, FSEvent.Modify, FSEvent.Delete)
+    assert event_actions(mask, tempdir) == (FSEvent.Delete, FSEvent.Create, FSEvent.Modify)
+
+def test_24_dir_watch():
+    m = fanotify_monitor()
+    testdir = make_testdir("fanotify-dir")
+    watch = m.add_dir_watch(testdir, FSEvent.All & ~FSEvent.Access)
+    touch(os.path.join(testdir, "a"))
+    os.rename(os.path.join(testdir, "a"), os.path.join(testdir, "b"))
+    mkdir(os.path.join(testdir, "sub"))
+    touch(os.path.join(testdir, "sub", "c"))
+    events = [(evt.watch, evt.action, evt.name) for evt in collect(m, 4)]
+    m.close()
+    assert events == [(watch, FSEvent.Create, "a"),
+                      (watch, FSEvent.MoveFrom, "a"),
+                      (watch, FSEvent.MoveTo, "b"),
+                      (watch, FSEvent.Create, "sub")]
+
+def test_24_recursive_watch():
+    m = fanotify_monitor()
+    testdir = make_testdir("fanotify-recursive")
+    mkdir(os.path.join(testdir, "sub"))
+    watch = m.add_dir_watch(testdir, FSEvent.Create | FSEvent.Delete, recursive=True,
+                            exclude="*.tmp")
+    touch(os.path.join(testdir, "sub", "a"))
+    touch(os.path.join(testdir, "sub", "a.tmp"))
+    touch(get_testpath("fanotify-outside"))
+    remove(os.path.join(testdir, "sub", "a"))
+    events = [(evt.watch, evt.action, evt.name) for evt in collect(m, 2)]
+    m.remove_watch(watch)
+    assert m.watches == []
+    m.close()
+    assert events == [(watch, FSEvent.Create, "sub/a"),
+                      (watch, FSEvent.Delete, "sub/a")]
+
+def test_24_file_watch():
+    m = fanotify_monitor()
+    testdir = make_testdir("fanotify-file")
+    path = os.path.join(testdir, "f")
+    touch(path)
+    watch = m.add_file_watch(path, FSEvent.Modify | FSEvent.DeleteSelf)
+    with open(path, "ab") as f:
+        f.write(b"x")
+    remove(path)
+    events = [(evt.watch, evt.action, evt.name) for evt in collect(m, 2)]
+    m.close()
+    assert events == [(watch, FSEvent.Modify, ""), (watch, FSEvent.DeleteSelf, "")]
+
+def test_24_create_fsmonitor_fallback(monkeypatch):
+    from fsmonitor import fanotify
+    from fsmonitor.linux import FSMonitor as LinuxFSMonitor
+    monkeypatch.setattr(fanotify, "fanotify_available", lambda dirent_events=True: False)
+    m = fanotify.create_fsmonitor()
+    assert isinstance(m, LinuxFSMonitor)
+    m.close()
+
+def test_24_create_fsmonitor_options():
+    from fsmonitor import fanotify
+    from fsmonitor.linux import FSMonitor as LinuxFSMonitor
+    # resync is an option of the inotify monitor only
+    m = fanotify.create_fsmonitor(resync=True)
+    assert isinstance(m, LinuxFSMonitor)
+    assert m.resync
+    m.close()
+    m = fanotify.create_fsmonitor(read_size=8192)
+    assert m.read_size == 8192
+    m.close()
+    with pytest.raises(TypeError):
+        fanotify.FSMonitor(resync=True)
@@ -0,0 +1,33 @@
+import os, sys, json
+from utils import *
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "benchmarks"))
+import bench_backends, compare
+
+def test_25_benchmark_results():
+    results = bench_backends.run_benchmarks(
+        ["polling"], list(bench_backends.WORKLOADS), 10, repeat=1,
+        poll_interval=0.01, settle=0.2, basedir=tempdir)
+    assert [r["workload"] for r in results] == list(bench_backends.WORKLOADS)
+    for r in results:
+        assert r["expected"] == r["received"] + r["missed"]
+        assert sorted(r["latency_ms"]) == ["p100", "p50", "p90", "p99"]
+    many = results[2]
+    assert many["workload"] == "many_watches"
+    assert many["expected"] == 10 and many["missed"] == 0
+    # results are plain JSON
+    json.loads(json.dumps(results))
+
+def test_25_compare():
+    base = {"results": [
+        {"backend": "b", "workload": "w", "events_per_second": 100.0, "missed": 0},
+        {"backend": "b", "workload": "w", "events_per_second": 120.0, "missed": 0},
+    ]}
+    new = {"results": [
+        {"backend": "b", "workload": "w", "events_per_second": 80.0, "missed": 0},
+    ]}
+    rows = compare.compare(base, new, threshold=0.1)
+    assert [(row[2], row[3], row[4], row[6]) for row in rows] == [
+        ("events_per_second", 110.0, 80.0, True),
+        ("missed", 0, 0, False),
+    ]
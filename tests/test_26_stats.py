@@ -0,0 +1,71 @@
+import os, time
+from utils import *
+from fsmonitor import *
+from fsmonitor.stats import Histogram
+
+def test_26_histogram():
+    h = Histogram(1)
+    for value in (1, 2, 3, 100):
+        h.add(value)
+    d = h.as_dict()
+    assert (d["count"], d["min"], d["max"], d["mean"]) == (4, 1, 100, 26.5)
+    assert d["buckets"] == {2: 1, 4: 2, 128: 1}
+    assert h.percentile(50) == 4
+    assert h.percentile(100) == 100
+    assert Histogram().percentile(50) is None
+
+@linux_only
+def test_26_monitor_stats():
+    from fsmonitor.linux import FSMonitor as LinuxFSMonitor
+    testdir = make_testdir("stats-monitor")
+    m = LinuxFSMonitor(stats=True)
+    m.add_dir_watch(testdir, FSEvent.Create, exclude="*.tmp")
+    touch(os.path.join(testdir, "a"))
+    touch(os.path.join(testdir, "b.tmp"))
+    assert m.get_stats()["queued_bytes"] > 0
+    events = m.read_events()
+    stats = m.get_stats()
+    m.close()
+    assert [evt.name for evt in events] == ["a"]
+    assert events[0].timestamp is not None
+    assert stats["watches"] == 1
+    assert stats["queued_bytes"] == 0
+    assert stats["reads"] == 1
+    assert stats["bytes_read"] == stats["bytes_per_read"]["max"] > 0
+    assert stats["events"] == 1
+    assert stats["filtered"] == 1
+    assert stats["raw_events"] >= 2
+
+@linux_only
+def test_26_monitor_stats_disabled():
+    from fsmonitor.linux import FSMonitor as LinuxFSMonitor
+    testdir = make_testdir("stats-disabled")
+    m = LinuxFSMonitor()
+    m.add_dir_watch(testdir)
+    touch(os.path.join(testdir, "a"))
+    events = m.read_events()
+    stats = m.get_stats()
+    m.close()
+    assert events[0].timestamp is None
+    assert sorted(stats) == ["queued_bytes", "watches"]
+
+def test_26_thread_stats():
+    testdir = make_testdir("stats-thread")
+    received = []
+    def callback(evt):
+        received.append(evt)
+        time.sleep(0.01)
+    thread = FSMonitorThread(callback, stats=True)
+    thread.add_dir_watch(testdir, FSEvent.Create)
+    touch(os.path.join(testdir, "a"))
+    deadline = time.time() + 5
+    while thread.stats.callbacks < 1 and time.time() < deadline:
+        time.sleep(0.01)
+    thread.stop()
+    stats = thread.get_stats()
+    assert stats["events"] >= 1
+    assert stats["callbacks"] == stats["callback_time"]["count"] >= 1
+    assert stats["callback_time"]["min"] >= 0.01
+    assert stats["latency"]["count"] >= 1
+    assert stats["dropped_events"] == 0
+    assert "watches" in stats["monitor"]
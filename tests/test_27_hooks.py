@@ -0,0 +1,122 @@
+import os, time, threading
+from utils import *
+from fsmonitor import *
+from fsmonitor.hooks import FSMonitorHooks, StageTimer
+from fsmonitor.polling import FSMonitor as PollingFSMonitor
+from fsmonitor.compat import PY3
+
+if PY3:
+    from io import StringIO
+else:
+    from StringIO import StringIO
+
+class RecordingHooks(FSMonitorHooks):
+    def __init__(self):
+        self.calls = []
+
+    def before_read(self, monitor):
+        self.calls.append("before_read")
+        return "read-token"
+
+    def after_read(self, monitor, token, size):
+        self.calls.append(("after_read", token, size > 0))
+
+    def after_decode(self, monitor, token, events):
+        self.calls.append(("after_decode", token, [evt.name for evt in events]))
+
+    def before_scan(self, monitor, watch):
+        return watch
+
+    def after_scan(self, monitor, token, watch, events):
+        assert token is watch
+        self.calls.append(("scan", [evt.name for evt in events]))
+
+    def before_dispatch(self, thread, events):
+        return len(events)
+
+    def after_dispatch(self, thread, token, events):
+        self.calls.append(("dispatch", token))
+
+@linux_only
+def test_27_read_hooks():
+    from fsmonitor.linux import FSMonitor as LinuxFSMonitor
+    testdir = make_testdir("hooks-read")
+    m = LinuxFSMonitor()
+    m.hooks = hooks = RecordingHooks()
+    m.add_dir_watch(testdir, FSEvent.Create)
+    touch(os.path.join(testdir, "a"))
+    m.read_events()
+    m.close()
+    assert hooks.calls == ["before_read",
+                           ("after_read", "read-token", True),
+                           ("after_decode", "read-token", ["a"])]
+
+def test_27_scan_hooks():
+    testdir = make_testdir("hooks-scan")
+    m = PollingFSMonitor()
+    m.polling_interval = 0
+    m.hooks = hooks = RecordingHooks()
+    m.add_dir_watch(testdir, FSEvent.Create)
+    m.add_file_watch(tempdir)
+    touch(os.path.join(testdir, "a"))
+    m.read_events()
+    m.close()
+    assert sorted(hooks.calls) == [("scan", []), ("scan", ["a"])]
+
+def test_27_parallel_scan_hooks():
+    testdir = make_testdir("hooks-parallel-scan")
+    paths = [os.path.join(testdir, "d%d" % i) for i in range(8)]
+    m = PollingFSMonitor(scan_workers=4)
+    m.polling_interval = 0
+    m.hooks = hooks = RecordingHooks()
+    threads = set()
+    def before_scan(monitor, watch):
+        threads.add(threading.current_thread())
+        return watch
+    hooks.before_scan = before_scan
+    for path in paths:
+        mkdir(path)
+        m.add_dir_watch(path, FSEvent.Create)
+    for i, path in enumerate(paths):
+        touch(os.path.join(path, "f%d" % i))
+    events = m.read_events()
+    m.close()
+    # the scans are timed on the pool threads, not while waiting for them
+    assert threading.current_thread() not in threads
+    assert sorted(hooks.calls) == [("scan", ["f%d" % i]) for i in range(8)]
+    assert [evt.name for evt in events] == ["f%d" % i for i in range(8)]
+
+def test_27_dispatch_hooks():
+    testdir = make_testdir("hooks-dispatch")
+    thread = FSMonitorThread(autostart=False)
+    thread.hooks = hooks = RecordingHooks()
+    thread.add_dir_watch(testdir, FSEvent.Create)
+    thread.start()
+    touch(os.path.join(testdir, "a"))
+    events = thread.read_events(timeout=5)
+    deadline = time.time() + 5
+    while not hooks.calls and time.time() < deadline:
+        time.sleep(0.01)
+    thread.stop()
+    assert [evt.name for evt in events] == ["a"]
+    assert hooks.calls == [("dispatch", 1)]
+
+def test_27_stage_timer():
+    testdir = make_testdir("hooks-timer")
+    m = PollingFSMonitor()
+    m.polling_interval = 0
+    m.hooks = timer = StageTimer(sample_every=2)
+    for i in range(4):
+        path = os.path.join(testdir, "d%d" % i)
+        mkdir(path)
+        m.add_dir_watch(path)
+    m.read_events()
+    m.close()
+    stats = timer.as_dict()
+    assert stats["scan"]["count"] == 2
+    assert stats["read"]["count"] == 0
+    out = StringIO()
+    timer.dump(out)
+    lines = out.getvalue().splitlines()
+    assert lines[0].split()[0] == "stage"
+    assert [line.split()[0] for line in lines[1:]] == ["scan"]
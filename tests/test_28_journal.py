@@ -0,0 +1,74 @@
+import os, shutil, threading
+import pytest
+from utils import *
+from fsmonitor import *
+from fsmonitor.journal import EventJournal, JournalOverrun
+
+def make_events(names):
+    return [FSEvent(None, FSEvent.Create, name) for name in names]
+
+def test_28_cursors():
+    journal = EventJournal(capacity=8)
+    early = journal.cursor()
+    journal.append(make_events("ab"))
+    late = journal.cursor()
+    journal.append(make_events("cd"))
+
+    seq, events = early.read()
+    assert seq == 0
+    assert [evt.name for evt in events] == ["a", "b", "c", "d"]
+    seq, events = late.read()
+    assert seq == 2
+    assert [evt.name for evt in events] == ["c", "d"]
+    assert early.read() == (4, [])
+
+    # consumers share the event objects
+    seq, replay = journal.cursor(from_start=True).read(max_events=3)
+    assert [evt.name for evt in replay] == ["a", "b", "c"]
+    assert replay[2] is events[0]
+
+def test_28_overrun():
+    journal = EventJournal(capacity=4)
+    cursor = journal.cursor()
+    journal.append(make_events("abc"))
+    journal.append(make_events("def"))
+    assert cursor.pending == 6
+    with pytest.raises(JournalOverrun) as info:
+        cursor.read()
+    assert (info.value.lost, info.value.first) == (2, 2)
+    # the cursor continues from the oldest event, across the end of the ring
+    seq, events = cursor.read()
+    assert seq == 2
+    assert [evt.name for evt in events] == ["c", "d", "e", "f"]
+    # more events than the journal holds
+    journal.append(make_events("ghijkl"))
+    assert journal.first_seq == 8 and journal.next_seq == 12 and len(journal) == 4
+    assert [evt.name for evt in journal.cursor(from_start=True).read()[1]] == list("ijkl")
+
+def test_28_wait():
+    journal = EventJournal()
+    cursor = journal.cursor()
+    assert cursor.read(timeout=0.05) == (0, [])
+    timer = threading.Timer(0.05, journal.append, [make_events("a")])
+    timer.start()
+    seq, events = cursor.read(timeout=5)
+    assert [evt.name for evt in events] == ["a"]
+    timer = threading.Timer(0.05, journal.close)
+    timer.start()
+    assert cursor.read(timeout=None) == (1, [])
+
+def test_28_thread_journal():
+    testdir = get_testpath("journal-thread")
+    shutil.rmtree(testdir, ignore_errors=True)
+    mkdir(testdir)
+    journal = EventJournal()
+    first, second = journal.cursor(), journal.cursor()
+    thread = FSMonitorThread(journal=journal)
+    thread.add_dir_watch(testdir, FSEvent.Create)
+    touch(os.path.join(testdir, "a"))
+    seq, events = first.read(timeout=5)
+    thread.stop()
+    assert [evt.name for evt in events] == ["a"]
+    assert second.read()[1] == events
+    # events go only to the journal without a callback
+    assert thread.read_events() == []
@@ -0,0 +1,37 @@
+import os, time, struct
+import pytest
+from utils import *
+from fsmonitor import *
+
+@linux_only
+def test_4_parse_events():
+    from fsmonitor.linux import parse_events
+    s = struct.pack("iIII", 1, 0x100, 0, 8) + b"abc\0\0\0\0\0" \
+      + struct.pack("iIII", 1, 0x400, 0, 0)
+    assert list(parse_events(s)) == [(1, 0x100, 0, b"abc"), (1, 0x400, 0, b"")]
+
+@linux_only
+def test_4_burst_events():
+    from fsmonitor.linux import FSMonitor as LinuxFSMonitor
+    testdir = get_testpath("burst")
+    mkdir(testdir)
+    m = LinuxFSMonitor(read_size=4096)
+    m.add_dir_watch(testdir, flags=FSEvent.Create)
+    names = set("f%d" % i for i in range(500))
+    for name in names:
+        touch(os.path.join(testdir, name))
+
+    seen = set()
+    deadline = time.time() + 5
+    while seen != names and time.time() < deadline:
+        for evt in m.read_events(timeout=0.1):
+            seen.add(evt.name)
+    m.close()
+
+    assert seen == names
+
+@linux_only
+def test_4_read_size_too_small():
+    from fsmonitor.linux import FSMonitor as LinuxFSMonitor
+    with pytest.raises(ValueError):
+        LinuxFSMonitor(read_size=16)
@@ -0,0 +1,119 @@
+import os, shutil
+import pytest
+from utils import *
+from fsmonitor import *
+
+def happened(events, action, name):
+    return any(evt.action == action and evt.name == name for evt in events)
+
+@linux_only
+def test_5_recursive():
+    from fsmonitor.linux import FSMonitor as LinuxFSMonitor
+    testdir = get_testpath("recursive")
+    shutil.rmtree(testdir, ignore_errors=True)
+    os.makedirs(os.path.join(testdir, "a", "b"))
+    m = LinuxFSMonitor()
+    w = m.add_dir_watch(testdir, recursive=True)
+
+    touch(os.path.join(testdir, "a", "b", "x"))
+    os.makedirs(os.path.join(testdir, "c", "d"))
+    touch(os.path.join(testdir, "c", "d", "y"))
+    events = read_all(m)
+
+    assert happened(events, FSEvent.Create, "a/b/x")
+    assert happened(events, FSEvent.Create, "c")
+    assert happened(events, FSEvent.Create, "c/d")
+    assert happened(events, FSEvent.Create, "c/d/y")
+
+    touch(os.path.join(testdir, "c", "d", "z"))
+    events = read_all(m)
+    assert happened(events, FSEvent.Create, "c/d/z")
+
+    shutil.rmtree(os.path.join(testdir, "c"))
+    events = read_all(m)
+    assert happened(events, FSEvent.Delete, "c/d/z")
+    assert happened(events, FSEvent.Delete, "c")
+    assert not any(evt.action == FSEvent.DeleteSelf for evt in events)
+    assert sorted(w._nodes) == [w._wd, w._nodes[w._wd].children[b"a"].wd,
+                                w._nodes[w._wd].children[b"a"].children[b"b"].wd]
+
+    m.remove_watch(w)
+    read_all(m)
+    assert m.watches == []
+    m.close()
+
+@linux_only
+def test_5_recursive_move_out():
+    from fsmonitor.linux import FSMonitor as LinuxFSMonitor
+    testdir = get_testpath("recursive-move")
+    outside = get_testpath("recursive-move-out")
+    shutil.rmtree(testdir, ignore_errors=True)
+    shutil.rmtree(outside, ignore_errors=True)
+    os.makedirs(os.path.join(testdir, "a"))
+    m = LinuxFSMonitor()
+    w = m.add_dir_watch(testdir, recursive=True)
+
+    os.rename(os.path.join(testdir, "a"), outside)
+    read_all(m)
+    touch(os.path.join(outside, "x"))
+    events = read_all(m)
+
+    assert events == []
+    assert list(w._nodes) == [w._wd]
+    m.close()
+
+@linux_only
+@pytest.mark.parametrize("pair_moves", [False, True])
+def test_5_recursive_rename(pair_moves):
+    from fsmonitor.linux import FSMonitor as LinuxFSMonitor
+    testdir = get_testpath("recursive-rename")
+    shutil.rmtree(testdir, ignore_errors=True)
+    os.makedirs(os.path.join(testdir, "src", "b", "g"))
+    for i in range(3):
+        touch(os.path.join(testdir, "src", "f%d" % i))
+    m = LinuxFSMonitor(pair_moves=pair_moves)
+    w = m.add_dir_watch(testdir, recursive=True)
+    wds = sorted(w._nodes)
+
+    os.rename(os.path.join(testdir, "src"), os.path.join(testdir, "dst"))
+    events = read_all(m)
+    # the contents of the renamed directory are not reported as new
+    assert not any(evt.action == FSEvent.Create for evt in events)
+    assert sorted(w._nodes) == wds
+
+    touch(os.path.join(testdir, "dst", "b", "g", "x"))
+    events = read_all(m)
+    assert happened(events, FSEvent.Create, "dst/b/g/x")
+    m.close()
+
+@linux_only
+@pytest.mark.parametrize("resync", [False, True])
+def test_5_recursive_no_access(resync):
+    from fsmonitor.linux import FSMonitor as LinuxFSMonitor
+    testdir = get_testpath("recursive-access")
+    shutil.rmtree(testdir, ignore_errors=True)
+    os.makedirs(os.path.join(testdir, "a", "b"))
+    m = LinuxFSMonitor(resync=resync)
+    m.add_dir_watch(testdir, recursive=True)
+    # the monitor's own reads of the directories are not reported
+    assert read_all(m) == []
+
+    os.makedirs(os.path.join(testdir, "c", "d"))
+    events = read_all(m)
+    assert sorted(evt.name for evt in events if evt.action == FSEvent.Create) == ["c", "c/d"]
+    assert not any(evt.action == FSEvent.Access for evt in events)
+
+    os.listdir(os.path.join(testdir, "a"))
+    assert happened(read_all(m), FSEvent.Access, "a")
+    m.close()
+
+@linux_only
+def test_5_resync_no_access():
+    from fsmonitor.linux import FSMonitor as LinuxFSMonitor
+    testdir = get_testpath("resync-access")
+    shutil.rmtree(testdir, ignore_errors=True)
+    os.makedirs(os.path.join(testdir, "a"))
+    m = LinuxFSMonitor(resync=True)
+    m.add_dir_watch(testdir)
+    assert read_all(m) == []
+    m.close()
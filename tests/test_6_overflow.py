@@ -0,0 +1,94 @@
+import os, shutil
+from utils import *
+from fsmonitor import *
+
+def max_queued_events():
+    with open("/proc/sys/fs/inotify/max_queued_events") as f:
+        return int(f.read())
+
+def fill_queue(testdir):
+    for i in range(max_queued_events() // 2 + 1):
+        path = os.path.join(testdir, "tmp%d" % i)
+        touch(path)
+        os.remove(path)
+
+@linux_only
+def test_6_overflow():
+    from fsmonitor.linux import FSMonitor as LinuxFSMonitor
+    testdir = get_testpath("overflow")
+    shutil.rmtree(testdir, ignore_errors=True)
+    mkdir(testdir)
+    m = LinuxFSMonitor()
+    m.add_dir_watch(testdir)
+    fill_queue(testdir)
+    events = read_all(m)
+    m.close()
+
+    overflows = [evt for evt in events if evt.action == FSEvent.Overflow]
+    assert len(overflows) == 1
+    assert overflows[0].watch is None
+    assert overflows[0].action_name == "overflow"
+
+@linux_only
+def test_6_overflow_resync():
+    from fsmonitor.linux import FSMonitor as LinuxFSMonitor
+    testdir = get_testpath("overflow-resync")
+    shutil.rmtree(testdir, ignore_errors=True)
+    os.makedirs(os.path.join(testdir, "sub"))
+    touch(os.path.join(testdir, "old"))
+    touch(os.path.join(testdir, "sub", "modified"))
+    m = LinuxFSMonitor(resync=True)
+    w = m.add_dir_watch(testdir, recursive=True)
+
+    fill_queue(testdir)
+    # these events are lost in the overflow
+    os.remove(os.path.join(testdir, "old"))
+    touch(os.path.join(testdir, "new"))
+    with open(os.path.join(testdir, "sub", "modified"), "wb") as f:
+        f.write(b"changed")
+    os.mkdir(os.path.join(testdir, "newdir"))
+    touch(os.path.join(testdir, "newdir", "x"))
+
+    events = read_all(m)
+    actions = [evt.action for evt in events]
+    assert actions.count(FSEvent.Overflow) == 1
+    resynced = events[actions.index(FSEvent.Overflow) + 1:]
+    resynced = set((evt.action, evt.name) for evt in resynced)
+    assert (FSEvent.Delete, "old") in resynced
+    assert (FSEvent.Create, "new") in resynced
+    assert (FSEvent.Modify, "sub/modified") in resynced
+    assert (FSEvent.Create, "newdir") in resynced
+    assert (FSEvent.Create, "newdir/x") in resynced
+
+    # the new directory is watched after the resync
+    touch(os.path.join(testdir, "newdir", "y"))
+    events = read_all(m)
+    assert any(evt.action == FSEvent.Create and evt.name == "newdir/y"
+               for evt in events)
+    m.close()
+
+@linux_only
+def test_6_overflow_resync_changed_file():
+    from fsmonitor.linux import FSMonitor as LinuxFSMonitor
+    testdir = get_testpath("overflow-resync-hot")
+    shutil.rmtree(testdir, ignore_errors=True)
+    mkdir(testdir)
+    hot = os.path.join(testdir, "hot")
+    touch(hot)
+    m = LinuxFSMonitor(resync=True)
+    m.add_dir_watch(testdir)
+
+    with open(hot, "ab") as f:
+        f.write(b"a")
+    read_all(m)
+    fill_queue(testdir)
+    # this change is lost in the overflow
+    with open(hot, "ab") as f:
+        f.write(b"b")
+
+    events = read_all(m)
+    m.close()
+    actions = [evt.action for evt in events]
+    assert actions.count(FSEvent.Overflow) == 1
+    resynced = events[actions.index(FSEvent.Overflow) + 1:]
+    assert (FSEvent.Modify, "hot") in [(evt.action, evt.name) for evt in resynced]
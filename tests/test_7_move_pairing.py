@@ -0,0 +1,36 @@
+import os, shutil
+from utils import *
+from fsmonitor import *
+
+@linux_only
+def test_7_move_pairing():
+    from fsmonitor.linux import FSMonitor as LinuxFSMonitor
+    testdir = get_testpath("moves")
+    shutil.rmtree(testdir, ignore_errors=True)
+    for name in ("a", "b", "outside"):
+        os.makedirs(os.path.join(testdir, name))
+    m = LinuxFSMonitor(pair_moves=True, move_timeout=0.05)
+    wa = m.add_dir_watch(os.path.join(testdir, "a"))
+    wb = m.add_dir_watch(os.path.join(testdir, "b"))
+    touch(os.path.join(testdir, "a", "x"))
+    touch(os.path.join(testdir, "a", "y"))
+    touch(os.path.join(testdir, "outside", "z"))
+    read_all(m)
+
+    os.rename(os.path.join(testdir, "a", "x"), os.path.join(testdir, "a", "x2"))
+    os.rename(os.path.join(testdir, "a", "x2"), os.path.join(testdir, "b", "x3"))
+    os.rename(os.path.join(testdir, "a", "y"), os.path.join(testdir, "outside", "y"))
+    os.rename(os.path.join(testdir, "outside", "z"), os.path.join(testdir, "b", "z"))
+    events = read_all(m)
+    m.close()
+
+    got = [(evt.action, evt.watch, evt.name,
+            getattr(evt, "src_watch", None), getattr(evt, "src_name", None))
+           for evt in events]
+    assert got == [
+        (FSEvent.Move, wa, "x2", wa, "x"),
+        (FSEvent.Move, wb, "x3", wa, "x2"),
+        (FSEvent.Create, wb, "z", None, None),
+        (FSEvent.Delete, wa, "y", None, None),
+    ]
+    assert events[0].action_name == "move"
@@ -0,0 +1,72 @@
+import os, time, shutil
+from utils import *
+from fsmonitor import *
+from fsmonitor.common import FSMoveEvent, coalesce_events
+
+def actions_in_order(events):
+    return [(evt.action, evt.name) for evt in events]
+
+def test_8_coalesce_events():
+    w = object()
+    E = lambda action, name: FSEvent(w, action, name)
+    events = [
+        E(FSEvent.Create, "a"),
+        E(FSEvent.Modify, "a"),
+        E(FSEvent.Modify, "b"),
+        E(FSEvent.Modify, "a"),
+        E(FSEvent.Attrib, "a"),
+        E(FSEvent.Modify, "a"),
+        E(FSEvent.Create, "tmp"),
+        E(FSEvent.Modify, "tmp"),
+        E(FSEvent.Delete, "tmp"),
+        E(FSEvent.Modify, "c"),
+        E(FSEvent.Delete, "c"),
+        E(FSEvent.Create, "c"),
+        E(FSEvent.Delete, "c"),
+        E(FSEvent.Modify, "b"),
+    ]
+    assert actions_in_order(coalesce_events(events)) == [
+        (FSEvent.Create, "a"),
+        (FSEvent.Modify, "a"),
+        (FSEvent.Modify, "b"),
+        (FSEvent.Attrib, "a"),
+        (FSEvent.Delete, "c"),
+    ]
+
+def test_8_coalesce_move_ends_run():
+    w = object()
+    events = [
+        FSEvent(w, FSEvent.Create, "a"),
+        FSMoveEvent(w, "b", w, "a"),
+        FSEvent(w, FSEvent.Delete, "a"),
+        FSEvent(w, FSEvent.Modify, "b"),
+        FSEvent(w, FSEvent.Modify, "b"),
+    ]
+    assert actions_in_order(coalesce_events(events)) == [
+        (FSEvent.Create, "a"),
+        (FSEvent.Move, "b"),
+        (FSEvent.Delete, "a"),
+        (FSEvent.Modify, "b"),
+    ]
+
+def test_8_coalesce_thread():
+    testdir = get_testpath("coalesce")
+    shutil.rmtree(testdir, ignore_errors=True)
+    mkdir(testdir)
+    batches = []
+    thread = FSMonitorThread(coalesce=True, quiet_window=0.1, max_latency=1.0)
+    thread.add_dir_watch(testdir, flags=FSEvent.Create | FSEvent.Delete | FSEvent.Modify)
+    with open(os.path.join(testdir, "x"), "wb") as f:
+        for i in range(50):
+            f.write(b"x")
+            f.flush()
+    touch(os.path.join(testdir, "tmp"))
+    remove(os.path.join(testdir, "tmp"))
+
+    time.sleep(0.05)
+    assert thread.read_events() == []
+    time.sleep(0.3)
+    assert actions_in_order(thread.read_events()) == [
+        (FSEvent.Create, "x"),
+        (FSEvent.Modify, "x"),
+    ]
@@ -0,0 +1,62 @@
+import os, shutil
+import pytest
+from utils import *
+from fsmonitor import *
+from fsmonitor.polling import FSMonitor as PollingFSMonitor
+
+asyncio = pytest.importorskip("asyncio")
+
+def run(loop, future, timeout=2.0):
+    return loop.run_until_complete(asyncio.wait_for(future, timeout))
+
+def check_async_monitor(fsmonitor_class, dirname):
+    from fsmonitor.aio import AsyncFSMonitor
+    testdir = get_testpath(dirname)
+    shutil.rmtree(testdir, ignore_errors=True)
+    mkdir(testdir)
+    loop = asyncio.new_event_loop()
+    try:
+        m = AsyncFSMonitor(fsmonitor_class, loop=loop)
+        m.add_dir_watch(testdir)
+        touch(os.path.join(testdir, "x"))
+        events = run(loop, m.read_events())
+        assert [(evt.action, evt.name) for evt in events] == [(FSEvent.Create, "x")]
+
+        remove(os.path.join(testdir, "x"))
+        events = run(loop, m.__anext__())
+        assert [(evt.action, evt.name) for evt in events] == [(FSEvent.Delete, "x")]
+
+        pending = m.__anext__()
+        m.close()
+        with pytest.raises(StopAsyncIteration):
+            run(loop, pending)
+        assert run(loop, m.read_events()) == []
+    finally:
+        loop.close()
+
+def test_9_asyncio():
+    check_async_monitor(None, "asyncio")
+
+def test_9_asyncio_polling():
+    check_async_monitor(PollingFSMonitor, "asyncio-polling")
+
+def test_9_asyncio_running_loop():
+    from fsmonitor.aio import AsyncFSMonitor
+    testdir = make_testdir("asyncio-running-loop")
+    loop = asyncio.new_event_loop()
+    try:
+        # created in a callback, where the loop is running
+        future = loop.create_future()
+        loop.call_soon(lambda: future.set_result(AsyncFSMonitor(PollingFSMonitor)))
+        m = run(loop, future)
+        assert m.loop is loop
+        m.add_dir_watch(testdir)
+        touch(os.path.join(testdir, "x"))
+        events = run(loop, m.read_events())
+        assert [(evt.action, evt.name) for evt in events] == [(FSEvent.Create, "x")]
+        m.close()
+    finally:
+        loop.close()
+    if hasattr(asyncio, "get_running_loop"):
+        with pytest.raises(RuntimeError):
+            AsyncFSMonitor(PollingFSMonitor)
@@ -1,4 +1,5 @@
-import sys, os, shutil, threading
+import sys, os, time, shutil, threading
+import pytest
 from fsmonitor import FSMonitorThread
 
 class FSMonitorTest(object):
@@ -64,10 +65,36 @@ else:
 def get_testpath(*args):
     return os.path.join(tempdir, *args)
 
+linux_only = pytest.mark.skipif(not sys.platform.startswith("linux"),
+                                reason="Linux backend")
+
 tempdir = os.path.join(tempdir, "fsmonitor-test")
 shutil.rmtree(tempdir, ignore_errors=True)
 mkdir(tempdir)
 
+def make_testdir(name):
+    testdir = get_testpath(name)
+    shutil.rmtree(testdir, ignore_errors=True)
+    mkdir(testdir)
+    return testdir
+
+def read_all(monitor, duration=0.3):
+    events = []
+    deadline = time.time() + duration
+    while time.time() < deadline:
+        events.extend(monitor.read_events(timeout=0.05))
+    return events
+
+def collect(monitor, count, timeout=5.0):
+    events = []
+    deadline = time.time() + timeout
+    while len(events) < count and time.time() < deadline:
+        events.extend(monitor.read_events(0.1))
+    return events
+
+def actions(events):
+    return sorted((evt.action, evt.name) for evt in events)
+
 __all__ = (
     "FSMonitorTest",
     "mkdir",
@@ -75,5 +102,10 @@ __all__ = (
     "touch",
     "truncate",
     "tempdir",
-    "get_testpath"
+    "get_testpath",
+    "linux_only",
+    "make_testdir",
+    "read_all",
+    "collect",
+    "actions",
 )